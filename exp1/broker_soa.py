@@ -0,0 +1,45 @@
+import sys
+import argparse
+import json
+from soabroker import Coordinator, CoordinatorServer, Worker
+
+if not (sys.version_info.major == 3 and sys.version_info.minor >= 5):
+    print("This script requires Python 3.5 or higher!")
+    print("You are using Python {}.{}.".format(sys.version_info.major, sys.version_info.minor))
+    sys.exit(1)
+
+parser = argparse.ArgumentParser(description = 'Runs a service oriented architecture sweep across several worker processes or hosts')
+subparsers = parser.add_subparsers(dest = "mode", required = True)
+coordinator_parser = subparsers.add_parser("coordinator", help = "splits the sweep in work units and collects the summaries")
+coordinator_parser.add_argument("-c", "--configfile", help="the json configuration file, can be repeated", action = "append", required = True)
+coordinator_parser.add_argument("--host", help="the address to listen to", default = "127.0.0.1")
+coordinator_parser.add_argument("--port", help="the port to listen to", type = int, default = 7878)
+coordinator_parser.add_argument("--seed", help="the seed of the first data system", type = int, default = 0)
+coordinator_parser.add_argument("--unit-size", help="the number of data systems by work unit", type = int, default = 100)
+coordinator_parser.add_argument("--lease-timeout", help="seconds before a unit leased by a silent worker is dispatched again", type = float, default = 300.0)
+coordinator_parser.add_argument("-s", "--summaryfile", help="a json lines file to append the experiment summaries to")
+worker_parser = subparsers.add_parser("worker", help = "runs work units leased from a coordinator")
+worker_parser.add_argument("--host", help="the address of the coordinator", default = "127.0.0.1")
+worker_parser.add_argument("--port", help="the port of the coordinator", type = int, default = 7878)
+args = parser.parse_args()
+
+if args.mode == "coordinator":
+    coordinator = Coordinator(lease_timeout = args.lease_timeout)
+    configs = []
+    for config_file in args.configfile:
+        with open(config_file, 'r') as jsonfile:
+            wholeconfig = json.load(jsonfile)
+        configs.append(wholeconfig)
+        coordinator.add_config(wholeconfig, args.seed, int(wholeconfig["experiment"]["datasystem-count"]), args.unit_size)
+    server = CoordinatorServer(coordinator, args.host, args.port)
+    print("Coordinator listening on {}:{}, {}".format(args.host, server.get_port(), coordinator.status()))
+    server.serve_until_done()
+    print(coordinator.status())
+    for wholeconfig, summary in zip(configs, coordinator.get_summaries()):
+        print(summary)
+        if args.summaryfile is not None:
+            with open(args.summaryfile, 'a') as summaryfile:
+                summaryfile.write(json.dumps({ "experiment": wholeconfig["experiment"], "calculator": wholeconfig["calculator"], "summary": summary.to_obj() }) + "\n")
+else:
+    worker = Worker(args.host, args.port)
+    print("Worker {} done: {} units".format(worker.name, worker.run()))
@@ -0,0 +1,31 @@
+import copy
+import json
+import os
+import random
+import pytest
+from soadata import DataSystem
+from soarun import PreparedExperiment
+
+@pytest.fixture
+def wholeconfig():
+    """ soa_encryption.json with fewer requests by day, so that a test generates a system in a few milliseconds """
+    with open(os.path.join(os.path.dirname(__file__), "soa_encryption.json"), 'r') as jsonfile:
+        config = json.load(jsonfile)
+    config["experiment"]["class-req-by-day-count-range"] = { "start": 5, "stop": 500 }
+    return config
+
+def prepared_system(wholeconfig: dict, seed: int)->DataSystem:
+    """ The data system of the seed, prepared and summarised, or None when the seed draws an invalid system """
+    prepared = PreparedExperiment(copy.deepcopy(wholeconfig))
+    random.seed(seed)
+    datasystem = DataSystem(prepared.dataconfig, service_cost = prepared.service_cost)
+    try:
+        datasystem.prepare()
+    except ValueError:
+        return None
+    datasystem.get_usage_overview().summarise(verbose = False)
+    return datasystem
+
+@pytest.fixture
+def datasystems(wholeconfig):
+    return [s for s in [prepared_system(wholeconfig, seed) for seed in range(6)] if s is not None]
@@ -0,0 +1,32 @@
+import sys
+import argparse
+import json
+from typing import List
+from soarun import cross_check_numeric, NumericCrossCheck
+
+if not (sys.version_info.major == 3 and sys.version_info.minor >= 5):
+    print("This script requires Python 3.5 or higher!")
+    print("You are using Python {}.{}.".format(sys.version_info.major, sys.version_info.minor))
+    sys.exit(1)
+
+def parse_args(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description = 'Compares the float and the exact (Fraction, with logarithms to a stated precision) numeric backends on the same data systems')
+    parser.add_argument("-c", "--configfile", help="the json configuration file", required = True)
+    parser.add_argument("--seed", help="the seed of the first data system", type = int, default = 0)
+    parser.add_argument("-n", "--count", help="the number of data systems, the datasystem-count of the configuration by default", type = int)
+    parser.add_argument("--tolerance", help="the largest relative divergence accepted", type = float, default = 1e-9)
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None)->NumericCrossCheck:
+    args = parse_args(argv)
+    with open(args.configfile, 'r') as jsonfile:
+        wholeconfig = json.load(jsonfile)
+    count = args.count if args.count is not None else int(wholeconfig["experiment"]["datasystem-count"])
+    check = cross_check_numeric(wholeconfig, args.seed, count)
+    print(check)
+    if check.mismatches > 0 or check.max_relative > args.tolerance:
+        sys.exit(1)
+    return check
+
+if __name__ == "__main__":
+    main()
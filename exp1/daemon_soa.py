@@ -0,0 +1,42 @@
+import os
+import sys
+import argparse
+import json
+from soarun import ExperimentDaemon, DaemonServer, DaemonClient
+
+if not (sys.version_info.major == 3 and sys.version_info.minor >= 5):
+    print("This script requires Python 3.5 or higher!")
+    print("You are using Python {}.{}.".format(sys.version_info.major, sys.version_info.minor))
+    sys.exit(1)
+
+parser = argparse.ArgumentParser(description = 'Keeps the service oriented architecture simulation loaded and runs jobs sent over a Unix socket')
+subparsers = parser.add_subparsers(dest = "mode", required = True)
+serve_parser = subparsers.add_parser("serve", help = "starts the daemon")
+serve_parser.add_argument("--socket", help="the path of the Unix socket", default = "/tmp/soarun.sock")
+serve_parser.add_argument("--max-configs", help="the number of parsed configurations to keep", type = int, default = 256)
+run_parser = subparsers.add_parser("run", help = "sends a job to the daemon and prints the summary")
+run_parser.add_argument("--socket", help="the path of the Unix socket", default = "/tmp/soarun.sock")
+run_parser.add_argument("-c", "--configfile", help="the json configuration file", required = True)
+run_parser.add_argument("--seed", help="the seed of the first data system", type = int, default = 0)
+run_parser.add_argument("-n", "--count", help="the number of data systems, the datasystem-count of the configuration by default", type = int)
+args = parser.parse_args()
+
+if args.mode == "serve":
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+    server = DaemonServer(ExperimentDaemon(max_configs = args.max_configs), args.socket)
+    print("Daemon listening on {}".format(args.socket))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(args.socket)
+else:
+    with open(args.configfile, 'r') as jsonfile:
+        wholeconfig = json.load(jsonfile)
+    count = args.count if args.count is not None else int(wholeconfig["experiment"]["datasystem-count"])
+    client = DaemonClient(args.socket)
+    print(client.run_experiment(wholeconfig, args.seed, count))
+    client.close()
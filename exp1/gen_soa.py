@@ -5,37 +5,133 @@ import json
 from fractions import Fraction
 from typing import List, Tuple, Dict, Set
 from random import sample, choice, randint
-from soadata import DataSystem, DataSystemConfig, ServiceCost
+from soadata import DataSystem, DataSystemConfig, ServiceCost, ExperimentSummary
+from soarun import PreparedExperiment, run_experiment, run_with_checkpoints
+from soametrics import MetricsRegistry, MetricsServer, JsonLinesReporter
+from soapipeline import ExperimentPipeline, PrintSink, sink_for
+from soagovernor import MemoryGovernor, GovernorAdjustment, parse_size
 
 if not (sys.version_info.major == 3 and sys.version_info.minor >= 5):
     print("This script requires Python 3.5 or higher!")
     print("You are using Python {}.{}.".format(sys.version_info.major, sys.version_info.minor))
     sys.exit(1)
 
-parser = argparse.ArgumentParser(description = 'Generates a simulation for service oriented architecture')
-parser.add_argument("-c", "--configfile", help="the json configuration file", required = True)
-args = parser.parse_args()
-
 MAX_ITEMS_MAGNITUDE = 48 #2^48
 MAX_PROCESSING_MAGNITUDE_MICRO_SEC = 27 # 2^27
 
 class ScriptConfig:
-    def __init__(self):
+    def __init__(self, args):
         self.config_file = args.configfile
+        self.summary_file = args.summaryfile
+        self.seed = args.seed
+        self.metrics_port = args.metrics_port
+        self.metrics_file = args.metrics_file
+        self.metrics_interval = args.metrics_interval
+        self.workers = args.workers
+        self.output_file = args.output
+        self.queue_depth = args.queue_depth
+        self.memory_budget = parse_size(args.memory_budget) if args.memory_budget is not None else None
+        self.governor_log = args.governor_log
+        self.numeric = args.numeric
+        self.checkpoint_file = args.checkpoint
+        self.checkpoint_every = args.checkpoint_every
+        self.resume = args.resume
+        self.latency = args.latency
 
-scriptconfig = ScriptConfig()
+def parse_args(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description = 'Generates a simulation for service oriented architecture')
+    parser.add_argument("-c", "--configfile", help="the json configuration file", required = True)
+    parser.add_argument("-s", "--summaryfile", help="a json lines file to append the experiment summary to")
+    parser.add_argument("--seed", help="seeds the data system i with seed + i, for reproducible runs", type = int)
+    parser.add_argument("--metrics-port", help="serves the progress in the Prometheus text format on http://127.0.0.1:port/metrics", type = int)
+    parser.add_argument("--metrics-file", help="a json lines file to append the progress to periodically")
+    parser.add_argument("--metrics-interval", help="seconds between two lines of the metrics file", type = float, default = 10.0)
+    parser.add_argument("--numeric", help="overrides the numeric backend of the configuration: float (fast) or exact (Fraction)", choices = ["float", "exact"])
+    parser.add_argument("--checkpoint", help="a file to save the progress to, to be able to resume the run")
+    parser.add_argument("--checkpoint-every", help="the number of data systems between two checkpoints", type = int, default = 1000)
+    parser.add_argument("--resume", help="continues from the checkpoint file, if it exists", action = "store_true")
+    parser.add_argument("--latency", help="prints the p50, p99 and p999 latencies of the data usages of every data system", action = "store_true")
+    parser.add_argument("--workers", help="generates the data systems in that many processes, with the output written in the background", type = int)
+    parser.add_argument("--output", help="with --workers, a .csv or .sqlite file for one row by data system instead of printing them")
+    parser.add_argument("--queue-depth", help="with --workers, the number of chunks of data systems waiting between two stages", type = int, default = 8)
+    parser.add_argument("--memory-budget", help="adapts the number of workers, up to --workers or the number of CPUs, and the chunk size to stay under that memory, like 512M or 8G")
+    parser.add_argument("--governor-log", help="with --memory-budget, a json lines file to append every adjustment to")
+    args = parser.parse_args(argv)
+    if args.checkpoint_every <= 0:
+        parser.error("--checkpoint-every must be positive, got {}".format(args.checkpoint_every))
+    return ScriptConfig(args)
 
-def load_config():
-    with open(scriptconfig.config_file, 'r') as jsonfile:
+def load_config(config_file: str):
+    with open(config_file, 'r') as jsonfile:
         return json.load(jsonfile)
 
-wholeconfig = load_config()
-dataconfig = DataSystemConfig.from_obj(wholeconfig["experiment"])
-print(dataconfig)
+def log_adjustment(filename: str, adjustment: GovernorAdjustment):
+    print(adjustment)
+    with open(filename, 'a') as logfile:
+        logfile.write(json.dumps(adjustment.to_obj()) + "\n")
+
+def main(argv: List[str] = None)->ExperimentSummary:
+    scriptconfig = parse_args(argv)
+    wholeconfig = load_config(scriptconfig.config_file)
+    if scriptconfig.numeric is not None:
+        wholeconfig["experiment"]["numeric"] = scriptconfig.numeric
+    prepared = PreparedExperiment(wholeconfig)
+    print(prepared.dataconfig)
+
+    reports = []
+    if prepared.traffic_config is not None:
+        from soatraffic import TrafficSimulation
+        reports.append(lambda dataSystem: print(TrafficSimulation(dataSystem, prepared.traffic_config).run()))
+    if scriptconfig.latency:
+        from soalatency import LatencyEvaluator
+        reports.append(lambda dataSystem: print("\n".join([str(usage) for usage in LatencyEvaluator(dataSystem).evaluate()])))
+    capacityArrays = None
+    if prepared.growth_config is not None:
+        from soacapacity import UsageArrays, CapacityProjection
+        capacityArrays = UsageArrays()
+        reports.append(lambda dataSystem: capacityArrays.add_overview(dataSystem.get_usage_overview()))
+    on_system = (lambda dataSystem: [report(dataSystem) for report in reports]) if len(reports) > 0 else None
+
+    metrics = MetricsRegistry() if scriptconfig.metrics_port is not None or scriptconfig.metrics_file is not None else None
+    metricsServer = MetricsServer(metrics, port = scriptconfig.metrics_port).start() if scriptconfig.metrics_port is not None else None
+    metricsReporter = JsonLinesReporter(metrics, scriptconfig.metrics_file, scriptconfig.metrics_interval).start() if scriptconfig.metrics_file is not None else None
+
+    parallel = scriptconfig.workers is not None or scriptconfig.memory_budget is not None
+    if parallel and scriptconfig.checkpoint_file is not None:
+        raise ValueError("--checkpoint is not supported with --workers or --memory-budget")
+
+    governor = None
+    if scriptconfig.memory_budget is not None:
+        governor = MemoryGovernor(scriptconfig.memory_budget, scriptconfig.workers)
+        if scriptconfig.governor_log is not None:
+            governor.set_log(lambda adjustment: log_adjustment(scriptconfig.governor_log, adjustment))
+
+    try:
+        if parallel:
+            if on_system is not None:
+                print("The traffic simulation, the latency and the capacity reports are skipped with --workers")
+            pipeline = ExperimentPipeline(prepared.wholeconfig, scriptconfig.workers or 2).set_queue_depth(scriptconfig.queue_depth).set_metrics(metrics).set_governor(governor)
+            pipeline.add_sink(sink_for(scriptconfig.output_file) if scriptconfig.output_file is not None else PrintSink())
+            experimentSummary = pipeline.run(scriptconfig.seed or 0, prepared.dataconfig.datasystem_count)
+        elif scriptconfig.checkpoint_file is not None:
+            experimentSummary = run_with_checkpoints(prepared, scriptconfig.seed, prepared.dataconfig.datasystem_count, scriptconfig.checkpoint_file, every = scriptconfig.checkpoint_every, resume = scriptconfig.resume, verbose = True, on_system = on_system, metrics = metrics, accumulator = capacityArrays)
+        else:
+            experimentSummary = run_experiment(prepared, scriptconfig.seed, prepared.dataconfig.datasystem_count, verbose = True, on_system = on_system, metrics = metrics)
+    finally:
+        if metricsReporter is not None:
+            metricsReporter.stop()
+        if metricsServer is not None:
+            metricsServer.stop()
+    print(experimentSummary)
+    if capacityArrays is not None and len(capacityArrays) > 0:
+        print(CapacityProjection(prepared.growth_config, seed = scriptconfig.seed).project(capacityArrays))
+    if governor is not None:
+        print(governor)
 
-serviceCost = ServiceCost.from_obj(wholeconfig["calculator"]["cost"])
+    if scriptconfig.summary_file is not None:
+        with open(scriptconfig.summary_file, 'a') as summaryfile:
+            summaryfile.write(json.dumps({ "experiment": prepared.wholeconfig["experiment"], "calculator": prepared.wholeconfig["calculator"], "summary": experimentSummary.to_obj() }) + "\n")
+    return experimentSummary
 
-for _ in range(dataconfig.datasystem_count):
-    dataSystem = DataSystem(dataconfig, service_cost = serviceCost)
-    dataSystem.prepare()
-    dataSystem.get_usage_overview().summarise()
+if __name__ == "__main__":
+    main()
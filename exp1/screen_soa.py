@@ -0,0 +1,58 @@
+import os
+import sys
+import argparse
+import json
+from random import Random
+from typing import List
+from soasurrogate import SurrogateModel, Screening, ScreenedCandidate, load_samples, random_candidates, METRIC_TRANSFORMS
+
+if not (sys.version_info.major == 3 and sys.version_info.minor >= 5):
+    print("This script requires Python 3.5 or higher!")
+    print("You are using Python {}.{}.".format(sys.version_info.major, sys.version_info.minor))
+    sys.exit(1)
+
+def parse_args(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description = 'Screens candidate configurations with a surrogate model trained on previous experiment summaries')
+    parser.add_argument("-t", "--trainingfile", help="the json lines file written by gen_soa.py --summaryfile", required = True)
+    parser.add_argument("-c", "--configfile", help="the json configuration file used as a base for the candidates", required = True)
+    parser.add_argument("-k", "--candidatesfile", help="a json lines file of experiment configurations to screen instead of random variations")
+    parser.add_argument("-n", "--count", help="the number of random candidates", type = int, default = 1000)
+    parser.add_argument("-m", "--metric", help="the metric to minimise", choices = list(METRIC_TRANSFORMS.keys()), default = "mean-cost")
+    parser.add_argument("--keep", help="the number of promising candidates to keep", type = int, default = 10)
+    parser.add_argument("--seed", help="the random seed", type = int)
+    parser.add_argument("-o", "--outputfile", help="a json lines file with one whole configuration by line for the selected candidates")
+    parser.add_argument("-d", "--outputdir", help="a directory for one configuration file by selected candidate (candidate-1.json, ...), each ready for gen_soa.py -c")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None)->List[ScreenedCandidate]:
+    args = parse_args(argv)
+    with open(args.configfile, 'r') as jsonfile:
+        wholeconfig = json.load(jsonfile)
+
+    model = SurrogateModel(seed = args.seed).fit(load_samples(args.trainingfile))
+    print(model)
+
+    if args.candidatesfile is not None:
+        candidates = [json.loads(line) for line in open(args.candidatesfile, 'r') if line.strip()]
+    else:
+        candidates = random_candidates(wholeconfig["experiment"], args.count, Random(args.seed))
+
+    selected = Screening(model, args.metric).set_keep(args.keep).screen(candidates)
+    print("Selected {} out of {} candidates".format(len(selected), len(candidates)))
+    for candidate in selected:
+        print(candidate)
+
+    configs = [{ "experiment": candidate.experiment, "calculator": wholeconfig["calculator"] } for candidate in selected]
+    if args.outputfile is not None:
+        with open(args.outputfile, 'w') as outputfile:
+            for config in configs:
+                outputfile.write(json.dumps(config) + "\n")
+    if args.outputdir is not None:
+        os.makedirs(args.outputdir, exist_ok = True)
+        for rank, config in enumerate(configs):
+            with open(os.path.join(args.outputdir, "candidate-{}.json".format(rank + 1)), 'w') as configfile:
+                json.dump(config, configfile, indent = 2)
+    return selected
+
+if __name__ == "__main__":
+    main()
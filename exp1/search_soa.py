@@ -0,0 +1,55 @@
+import sys
+import argparse
+import json
+import random
+from typing import List
+from soadata import DataSystem
+from soarun import PreparedExperiment
+from soasearch import AnnealingSearch, DesignScore, SearchResult
+
+if not (sys.version_info.major == 3 and sys.version_info.minor >= 5):
+    print("This script requires Python 3.5 or higher!")
+    print("You are using Python {}.{}.".format(sys.version_info.major, sys.version_info.minor))
+    sys.exit(1)
+
+def parse_args(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description = 'Searches a cheaper design of generated data systems by simulated annealing over their classes and services')
+    parser.add_argument("-c", "--configfile", help="the json configuration file", required = True)
+    parser.add_argument("-n", "--systems", help="the number of data systems to generate and improve", type = int, default = 1)
+    parser.add_argument("--seed", help="seeds the data system i with seed + i, and its search with seed + i", type = int, default = 0)
+    parser.add_argument("--iterations", help="the number of mutations tried for each system", type = int, default = 2000)
+    parser.add_argument("--temperature", help="the initial temperature, relative to the initial score", type = float, default = 0.1)
+    parser.add_argument("--cooling", help="the factor applied to the temperature after each mutation", type = float, default = 0.998)
+    parser.add_argument("--crash-penalty", help="the score added for every data usage that crashes", type = float, default = 1000000.0)
+    parser.add_argument("-o", "--outputfile", help="a json lines file to append the result of each search to")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None)->List[SearchResult]:
+    args = parse_args(argv)
+    with open(args.configfile, 'r') as jsonfile:
+        wholeconfig = json.load(jsonfile)
+    prepared = PreparedExperiment(wholeconfig)
+    print(prepared.dataconfig)
+    score = DesignScore().set_crash_penalty(args.crash_penalty)
+    results = []
+    for i in range(args.systems):
+        random.seed(args.seed + i)
+        datasystem = DataSystem(prepared.dataconfig, service_cost = prepared.service_cost)
+        try:
+            datasystem.prepare()
+        except ValueError as e:
+            print("System {}: skipped, {}".format(args.seed + i, e))
+            continue
+        search = AnnealingSearch(score, seed = args.seed + i).set_iterations(args.iterations).set_initial_temperature(args.temperature).set_cooling(args.cooling)
+        initial_score = search.evaluate(datasystem)
+        result = search.run(datasystem)
+        print("System {}: initial score: {}, {}, {}".format(args.seed + i, initial_score, result, search.cache))
+        print(result.best.get_usage_overview())
+        results.append(result)
+        if args.outputfile is not None:
+            with open(args.outputfile, 'a') as outputfile:
+                outputfile.write(json.dumps(dict([("seed", args.seed + i), ("initial-score", initial_score)] + list(result.to_obj().items()))) + "\n")
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import sys
+import argparse
+import json
+from typing import List
+from soasensitivity import SensitivityAnalysis
+from soasurrogate import INT_RANGE_KEYS, RATIO_RANGE_KEYS
+
+if not (sys.version_info.major == 3 and sys.version_info.minor >= 5):
+    print("This script requires Python 3.5 or higher!")
+    print("You are using Python {}.{}.".format(sys.version_info.major, sys.version_info.minor))
+    sys.exit(1)
+
+def parse_args(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description = 'Ranks the range parameters of a configuration by their Sobol indices on the metrics of the experiment')
+    parser.add_argument("-c", "--configfile", help="the json configuration file, whose ranges are scaled", required = True)
+    parser.add_argument("-k", "--key", help="a range parameter to study, can be repeated, all of them by default", action = "append", choices = INT_RANGE_KEYS + RATIO_RANGE_KEYS)
+    parser.add_argument("-n", "--samples", help="the number of base samples, the evaluations are samples*(parameters + 2)", type = int, default = 64)
+    parser.add_argument("--spread", help="every range is scaled by a factor within [1/spread, spread]", type = float, default = 2.0)
+    parser.add_argument("--systems", help="the number of data systems by evaluation", type = int, default = 100)
+    parser.add_argument("--workers", help="the number of processes for the evaluations", type = int)
+    parser.add_argument("--bootstrap", help="the number of resamples for the confidence intervals", type = int, default = 200)
+    parser.add_argument("--seed", help="the seed of the design and of the data systems", type = int, default = 0)
+    parser.add_argument("-o", "--outputfile", help="a json file for the indices")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None):
+    args = parse_args(argv)
+    with open(args.configfile, 'r') as jsonfile:
+        wholeconfig = json.load(jsonfile)
+    analysis = SensitivityAnalysis(wholeconfig, args.key).set_samples(args.samples).set_spread(args.spread).set_systems(args.systems).set_bootstrap(args.bootstrap).set_seed(args.seed)
+    if args.workers is not None:
+        analysis.set_workers(args.workers)
+    indices = analysis.run()
+    print(analysis)
+    for metric_indices in indices.values():
+        print(metric_indices)
+    if args.outputfile is not None:
+        with open(args.outputfile, 'w') as outputfile:
+            json.dump([i.to_obj() for i in indices.values()], outputfile, indent = 2)
+    return indices
+
+if __name__ == "__main__":
+    main()
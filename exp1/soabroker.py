@@ -0,0 +1,264 @@
+from typing import List, Dict
+import json
+import socket
+import socketserver
+import threading
+import time
+from soadata import ExperimentSummary
+from soarun import run_experiment
+
+def run_unit(wholeconfig: dict, seed_start: int, seed_stop: int)->ExperimentSummary:
+    """ One data system for each seed of the range. A system only depends on its seed, whatever the split in units."""
+    return run_experiment(wholeconfig, seed_start, seed_stop - seed_start)
+
+class WorkUnit:
+    def __init__(self, unit_id: int, config_id: int, seed_start: int, seed_stop: int):
+        self.unit_id = unit_id
+        self.config_id = config_id
+        self.seed_start = seed_start
+        self.seed_stop = seed_stop
+        self.attempts = 0
+
+    def to_obj(self):
+        return { "id": self.unit_id, "config-id": self.config_id, "seed-start": self.seed_start, "seed-stop": self.seed_stop }
+
+    def __str__(self):
+        return "WorkUnit {}: config {}, seeds [{}, {})".format(self.unit_id, self.config_id, self.seed_start, self.seed_stop)
+
+class Coordinator:
+    """
+    Splits (config, seed range) work into units and leases them to workers.
+    A unit whose lease expires before completion goes back to the queue. Late results of a unit already completed are ignored.
+    The summaries of the units are kept apart and merged in the order of the units, so the totals do not depend on which worker finished first.
+    """
+    def __init__(self, lease_timeout: float = 60.0):
+        self.lease_timeout = lease_timeout
+        self.configs = []
+        self.units = {}
+        self.pending = []
+        self.leases = {}
+        # The unit of every lease handed out, expired ones included, to check the completions
+        self.lease_units = {}
+        self.completed = set([])
+        self.results = {}
+        self.lock = threading.Lock()
+        self.next_lease = 0
+        self.redispatched = 0
+
+    def add_config(self, wholeconfig: dict, seed_start: int, count: int, unit_size: int):
+        with self.lock:
+            config_id = len(self.configs)
+            self.configs.append(wholeconfig)
+            for start in range(seed_start, seed_start + count, unit_size):
+                unit = WorkUnit(len(self.units), config_id, start, min(start + unit_size, seed_start + count))
+                self.units[unit.unit_id] = unit
+                self.pending.append(unit.unit_id)
+        return self
+
+    def _expire_leases(self, now: float):
+        for lease_id, (unit_id, deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[lease_id]
+                if unit_id not in self.completed:
+                    self.pending.append(unit_id)
+                    self.redispatched += 1
+
+    def lease(self, worker: str)->dict:
+        with self.lock:
+            now = time.time()
+            self._expire_leases(now)
+            if self.is_done():
+                return { "done": True }
+            if len(self.pending) == 0:
+                return { "wait": min(1.0, self.lease_timeout / 4) }
+            unit = self.units[self.pending.pop(0)]
+            unit.attempts += 1
+            self.next_lease += 1
+            self.leases[self.next_lease] = (unit.unit_id, now + self.lease_timeout)
+            self.lease_units[self.next_lease] = unit.unit_id
+            return { "lease": self.next_lease, "unit": unit.to_obj(), "config": self.configs[unit.config_id], "timeout": self.lease_timeout }
+
+    def renew(self, lease_id: int)->dict:
+        with self.lock:
+            if lease_id not in self.leases:
+                return { "ok": False }
+            unit_id, _ = self.leases[lease_id]
+            self.leases[lease_id] = (unit_id, time.time() + self.lease_timeout)
+            return { "ok": True }
+
+    def complete(self, lease_id: int, unit_id: int, summary: dict)->dict:
+        """ Records the summary of a unit, from a lease of that unit, expired or not. Nothing changes when the request is invalid."""
+        with self.lock:
+            if unit_id not in self.units:
+                return { "ok": False, "error": "unknown unit {}".format(unit_id) }
+            if self.lease_units.get(lease_id) != unit_id:
+                return { "ok": False, "error": "lease {} is not a lease of unit {}".format(lease_id, unit_id) }
+            try:
+                result = ExperimentSummary.from_obj(summary)
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                return { "ok": False, "error": "invalid summary for unit {}: {}".format(unit_id, repr(e)) }
+            unit = self.units[unit_id]
+            if result.systems + result.errors != unit.seed_stop - unit.seed_start:
+                return { "ok": False, "error": "the summary of unit {} has {} systems, expected {}".format(unit_id, result.systems + result.errors, unit.seed_stop - unit.seed_start) }
+            self.leases.pop(lease_id, None)
+            if unit_id in self.completed:
+                return { "ok": True, "duplicate": True }
+            self.completed.add(unit_id)
+            if unit_id in self.pending:
+                self.pending.remove(unit_id)
+            self.results[unit_id] = result
+            return { "ok": True }
+
+    def get_summaries(self)->List[ExperimentSummary]:
+        """ The summary of each config, from the units completed so far """
+        with self.lock:
+            summaries = [ExperimentSummary() for _ in self.configs]
+            for unit_id in sorted(self.results.keys()):
+                summaries[self.units[unit_id].config_id].merge(self.results[unit_id])
+            return summaries
+
+    def is_done(self)->bool:
+        return len(self.completed) == len(self.units)
+
+    def status(self)->dict:
+        with self.lock:
+            return { "units": len(self.units), "completed": len(self.completed), "pending": len(self.pending), "leased": len(self.leases), "redispatched": self.redispatched }
+
+    def handle(self, message: dict)->dict:
+        if not isinstance(message, dict):
+            return { "error": "expected a json object" }
+        op = message.get("op")
+        if op == "lease":
+            return self.lease(message.get("worker", ""))
+        elif op == "renew":
+            return self.renew(int(message["lease"]))
+        elif op == "complete":
+            return self.complete(int(message["lease"]), int(message["unit"]), message["summary"])
+        elif op == "status":
+            return self.status()
+        return { "error": "unknown op {}".format(op) }
+
+class _CoordinatorHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                reply = self.server.coordinator.handle(json.loads(line))
+            except json.JSONDecodeError as e:
+                reply = { "error": "invalid json: {}".format(e) }
+            except KeyError as e:
+                reply = { "error": "missing field {}".format(e) }
+            except (ValueError, TypeError) as e:
+                reply = { "error": "invalid field: {}".format(e) }
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    """ JSON lines over TCP: one request per line, one reply per line """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, coordinator: Coordinator, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _CoordinatorHandler)
+        self.coordinator = coordinator
+
+    def get_port(self)->int:
+        return self.server_address[1]
+
+    def serve_until_done(self, poll_interval: float = 0.5):
+        thread = threading.Thread(target = self.serve_forever, args = (poll_interval,), daemon = True)
+        thread.start()
+        while not self.coordinator.is_done():
+            time.sleep(poll_interval)
+        # Let the workers see that there is nothing left before closing
+        time.sleep(poll_interval)
+        self.shutdown()
+        self.server_close()
+
+class BrokerClient:
+    def __init__(self, host: str, port: int, timeout: float = 30.0):
+        self.connection = socket.create_connection((host, port), timeout = timeout)
+        self.reader = self.connection.makefile("r", encoding = "utf-8")
+
+    def request(self, message: dict)->dict:
+        self.connection.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("The coordinator closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.reader.close()
+        self.connection.close()
+
+class Heartbeat:
+    """ Renews a lease every interval seconds in the background, while its unit runs """
+    def __init__(self, client: BrokerClient, lock: threading.Lock, lease_id: int, interval: float):
+        self.client = client
+        self.lock = lock
+        self.lease_id = lease_id
+        self.interval = interval
+        self.renewals = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target = self._run, daemon = True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                with self.lock:
+                    reply = self.client.request({ "op": "renew", "lease": self.lease_id })
+            except (ConnectionError, OSError):
+                return
+            if not reply.get("ok"):
+                # The lease expired and the unit went to another worker, finishing it is still useful
+                return
+            self.renewals += 1
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+class Worker:
+    """ Leases units from a coordinator, runs them while renewing their lease, and pushes back their summary """
+    def __init__(self, host: str, port: int, name: str = None):
+        self.host = host
+        self.port = port
+        self.name = name or "{}-{}".format(socket.gethostname(), id(self))
+        self.units_done = 0
+        self.renewals = 0
+
+    def run(self):
+        try:
+            client = BrokerClient(self.host, self.port)
+        except ConnectionError:
+            return self.units_done
+        lock = threading.Lock()
+        try:
+            while True:
+                with lock:
+                    reply = client.request({ "op": "lease", "worker": self.name })
+                if reply.get("done"):
+                    break
+                if "wait" in reply:
+                    time.sleep(reply["wait"])
+                    continue
+                unit = reply["unit"]
+                heartbeat = Heartbeat(client, lock, reply["lease"], reply["timeout"] / 3).start()
+                try:
+                    summary = run_unit(reply["config"], unit["seed-start"], unit["seed-stop"])
+                finally:
+                    heartbeat.stop()
+                    self.renewals += heartbeat.renewals
+                with lock:
+                    client.request({ "op": "complete", "lease": reply["lease"], "unit": unit["id"], "summary": summary.to_obj() })
+                self.units_done += 1
+        except ConnectionError:
+            pass
+        finally:
+            client.close()
+        return self.units_done
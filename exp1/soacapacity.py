@@ -0,0 +1,170 @@
+from typing import List
+from fractions import Fraction
+import numpy as np
+from soadata import DataSystem, DataUsageOverview, RatioRange
+
+class GrowthConfig:
+    """Monthly growth and seasonality applied to uniq_count and req_by_day"""
+    def __init__(self):
+        self.months = 60
+        self.uniq_growth_range = RatioRange(Fraction(0, 1), Fraction(0, 1))
+        self.req_growth_range = RatioRange(Fraction(0, 1), Fraction(0, 1))
+        self.uniq_seasonality = [1.0]*12
+        self.req_seasonality = [1.0]*12
+        self.percentiles = [50, 90, 99]
+
+    @classmethod
+    def from_obj(cls, content):
+        config = cls()
+        config.set_months(int(content["months"]))
+        config.set_uniq_growth_range(RatioRange.from_obj(content["uniq-growth-range"]))
+        config.set_req_growth_range(RatioRange.from_obj(content["req-growth-range"]))
+        if "uniq-seasonality" in content:
+            config.set_uniq_seasonality([float(Fraction(v)) for v in content["uniq-seasonality"]])
+        if "req-seasonality" in content:
+            config.set_req_seasonality([float(Fraction(v)) for v in content["req-seasonality"]])
+        if "percentiles" in content:
+            config.set_percentiles([float(v) for v in content["percentiles"]])
+        return config
+
+    def set_months(self, months: int):
+        self.months = months
+        return self
+
+    def set_uniq_growth_range(self, uniq_growth_range: RatioRange):
+        self.uniq_growth_range = uniq_growth_range
+        return self
+
+    def set_req_growth_range(self, req_growth_range: RatioRange):
+        self.req_growth_range = req_growth_range
+        return self
+
+    def set_uniq_seasonality(self, uniq_seasonality: List[float]):
+        self.uniq_seasonality = uniq_seasonality
+        return self
+
+    def set_req_seasonality(self, req_seasonality: List[float]):
+        self.req_seasonality = req_seasonality
+        return self
+
+    def set_percentiles(self, percentiles: List[float]):
+        self.percentiles = percentiles
+        return self
+
+    def __str__(self):
+        return "GrowthConfig: months: {}, uniq growth: {}, req growth: {}".format(self.months, self.uniq_growth_range, self.req_growth_range)
+
+class UsageArrays:
+    """ uniq_count, req_by_day and weight of the data usages of many systems, with the index of the system of each usage.
+    The usages of a system are contiguous."""
+    def __init__(self):
+        self.system_count = 0
+        self.systems = []
+        self.uniq_counts = []
+        self.req_by_days = []
+        self.weights = []
+
+    def add_overview(self, overview: DataUsageOverview):
+        table = overview.table
+        self.systems.extend([self.system_count]*len(table))
+        self.uniq_counts.extend(table.uniq_counts)
+        self.req_by_days.extend(table.req_by_days)
+        self.weights.extend(table.weights)
+        self.system_count += 1
+        return self
+
+    def add_datasystems(self, datasystems: List[DataSystem]):
+        for datasystem in datasystems:
+            self.add_overview(datasystem.get_usage_overview())
+        return self
+
+    def to_obj(self):
+        return { "system-count": self.system_count, "systems": self.systems, "uniq-counts": self.uniq_counts, "req-by-days": self.req_by_days, "weights": self.weights }
+
+    def restore(self, content):
+        """ Replaces the content in place, for the callbacks that hold these arrays """
+        self.system_count = int(content["system-count"])
+        self.systems = list(content["systems"])
+        self.uniq_counts = list(content["uniq-counts"])
+        self.req_by_days = list(content["req-by-days"])
+        self.weights = list(content["weights"])
+        return self
+
+    def to_numpy(self):
+        return (np.asarray(self.systems, dtype = np.int64),
+            np.asarray(self.uniq_counts, dtype = np.float64),
+            np.asarray(self.req_by_days, dtype = np.float64),
+            np.asarray(self.weights, dtype = np.float64))
+
+    def __len__(self):
+        return len(self.systems)
+
+class CapacityReport:
+    """ Storage and monthly data transfer (bytes) by system and month, with the fleet percentiles for each month"""
+    def __init__(self, storage: np.ndarray, transfer: np.ndarray, percentiles: List[float]):
+        self.storage = storage
+        self.transfer = transfer
+        self.percentiles = percentiles
+        self.storage_percentiles = np.percentile(storage, percentiles, axis = 0)
+        self.transfer_percentiles = np.percentile(transfer, percentiles, axis = 0)
+
+    def get_month_count(self)->int:
+        return self.storage.shape[1]
+
+    def to_rows(self)->List[dict]:
+        rows = []
+        for month in range(self.get_month_count()):
+            row = { "month": month }
+            for i, p in enumerate(self.percentiles):
+                row["storage_p{:g}".format(p)] = float(self.storage_percentiles[i, month])
+                row["transfer_p{:g}".format(p)] = float(self.transfer_percentiles[i, month])
+            rows.append(row)
+        return rows
+
+    def to_string(self):
+        lines = ["CapacityReport: systems: {}, months: {}".format(self.storage.shape[0], self.get_month_count())]
+        for month in range(0, self.get_month_count(), 12):
+            lines.append("month {}: storage (GB) {}, data transfer/month (GB) {}".format(
+                month,
+                [int(v // 1000000000) for v in self.storage_percentiles[:, month]],
+                [int(v // 1000000000) for v in self.transfer_percentiles[:, month]]))
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.to_string()
+
+class CapacityProjection:
+    """ Month by month projection of get_weighted_data_storage and get_monthly_weighted_data_transfer.
+
+    Each usage gets its own growth rates, drawn from the growth ranges. Usages are processed in chunks
+    of (usages x months) arrays and summed by system, so memory depends on the chunk size only."""
+    def __init__(self, growth: GrowthConfig, seed: int = None, chunk_size: int = 65536):
+        self.growth = growth
+        self.rng = np.random.default_rng(seed)
+        self.chunk_size = chunk_size
+
+    def _random_rates(self, rate_range: RatioRange, count: int)->np.ndarray:
+        return self.rng.uniform(float(rate_range.start), float(rate_range.stop), count)
+
+    def _factors(self, rates: np.ndarray, seasonality: List[float])->np.ndarray:
+        months = np.arange(self.growth.months)
+        season = np.resize(np.asarray(seasonality, dtype = np.float64), self.growth.months)
+        return np.exp(np.outer(np.log1p(rates), months))*season
+
+    def project(self, arrays: UsageArrays)->CapacityReport:
+        systems, uniq_counts, req_by_days, weights = arrays.to_numpy()
+        months = self.growth.months
+        storage = np.zeros((arrays.system_count, months))
+        transfer = np.zeros((arrays.system_count, months))
+        for start in range(0, len(systems), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            count = len(systems[chunk])
+            uniq_rates = self._random_rates(self.growth.uniq_growth_range, count)
+            req_rates = self._random_rates(self.growth.req_growth_range, count)
+            chunk_storage = self._factors(uniq_rates, self.growth.uniq_seasonality)*(uniq_counts[chunk]*weights[chunk])[:, None]
+            chunk_transfer = self._factors(req_rates, self.growth.req_seasonality)*(req_by_days[chunk]*weights[chunk]*30)[:, None]
+            chunk_systems = systems[chunk]
+            starts = np.flatnonzero(np.r_[True, chunk_systems[1:] != chunk_systems[:-1]])
+            storage[chunk_systems[starts]] += np.add.reduceat(chunk_storage, starts, axis = 0)
+            transfer[chunk_systems[starts]] += np.add.reduceat(chunk_transfer, starts, axis = 0)
+        return CapacityReport(storage, transfer, self.growth.percentiles)
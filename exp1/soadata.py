@@ -1,9 +1,17 @@
+import sys
 from fractions import Fraction
-from typing import List, Tuple, Set
+from decimal import Decimal, localcontext
+from typing import List, Tuple, Set, Dict, Callable
 from enum import Enum, auto
-from random import sample, choice, randint, uniform
+from random import sample, choice, randint, uniform, Random
+import random
 from collections import Counter
-from math import log, floor, ceil
+from array import array
+from functools import reduce
+from operator import mul, or_
+from math import log, log1p, floor, ceil
+from hashlib import blake2b
+from time import perf_counter
 
 def add_magnitude(a: int, b: int)->int:
     """ Simplification of 2^a+ 2^b"""
@@ -58,6 +66,25 @@ class DataPropertyType:
 
 intDataPropertyType= DataPropertyType("Int")
 
+_type_pool = {}
+_ref_type_pool = {}
+
+def pooled_type(datatype: str)->DataPropertyType:
+    """ A DataPropertyType shared by every system of the process. Its datatype must not be changed."""
+    found = _type_pool.get(datatype)
+    if found is None:
+        found = DataPropertyType(sys.intern(datatype))
+        _type_pool[found.datatype] = found
+    return found
+
+def pooled_ref_type(servicename: str, dataname: str)->DataPropertyType:
+    """ Same as pooled_type for servicename:dataname, without formatting the string once it is pooled """
+    found = _ref_type_pool.get((servicename, dataname))
+    if found is None:
+        found = pooled_type(servicename + ":" + dataname)
+        _ref_type_pool[(servicename, dataname)] = found
+    return found
+
 class DataProperty:
     """A property
     Example: colors : Int[3, 3] """
@@ -108,21 +135,26 @@ class DataProperty:
     
 
 class DataClass:
-    """A data class containing a list of properties """
+    """A data class containing a list of properties.
+    Change it with set_name, set_properties and add, so that its frozen snapshot follows. """
     def __init__(self):
         self.name = ""
         self.properties = set([])
+        self.frozen = None
 
     def set_name(self, name: str):
         self.name = name
+        self.frozen = None
         return self
 
     def set_properties(self, props: Set[DataProperty]):
         self.properties = props
+        self.frozen = None
         return self
     
     def add(self, prop: DataProperty):
         self.properties.add(prop)
+        self.frozen = None
         return self
 
     def to_string(self):
@@ -137,8 +169,8 @@ class DataClass:
     def __eq__(self, other):
         return (self.name, self.properties) == (other.name, other.properties)
     
-    def __hash__(self):
-        return hash((self.name, self.properties))
+    # Mutable, so not hashable: freeze() gives a hashable snapshot
+    __hash__ = None
     
     def __len__(self):
         return len(self.properties)
@@ -152,6 +184,52 @@ class DataClass:
     def get_weight(self)->int:
         return sum([p.get_weight() for p in self.properties])
 
+    def freeze(self):
+        """ The immutable snapshot of the class, kept until the next change """
+        if self.frozen is None:
+            self.frozen = FrozenDataClass(self.name, frozenset([(p.name, p.datatype.datatype, p.min_items, p.max_items) for p in self.properties]))
+        return self.frozen
+
+class FrozenDataClass:
+    """
+    An immutable snapshot of a DataClass, with properties as (name, datatype, min_items, max_items) tuples.
+    Equality and hash use the names. The fingerprint, computed once, ignores the names of the class, of its properties and of their types,
+    so classes with the same shape share it. refs lists (min_items, max_items, service name, class name) for each reference property.
+    """
+    __slots__ = ("name", "properties", "fingerprint", "refs", "_hash")
+
+    def __init__(self, name: str, properties: frozenset):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "properties", properties)
+        shape = sorted([(min_items, max_items, ":" in datatype) for _, datatype, min_items, max_items in properties])
+        object.__setattr__(self, "fingerprint", blake2b(repr(shape).encode("utf-8"), digest_size = 16).hexdigest())
+        object.__setattr__(self, "refs", tuple(sorted([(min_items, max_items) + tuple(datatype.split(":")) for _, datatype, min_items, max_items in properties if ":" in datatype])))
+        object.__setattr__(self, "_hash", hash((name, properties)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenDataClass is immutable")
+
+    def thaw(self)->DataClass:
+        dataclass = DataClass().set_name(self.name)
+        for name, datatype, min_items, max_items in sorted(self.properties):
+            dataclass.add(DataProperty().set_name(name).set_datatype(pooled_type(datatype)).set_min_items(min_items).set_max_items(max_items))
+        return dataclass
+
+    def __eq__(self, other):
+        return isinstance(other, FrozenDataClass) and (self.name, self.properties) == (other.name, other.properties)
+
+    def __hash__(self):
+        return self._hash
+
+    def __len__(self):
+        return len(self.properties)
+
+    def __str__(self):
+        return "FrozenDataClass {}: {} properties, fingerprint {}".format(self.name, len(self), self.fingerprint)
+
+    def __repr__(self):
+        return self.__str__()
+
 class DataFeature:
     """A feature that can be added to a service"""
     def __init__(self):
@@ -208,6 +286,64 @@ class DataRequirement:
     def __hash__(self):
         return hash((self.name, self.category_name))
 
+class FloatNumeric:
+    """ Rates and costs as floats, the default """
+    name = "float"
+
+    def ratio(self, numerator: int, denominator: int)->float:
+        return numerator / denominator
+
+    def number(self, value: Fraction)->float:
+        return float(value)
+
+    def log(self, value, base: int)->float:
+        return log(value, base)
+
+class ExactNumeric:
+    """
+    Rates and costs as Fractions, to verify the float results.
+    Logarithms are exact for exact powers of the base. The others are computed with decimal to log_digits significant digits,
+    for values that are not within 10**-GUARD_DIGITS of 1, and kept as the Fraction of that decimal.
+    """
+    name = "exact"
+    GUARD_DIGITS = 20
+
+    def __init__(self, log_digits: int = 40):
+        self.log_digits = log_digits
+
+    def ratio(self, numerator: int, denominator: int)->Fraction:
+        return Fraction(numerator, denominator)
+
+    def number(self, value: Fraction)->Fraction:
+        return Fraction(value)
+
+    def _exact_log(self, value: Fraction, base: int):
+        value = Fraction(value)
+        if value <= 0:
+            return None
+        sign = 1
+        if value < 1:
+            value, sign = 1 / value, -1
+        if value.denominator != 1:
+            return None
+        n, exponent = value.numerator, 0
+        while n % base == 0:
+            n, exponent = n // base, exponent + 1
+        return Fraction(sign*exponent) if n == 1 else None
+
+    def log(self, value, base: int)->Fraction:
+        exact = self._exact_log(value, base)
+        if exact is not None:
+            return exact
+        value = Fraction(value)
+        with localcontext() as context:
+            context.prec = self.log_digits + self.GUARD_DIGITS
+            result = (Decimal(value.numerator) / Decimal(value.denominator)).ln() / Decimal(base).ln()
+            context.prec = self.log_digits
+            return Fraction(+result)
+
+NUMERIC_BACKENDS = { "float": FloatNumeric(), "exact": ExactNumeric() }
+
 class DataService:
     """A data service attached to a service """
     def __init__(self):
@@ -251,6 +387,11 @@ class DataService:
         self.requirements = requirements
         return self
 
+    def get_structure(self)->tuple:
+        """ Everything that matters to the evaluations, without the names of the service and of its features. Services with the same structure can stand for each other."""
+        return (self.processing_magnitude, self.error_processing_magnitude, float(self.error_rate), self.max_memory_byte, self.timeout_magnitude,
+            sorted([f.category_name for f in self.features]), sorted([r.category_name for r in getattr(self, "requirements", [])]))
+
     def to_string(self):
         return "Service {}: processing_magnitude = {}, error_processing_magnitude = {}, timeout_magnitude {}, error_rate = {}, memory(bytes) {}, features: {}, requirements: {}".format(
             self.name,
@@ -277,26 +418,66 @@ class DataService:
 
     def rand_error_rate(self)->bool:
         """ Return true if the error rate has been triggered"""
-        alea = randint(1, self.error_rate.denominator)
-        return alea <= self.error_rate.numerator
+        error_rate = Fraction(self.error_rate)
+        alea = randint(1, error_rate.denominator)
+        return alea <= error_rate.numerator
+
+    def sample_error_positions(self, count: int, sampler = None)->List[int]:
+        """ Positions of the failed requests among count requests"""
+        return (sampler or FailureSampler()).positions(self.error_rate, count)
+
+class FailureSampler:
+    """ Samples the failed requests for an error rate by jumping from one failure to the next.
+    The gaps between failures follow a geometric distribution, so the cost depends on the number of failures only."""
+    def __init__(self, rng: Random = None):
+        self.rng = rng or random
+
+    def _gap(self, log_success: float)->int:
+        """ Number of successful requests before the next failure"""
+        return int(floor(log(1.0 - self.rng.random()) / log_success))
+
+    def positions(self, error_rate: Fraction, count: int)->List[int]:
+        rate = float(error_rate)
+        if rate <= 0 or count <= 0:
+            return []
+        if rate >= 1:
+            return list(range(count))
+        log_success = log1p(-rate)
+        found = []
+        position = self._gap(log_success)
+        while position < count:
+            found.append(position)
+            position += 1 + self._gap(log_success)
+        return found
+
+    def count(self, error_rate: Fraction, count: int)->int:
+        return len(self.positions(error_rate, count))
+
+    def service_positions(self, service: DataService, count: int)->List[int]:
+        return self.positions(service.error_rate, count)
+
+    def system_positions(self, services: List[DataService], request_counts: Dict[str, int])->Dict[str, List[int]]:
+        """ Failed request positions by service name, for the number of requests received by each service"""
+        return dict([(s.name, self.positions(s.error_rate, request_counts.get(s.name, 0))) for s in services])
 
 class DataPropertyTypeRepo:
     def __init__(self):
-        self.simple_store = set([])
-        self.ref_store = set([])
+        # dicts are used as insertion ordered sets so that random choices do not depend on the string hash seed
+        self.simple_store = {}
+        self.ref_store = {}
     
     def add(self, dataPropertyType: DataPropertyType):
         if (dataPropertyType.is_ref()):
-            self.ref_store.add(dataPropertyType)
+            self.ref_store[dataPropertyType] = None
         else:
-            self.simple_store.add(dataPropertyType)
+            self.simple_store[dataPropertyType] = None
         return self
     
     def discard(self, dataPropertyType: DataPropertyType):
         if (dataPropertyType.is_ref()):
-            self.ref_store.discard(dataPropertyType)
+            self.ref_store.pop(dataPropertyType, None)
         else:
-            self.simple_store.discard(dataPropertyType)
+            self.simple_store.pop(dataPropertyType, None)
         return self
     
     def __len__(self):
@@ -310,7 +491,12 @@ class DataPropertyTypeRepo:
 
     def add_types(self, types: List[str]):
         for t in types:
-            self.add(DataPropertyType(t))
+            self.add(pooled_type(t))
+        return self
+
+    def add_pooled_types(self, types: List[DataPropertyType]):
+        for t in types:
+            self.add(t)
         return self
 
     def add_types_as_str(self, types: str):
@@ -331,23 +517,60 @@ class DataPropertyTypeRepo:
     def random_type(self, isref: bool)->DataPropertyType:
         return self.random_ref_type() if isref else self.random_simple_type()
 
+class NamePool:
+    """
+    The names pattern.format(n) for n = 0, 1, ..., formatted and interned once for the process.
+    It grows as needed; reserve grows it ahead, to the largest size a config can ask for.
+    """
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.names = []
+
+    def reserve(self, size: int):
+        if size > len(self.names):
+            self.names.extend([sys.intern(self.pattern.format(n)) for n in range(len(self.names), size)])
+        return self
+
+    def get(self, n: int)->str:
+        if n >= len(self.names):
+            self.reserve(max(n + 1, 2*len(self.names)))
+        return self.names[n]
+
+    def slice(self, start: int, stop: int)->List[str]:
+        if stop > len(self.names):
+            self.reserve(max(stop, 2*len(self.names)))
+        return self.names[start:stop]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __str__(self):
+        return "NamePool: {}, size {}".format(self.pattern, len(self))
+
+PROPERTY_NAME_POOL = NamePool("Name{}")
+CLASS_NAME_POOL = NamePool("ClassName{}")
+FEATURE_NAME_POOL = NamePool("Feature{}")
+REQUIREMENT_NAME_POOL = NamePool("Requirement{}")
+SERVICE_NAME_POOL = NamePool("Service{}")
+TYPE_NAME_POOL = NamePool("Type{}")
+
 class DataPropertyNameRepo:
     """ These are usually human readable and are re-used across classes but not necessarily in a consistent manner. Ex: name, description, ... """
     def __init__(self):
         self.counter = 0
-        self.names = set([])
+        self.names = {}
     
     def add_name(self, name: str):
-        self.names.add(name)
+        self.names[name] = None
         return name
 
     def add_next_name(self):
         self.counter = self.counter + 1
-        return self.add_name("Name{}".format(self.counter))
+        return self.add_name(PROPERTY_NAME_POOL.get(self.counter))
 
     def add_names_auto(self, count: int):
-        for _ in range(count):
-            self.add_next_name()
+        self.names.update(dict.fromkeys(PROPERTY_NAME_POOL.slice(self.counter + 1, self.counter + count + 1)))
+        self.counter = self.counter + count
         return self
 
     def __len__(self):
@@ -366,15 +589,15 @@ class DataClassNameRepo:
     """ These are usually human readable and are re-used across classes but not necessarily in a consistent manner. Ex: Person, ... """
     def __init__(self):
         self.counter = 0
-        self.names = set([])
+        self.names = {}
     
     def add_name(self, name: str):
-        self.names.add(name)
+        self.names[name] = None
         return name
 
     def add_next_name(self):
         self.counter = self.counter + 1
-        return self.add_name("ClassName{}".format(self.counter))
+        return self.add_name(CLASS_NAME_POOL.get(self.counter))
 
     def add_names_auto(self, count: int):
         for i in range(count):
@@ -401,15 +624,15 @@ class DataFeatureNameRepo:
     """ These could human readable and are re-used across classes but not necessarily in a consistent manner. Ex: persistence1, ... """
     def __init__(self):
         self.counter = 0
-        self.names = set([])
+        self.names = {}
     
     def add_name(self, name: str):
-        self.names.add(name)
+        self.names[name] = None
         return name
 
     def add_next_name(self):
         self.counter = self.counter + 1
-        return self.add_name("Feature{}".format(self.counter))
+        return self.add_name(FEATURE_NAME_POOL.get(self.counter))
 
     def add_names_auto(self, count: int):
         for i in range(count):
@@ -429,15 +652,15 @@ class DataRequirementNameRepo:
     """ These could human readable and are re-used across classes but not necessarily in a consistent manner. Ex: persistence1, ... """
     def __init__(self):
         self.counter = 0
-        self.names = set([])
+        self.names = {}
     
     def add_name(self, name: str):
-        self.names.add(name)
+        self.names[name] = None
         return name
 
     def add_next_name(self):
         self.counter = self.counter + 1
-        return self.add_name("Requirement{}".format(self.counter))
+        return self.add_name(REQUIREMENT_NAME_POOL.get(self.counter))
 
     def add_names_auto(self, count: int):
         for i in range(count):
@@ -552,15 +775,15 @@ class DataServiceNameRepo:
     """ These could human readable and are re-used across classes but not necessarily in a consistent manner. Ex: PersonDB, ... """
     def __init__(self):
         self.counter = 0
-        self.names = set([])
+        self.names = {}
     
     def add_name(self, name: str):
-        self.names.add(name)
+        self.names[name] = None
         return name
 
     def add_next_name(self):
         self.counter = self.counter + 1
-        return self.add_name("Service{}".format(self.counter))
+        return self.add_name(SERVICE_NAME_POOL.get(self.counter))
 
     def add_names_auto(self, count: int):
         for i in range(count):
@@ -643,13 +866,15 @@ class RatioRange:
     def __init__(self, start: Fraction, stop: Fraction):
         self.start = start
         self.stop = stop
+        self.float_start = float(start)
+        self.float_stop = float(stop)
 
     @classmethod
     def from_obj(cls, content):
         return cls(Fraction(content["start"]), Fraction(content["stop"]))
 
     def random_float(self)->float:
-        return uniform(float(self.start), float(self.stop))
+        return uniform(self.float_start, self.float_stop)
 
     def random_int(self, scale: int)->int:
         return int(self.random_float()*scale)
@@ -729,12 +954,133 @@ class DataUsage:
         return (self.datatype, self.uniq_count, self.req_by_day) == (other.datatype, other.uniq_count, other.req_by_day)
 
     def __hash__(self):
-        return hash(self.datatype, self.uniq_count, self.req_by_day)
+        return hash((self.datatype, self.uniq_count, self.req_by_day))
     
+# Each reason of crash is a bit of DataUsageTable.crash_masks
+CRASH_REASONS = ["timeout"]
+
+def crash_mask(crashes)->int:
+    mask = 0
+    for crash in crashes:
+        if crash not in CRASH_REASONS:
+            CRASH_REASONS.append(crash)
+        mask |= 1 << CRASH_REASONS.index(crash)
+    return mask
+
+def crash_reasons(mask: int)->Set[str]:
+    return set([reason for i, reason in enumerate(CRASH_REASONS) if mask & (1 << i)])
+
+class _Interned:
+    """ Distinct values, each with its index """
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def get_id(self, value)->int:
+        found = self.ids.get(value)
+        if found is None:
+            found = len(self.values)
+            self.ids[value] = found
+            self.values.append(value)
+        return found
+
+class DataUsageTable:
+    """
+    The data usages of a system as typed columns, one row by usage.
+    Datatypes, service costs and category names are stored once and referenced by id.
+    The categories of the row i are feature_ids[feature_offsets[i]:feature_offsets[i+1]], in the style of a CSR matrix.
+    """
+    def __init__(self):
+        self.datatypes = _Interned()
+        self.costs = _Interned()
+        self.categories = _Interned()
+        self.type_ids = array('i')
+        self.uniq_counts = array('q')
+        self.req_by_days = array('q')
+        self.weights = array('q')
+        self.processing_magnitudes = array('i')
+        self.cost_ids = array('i')
+        self.crash_masks = array('I')
+        self.feature_offsets = array('i', [0])
+        self.feature_ids = array('i')
+        self.requirement_offsets = array('i', [0])
+        self.requirement_ids = array('i')
+
+    def append(self, datatype: DataPropertyType, uniq_count: int, req_by_day: int, weight: int, processing_magnitude: int, service_cost: Fraction, crashes: Set[str], feature_categories: List[str], requirement_categories: List[str]):
+        self.type_ids.append(self.datatypes.get_id(datatype))
+        self.uniq_counts.append(uniq_count)
+        self.req_by_days.append(req_by_day)
+        self.weights.append(weight)
+        self.processing_magnitudes.append(processing_magnitude)
+        self.cost_ids.append(self.costs.get_id(service_cost))
+        self.crash_masks.append(crash_mask(crashes))
+        self.feature_ids.extend([self.categories.get_id(c) for c in feature_categories])
+        self.feature_offsets.append(len(self.feature_ids))
+        self.requirement_ids.extend([self.categories.get_id(c) for c in requirement_categories])
+        self.requirement_offsets.append(len(self.requirement_ids))
+        return self
+
+    def append_usage(self, usage: DataUsage):
+        return self.append(usage.datatype, usage.uniq_count, usage.req_by_day, usage.weight, usage.processing_magnitude, usage.service_cost, usage.crashes, usage.feature_categories, usage.requirement_categories)
+
+    def get_usage(self, i: int)->DataUsage:
+        """ The row i as a DataUsage """
+        usage = DataUsage(self.datatypes.values[self.type_ids[i]])
+        usage.set_uniq_count(self.uniq_counts[i]).set_req_by_day(self.req_by_days[i]).set_weight(self.weights[i])
+        usage.set_processing_magnitude(self.processing_magnitudes[i]).set_service_cost(self.costs.values[self.cost_ids[i]])
+        usage.crashes = crash_reasons(self.crash_masks[i])
+        usage.set_feature_categories([self.categories.values[c] for c in self.feature_ids[self.feature_offsets[i]:self.feature_offsets[i+1]]])
+        usage.set_requirement_categories([self.categories.values[c] for c in self.requirement_ids[self.requirement_offsets[i]:self.requirement_offsets[i+1]]])
+        return usage
+
+    def get_datatype(self, i: int)->DataPropertyType:
+        return self.datatypes.values[self.type_ids[i]]
+
+    def get_data_storage(self)->int:
+        return sum(map(mul, self.uniq_counts, self.weights))
+
+    def get_monthly_data_transfer(self)->int:
+        return sum(map(mul, self.req_by_days, self.weights))*30
+
+    def get_processing_magnitude(self)->int:
+        return max(self.processing_magnitudes, default = 0)
+
+    def get_service_cost(self):
+        """
+        The sum of cost times requests by day. Fraction costs are exact in any order, so there is one multiplication by distinct cost.
+        Float costs are added row by row, in the order of the usages, to round like the sum over the DataUsage objects.
+        """
+        if all([isinstance(cost, Fraction) for cost in self.costs.values]):
+            req_by_cost = [0]*len(self.costs.values)
+            for cost_id, req_by_day in zip(self.cost_ids, self.req_by_days):
+                req_by_cost[cost_id] += req_by_day
+            return sum([cost*req for cost, req in zip(self.costs.values, req_by_cost)], Fraction(0, 1))
+        costs = self.costs.values
+        return sum([costs[cost_id]*req_by_day for cost_id, req_by_day in zip(self.cost_ids, self.req_by_days)], Fraction(0, 1))
+
+    def get_crash_mask(self)->int:
+        return reduce(or_, self.crash_masks, 0)
+
+    def get_crash_count(self)->int:
+        """ The number of (usage, reason) crashes """
+        return sum([bin(mask).count("1") for mask in self.crash_masks if mask != 0])
+
+    def _count_categories(self, ids: array)->Counter:
+        return Counter(dict([(self.categories.values[c], count) for c, count in Counter(ids).items()]))
+
+    def get_feature_categories(self)->Counter:
+        return self._count_categories(self.feature_ids)
+
+    def get_requirement_categories(self)->Counter:
+        return self._count_categories(self.requirement_ids)
+
+    def __len__(self):
+        return len(self.type_ids)
+
 class DataUsageOverview:
-    """A data class containing a list of data usage """
+    """A data class containing a table of data usage """
     def __init__(self):
-        self.usages = []
+        self.table = DataUsageTable()
         self.data_storage = 0
         self.monthly_data_transfer = 0
         self.processing_magnitude = 0
@@ -742,13 +1088,20 @@ class DataUsageOverview:
         self.crashes = set([])
         self.feature_categories = Counter()
         self.requirement_categories = Counter()
+
+    @property
+    def usages(self)->List[DataUsage]:
+        """ The rows of the table as DataUsage objects, built on each access """
+        return [self.table.get_usage(i) for i in range(len(self.table))]
     
     def set_properties(self, usages: List[DataUsage]):
-        self.usages = usages
+        self.table = DataUsageTable()
+        for usage in usages:
+            self.table.append_usage(usage)
         return self
     
     def add(self, usage: DataUsage):
-        self.usages.append(usage)
+        self.table.append_usage(usage)
         return self
 
     def to_string(self):
@@ -769,23 +1122,132 @@ class DataUsageOverview:
         return self.to_string()
         
     def __len__(self):
-        return len(self.usages)
-
-    def summarise(self):
-        features = []
-        requirements = []
-        for usage in self.usages:
-            self.data_storage += usage.get_weighted_data_storage()
-            self.monthly_data_transfer += usage.get_monthly_weighted_data_transfer()
-            self.processing_magnitude = max(self.processing_magnitude, usage.processing_magnitude)
-            self.service_cost += usage.get_weighted_service_cost()
-            self.crashes = self.crashes.union(usage.crashes)
-            features += usage.feature_categories
-            requirements += usage.requirement_categories
-        self.feature_categories = Counter(features)
-        self.requirement_categories = Counter(requirements)
-       
-        print(self)
+        return len(self.table)
+
+    def summarise(self, verbose: bool = True):
+        self.data_storage = self.table.get_data_storage()
+        self.monthly_data_transfer = self.table.get_monthly_data_transfer()
+        self.processing_magnitude = self.table.get_processing_magnitude()
+        self.service_cost = self.table.get_service_cost()
+        self.crashes = crash_reasons(self.table.get_crash_mask())
+        self.feature_categories = self.table.get_feature_categories()
+        self.requirement_categories = self.table.get_requirement_categories()
+        if verbose:
+            print(self)
+        return self
+
+class ExperimentSummary:
+    """Aggregate of the summarised usage overviews of many data systems. Summaries can be merged."""
+    def __init__(self):
+        self.systems = 0
+        self.errors = 0
+        self.error_reasons = Counter()
+        self.usages = 0
+        self.data_storage = 0
+        self.monthly_data_transfer = 0
+        self.service_cost = 0.0
+        self.max_processing_magnitude = 0
+        self.crashes = Counter()
+        self.feature_categories = Counter()
+        self.requirement_categories = Counter()
+
+    def add_overview(self, overview: DataUsageOverview):
+        self.systems += 1
+        self.usages += len(overview)
+        self.data_storage += overview.data_storage
+        self.monthly_data_transfer += overview.monthly_data_transfer
+        self.service_cost += float(overview.service_cost)
+        self.max_processing_magnitude = max(self.max_processing_magnitude, overview.processing_magnitude)
+        self.crashes.update(overview.crashes)
+        self.feature_categories.update(overview.feature_categories)
+        self.requirement_categories.update(overview.requirement_categories)
+        return self
+
+    def add_error(self, error: Exception):
+        """ A data system that could not be generated, counted by message """
+        self.errors += 1
+        self.error_reasons[str(error)] += 1
+        return self
+
+    def merge(self, other):
+        self.systems += other.systems
+        self.errors += other.errors
+        self.error_reasons.update(other.error_reasons)
+        self.usages += other.usages
+        self.data_storage += other.data_storage
+        self.monthly_data_transfer += other.monthly_data_transfer
+        self.service_cost += other.service_cost
+        self.max_processing_magnitude = max(self.max_processing_magnitude, other.max_processing_magnitude)
+        self.crashes.update(other.crashes)
+        self.feature_categories.update(other.feature_categories)
+        self.requirement_categories.update(other.requirement_categories)
+        return self
+
+    def _mean(self, total)->float:
+        return total / self.systems if self.systems > 0 else 0.0
+
+    def get_mean_cost(self)->float:
+        return self._mean(self.service_cost)
+
+    def get_mean_storage(self)->float:
+        return self._mean(self.data_storage)
+
+    def get_mean_transfer(self)->float:
+        return self._mean(self.monthly_data_transfer)
+
+    def get_crash_rate(self, crash: str = "timeout")->float:
+        """ Ratio of systems with at least one crash of this kind"""
+        return self._mean(self.crashes[crash])
+
+    def get_metrics(self)->dict:
+        return {
+            "mean-cost": self.get_mean_cost(),
+            "mean-storage": self.get_mean_storage(),
+            "mean-transfer": self.get_mean_transfer(),
+            "timeout-crash-rate": self.get_crash_rate("timeout")
+        }
+
+    def to_obj(self):
+        return {
+            "systems": self.systems,
+            "errors": self.errors,
+            "error-reasons": dict(self.error_reasons),
+            "usages": self.usages,
+            "data-storage": self.data_storage,
+            "monthly-data-transfer": self.monthly_data_transfer,
+            "service-cost": self.service_cost,
+            "max-processing-magnitude": self.max_processing_magnitude,
+            "crashes": dict(self.crashes),
+            "feature-categories": dict(self.feature_categories),
+            "requirement-categories": dict(self.requirement_categories),
+            "metrics": self.get_metrics()
+        }
+
+    @classmethod
+    def from_obj(cls, content):
+        summary = cls()
+        summary.systems = int(content["systems"])
+        summary.errors = int(content.get("errors", 0))
+        summary.error_reasons = Counter(content.get("error-reasons", {}))
+        summary.usages = int(content["usages"])
+        summary.data_storage = int(content["data-storage"])
+        summary.monthly_data_transfer = int(content["monthly-data-transfer"])
+        summary.service_cost = float(content["service-cost"])
+        summary.max_processing_magnitude = int(content["max-processing-magnitude"])
+        summary.crashes = Counter(content["crashes"])
+        summary.feature_categories = Counter(content["feature-categories"])
+        summary.requirement_categories = Counter(content["requirement-categories"])
+        return summary
+
+    def to_string(self):
+        return "ExperimentSummary: systems: {}, errors: {}, usages: {}, mean storage (GB): {}, mean data transfer/month (GB): {}, mean cost: {}, timeout crash rate: {}".format(
+            self.systems, self.errors, self.usages, self.get_mean_storage() // 1000000000, self.get_mean_transfer() // 1000000000, self.get_mean_cost(), self.get_crash_rate("timeout"))
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return self.to_string()
 
 class DataSystemConfig:
     def __init__(self):
@@ -811,9 +1273,12 @@ class DataSystemConfig:
         self.timeout_magnitude_range = RandRange(20, 27)
         self.feature_category_names = []
         self.requirement_category_names = []
+        self.numeric = "float"
 
     def __str__(self):
         return ";".join([
+            "numeric=",
+            self.numeric,
             "datasystem_count=",
             str(self.datasystem_count),
             "simple_datatype_count_range=",
@@ -885,6 +1350,7 @@ class DataSystemConfig:
         config.set_timeout_magnitude_range(RandRange.from_obj(content["timeout-magnitude-range"]))
         config.set_feature_category_names(content["feature-category-names"])
         config.set_requirement_category_names(content["requirement-category-names"])
+        config.set_numeric(content.get("numeric", "float"))
         return config
 
     def set_datasystem_count(self, datasystem_count: int):
@@ -975,6 +1441,25 @@ class DataSystemConfig:
         self.requirement_category_names = category_names
         return self
 
+    def set_numeric(self, numeric: str):
+        """ float (fast) or exact (Fraction) """
+        if numeric not in NUMERIC_BACKENDS:
+            raise ValueError("Unknown numeric backend {}, expected one of {}".format(numeric, list(NUMERIC_BACKENDS.keys())))
+        self.numeric = numeric
+        return self
+
+    def get_numeric_backend(self):
+        return NUMERIC_BACKENDS[self.numeric]
+
+
+def reserve_name_pools(config: DataSystemConfig):
+    """ Grows the name pools to the upper bounds of the ranges of a config. A range can still draw above its bound, the pools then grow lazily."""
+    PROPERTY_NAME_POOL.reserve(config.reusable_property_count_range.stop + 1)
+    CLASS_NAME_POOL.reserve(config.class_count_range.stop + 1)
+    FEATURE_NAME_POOL.reserve(config.feature_count_range.stop + 1)
+    REQUIREMENT_NAME_POOL.reserve(config.requirement_count_range.stop + 1)
+    SERVICE_NAME_POOL.reserve(config.service_count_range.stop + 1)
+    TYPE_NAME_POOL.reserve(config.simple_datatype_count_range.stop)
 
 class ServiceAndClass:
     def __init__(self, service: DataService, dataclass: DataClass):
@@ -1040,8 +1525,10 @@ class ServiceCost:
     def __str__(self):
         return "ServiceCost: feature: {}, error rate {}, memory {}".format(self.feature_coeff, self.error_rate_coeff, self.max_memory_byte_coeff)
 
-    def get_cost(self, service: DataService)->Fraction:
-        higher_is_better = self.feature_coeff*len(service.features) + self.max_memory_byte_coeff*log(service.max_memory_byte, 5) - self.error_rate_coeff*log(service.error_rate, 10)
+    def get_cost(self, service: DataService, numeric = None):
+        """ A float, or a Fraction with the exact backend """
+        numeric = numeric or NUMERIC_BACKENDS["float"]
+        higher_is_better = numeric.number(self.feature_coeff)*len(service.features) + numeric.number(self.max_memory_byte_coeff)*numeric.log(service.max_memory_byte, 5) - numeric.number(self.error_rate_coeff)*numeric.log(service.error_rate, 10)
         return  higher_is_better
 
 class DataSystem:
@@ -1059,6 +1546,13 @@ class DataSystem:
         self.data_service_name_repo = DataServiceNameRepo()
         self.data_service_repo = DataServiceRepo()
         self.data_usage_overview = DataUsageOverview()
+        # The unique count and requests by day drawn for each class, by class name
+        self.class_workloads = {}
+        self.usages_stale = False
+        # The structural fingerprint, computed on demand by soafingerprint
+        self.fingerprint = None
+        self.numeric = config.get_numeric_backend()
+        reserve_name_pools(config)
 
     def get_services(self)->List[DataService]:
         return self.data_service_repo.get_services()
@@ -1069,6 +1563,10 @@ class DataSystem:
     def get_all_ref_datatypes(self)->Set[DataPropertyType]:
         return set([rt for rt in self.data_property_type_repo.ref_types_as_list()])
 
+    def get_ref_datatypes_as_list(self)->List[DataPropertyType]:
+        """ Same as get_all_ref_datatypes in insertion order """
+        return self.data_property_type_repo.ref_types_as_list()
+
     def get_used_ref_datatypes(self)->Set[DataPropertyType]:
         return self.data_class_repo.get_ref_datatypes()
 
@@ -1076,7 +1574,16 @@ class DataSystem:
         return self.get_all_ref_datatypes().difference(self.get_used_ref_datatypes())
 
     def get_usage_overview(self)-> DataUsageOverview:
+        """ The data usages, rebuilt first if the structure changed since they were computed """
+        if self.usages_stale:
+            self.refresh_data_usages()
         return self.data_usage_overview
+
+    def mark_structure_changed(self):
+        """ Drops the fingerprint and defers the rebuild of the data usages to the next get_usage_overview """
+        self.usages_stale = True
+        self.fingerprint = None
+        return self
     
     def add_dataclass_auto(self)->DataClass:
         dataClass = DataClass()
@@ -1120,7 +1627,7 @@ class DataSystem:
             dataService = self.add_dataservice_auto()
             dataService.set_processing_magnitude(self.config.proc_micro_sec_range.random())
             dataService.set_error_processing_magnitude(self.config.proc_micro_sec_range.random())
-            dataService.set_error_rate(Fraction(1, 10**self.config.error_rate_range.random()))
+            dataService.set_error_rate(self.numeric.ratio(1, 10**self.config.error_rate_range.random()))
             dataService.set_max_memory_byte(self.config.max_memory_byte_range.random())
             dataService.set_timeout_magnitude(self.config.timeout_magnitude_range.random())
             dataService.set_features([self.data_feature_repo.choice() for _ in range(self.config.service_feature_count_range.random())])
@@ -1135,12 +1642,12 @@ class DataSystem:
 
     def add_datatypes_auto(self):
         simple_count = self.config.simple_datatype_count_range.random()
-        simple_types = ["Type{}".format(i) for i in range(simple_count)]
-        min_ref_types = ["{}:{}".format(self.data_service_repo.choice().name, dataclassname) for dataclassname in self.data_class_name_repo.get_names()]
+        simple_types = [pooled_type(name) for name in TYPE_NAME_POOL.slice(0, simple_count)]
+        min_ref_types = [pooled_ref_type(self.data_service_repo.choice().name, dataclassname) for dataclassname in self.data_class_name_repo.get_names()]
         ref_count = self.config.ref_datatype_ratio_range.random_int(simple_count) - len(min_ref_types)
-        ref_types = ["{}:{}".format(self.data_service_repo.choice().name, self.data_class_name_repo.choice()) for _ in range(ref_count)]
+        ref_types = [pooled_ref_type(self.data_service_repo.choice().name, self.data_class_name_repo.choice()) for _ in range(ref_count)]
         created_types =  simple_types + min_ref_types + ref_types
-        self.data_property_type_repo.add_types(created_types)
+        self.data_property_type_repo.add_pooled_types(created_types)
         self.data_property_type_repo.add_types_as_str("Bool Char Int Float")
 
     def add_basic_dataclass_auto(self):
@@ -1159,37 +1666,58 @@ class DataSystem:
 
     def add_data_usage_auto(self):
         """ One data-usage by dataclass """
-        all = self.get_all_ref_datatypes()
+        all = self.get_ref_datatypes_as_list()
+        used = self.get_used_ref_datatypes()
+        for cl in self.data_class_repo.get_dataclasses():
+            self.class_workloads[cl.name] = (self.config.class_instance_count_range.random(), self.config.class_req_by_day_count_range.random())
+            self.add_data_usage(cl, all, used, *self.class_workloads[cl.name])
+
+    def refresh_data_usages(self):
+        """ Rebuilds the data usages after a change of structure, keeping the unique count and requests by day of each class """
+        self.data_usage_overview = DataUsageOverview()
+        all = self.get_ref_datatypes_as_list()
         used = self.get_used_ref_datatypes()
         for cl in self.data_class_repo.get_dataclasses():
-            somedatatypes = [dt for dt in all if dt.match_dataname(cl.name)]
-            selected = somedatatypes[0]
-            sc = ServiceAndClass.from_data_property_type(self.data_service_repo, self.data_class_repo, selected)
-            referenced = set(somedatatypes).intersection(used)
-            if len(referenced) > 0:
-                selected = list(referenced)[0]
-            data_usage = DataUsage(selected)
-            data_usage.set_uniq_count(self.config.class_instance_count_range.random())
-            data_usage.set_req_by_day(self.config.class_req_by_day_count_range.random())
-            weight = cl.get_weight()
-            data_usage.set_weight(weight)
-            data_usage.set_processing_magnitude(calculate_magnitude_recursively(self.data_service_repo, self.data_class_repo, limit = 6, magnitude = 0, proptype=selected))
-            data_usage.set_service_cost(self.service_cost.get_cost(sc.service))
-            data_usage.set_feature_categories([feat.category_name for feat in sc.service.features])
-            data_usage.set_requirement_categories([req.category_name for req in sc.service.requirements])
-            if data_usage.processing_magnitude >= sc.service.timeout_magnitude:
-                data_usage.add_crash("timeout")
-            self.data_usage_overview.add(data_usage)
+            self.add_data_usage(cl, all, used, *self.class_workloads[cl.name])
+        self.usages_stale = False
+        return self
+
+    def add_data_usage(self, cl: DataClass, all: List[DataPropertyType], used: Set[DataPropertyType], uniq_count: int, req_by_day: int):
+        """
+        The usage of a class goes through one of its datatypes, a referenced one if any, which gives the service for the magnitude and the cost.
+        Among several, the one with the smallest service structure is taken, so the choice depends neither on names nor on insertion order.
+        """
+        somedatatypes = [dt for dt in all if dt.match_dataname(cl.name)]
+        referenced = [dt for dt in somedatatypes if dt in used]
+        candidates = [ServiceAndClass.from_data_property_type(self.data_service_repo, self.data_class_repo, dt) for dt in referenced or somedatatypes]
+        selected, sc = min(zip(referenced or somedatatypes, candidates), key = lambda pair: pair[1].service.get_structure())
+        processing_magnitude = calculate_magnitude_recursively(self.data_service_repo, self.data_class_repo, limit = 6, magnitude = 0, proptype=selected)
+        crashes = ["timeout"] if processing_magnitude >= sc.service.timeout_magnitude else []
+        self.data_usage_overview.table.append(selected, uniq_count, req_by_day, cl.get_weight(), processing_magnitude, self.service_cost.get_cost(sc.service, self.numeric), crashes,
+            [feat.category_name for feat in sc.service.features], [req.category_name for req in sc.service.requirements])
  
-    def prepare(self):
-        self.add_property_names_auto()
-        self.add_basic_datafeature_auto()
-        self.add_basic_datarequirement_auto()
-        self.add_basic_dataservice_auto()
-        self.add_dataclass_names_auto()
-        self.add_datatypes_auto()
-        self.add_basic_dataclass_auto()
-        self.add_data_usage_auto()
+    def get_prepare_phases(self)->List[Tuple[str, Callable[[], None]]]:
+        """ The steps of prepare, in order """
+        return [
+            ("property-names", self.add_property_names_auto),
+            ("features", self.add_basic_datafeature_auto),
+            ("requirements", self.add_basic_datarequirement_auto),
+            ("services", self.add_basic_dataservice_auto),
+            ("class-names", self.add_dataclass_names_auto),
+            ("datatypes", self.add_datatypes_auto),
+            ("classes", self.add_basic_dataclass_auto),
+            ("data-usages", self.add_data_usage_auto)
+        ]
+
+    def prepare(self, on_phase: Callable[[str, float], None] = None):
+        """ on_phase, if any, receives the name and duration in seconds of each phase """
+        for name, phase in self.get_prepare_phases():
+            if on_phase is None:
+                phase()
+            else:
+                start = perf_counter()
+                phase()
+                on_phase(name, perf_counter() - start)
 
 
     def __str__(self):
@@ -0,0 +1,81 @@
+from typing import Dict, Callable
+from collections import OrderedDict
+from hashlib import blake2b
+from soadata import DataSystem, DataService, DataClass
+
+def _digest(content)->str:
+    return blake2b(repr(content).encode("utf-8"), digest_size = 16).hexdigest()
+
+def service_fingerprint(service: DataService)->str:
+    """ Everything of a service that matters to the evaluations, without the names of the service and of its features """
+    return _digest(service.get_structure())
+
+def class_fingerprints(datasystem: DataSystem, services: Dict[str, str] = None)->Dict[str, str]:
+    """
+    Fingerprint of each class by name, refined in the style of Weisfeiler-Lehman: a round mixes in the fingerprints of the referenced classes and their services.
+    The names of classes, properties and simple types are ignored, so isomorphic classes get the same fingerprint.
+    The first round reuses the fingerprint of the frozen classes, which are only rebuilt for the classes that changed.
+    """
+    services = services or dict([(s.name, service_fingerprint(s)) for s in datasystem.get_services()])
+    classes = [c.freeze() for c in datasystem.get_dataclasses()]
+    labels = dict([(c.name, c.fingerprint) for c in classes])
+    distinct = len(set(labels.values()))
+    for _ in range(len(classes)):
+        refined = {}
+        for c in classes:
+            refs = sorted([(min_items, max_items, services.get(servicename, "missing"), labels.get(dataname, "missing")) for min_items, max_items, servicename, dataname in c.refs])
+            refined[c.name] = _digest((labels[c.name], refs))
+        labels = refined
+        refined_distinct = len(set(labels.values()))
+        if refined_distinct == distinct:
+            break
+        distinct = refined_distinct
+    return labels
+
+def system_fingerprint(datasystem: DataSystem)->str:
+    """
+    A digest of the structure of a prepared system: its services, its classes, the ref datatypes of each class and the unique count and requests by day
+    drawn for it. The data usages are computed from these alone, so they are left out and need not be up to date.
+    Systems that only differ by names share it. It does not cover the ServiceCost, so mix it in when it varies.
+    It is kept in the system until mark_structure_changed.
+    """
+    if datasystem.fingerprint is not None:
+        return datasystem.fingerprint
+    services = dict([(s.name, service_fingerprint(s)) for s in datasystem.get_services()])
+    classes = class_fingerprints(datasystem, services)
+    used = datasystem.get_used_ref_datatypes()
+    datatypes = {}
+    for datatype in datasystem.get_ref_datatypes_as_list():
+        datatypes.setdefault(datatype.get_dataname(), []).append((services.get(datatype.get_service_name(), "missing"), datatype in used))
+    workloads = sorted([(classes[c.name], datasystem.class_workloads[c.name], sorted(datatypes.get(c.name, []))) for c in datasystem.get_dataclasses()])
+    datasystem.fingerprint = _digest((sorted(services.values()), sorted(classes.values()), workloads))
+    return datasystem.fingerprint
+
+class FingerprintCache:
+    """ Memoizes evaluations by fingerprint, keeping the max_size most recently used ones """
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: str, compute: Callable[[], object]):
+        if key in self.values:
+            self.hits += 1
+            self.values.move_to_end(key)
+            return self.values[key]
+        self.misses += 1
+        value = compute()
+        self.values[key] = value
+        if len(self.values) > self.max_size:
+            self.values.popitem(last = False)
+        return value
+
+    def __contains__(self, key: str):
+        return key in self.values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __str__(self):
+        return "FingerprintCache: size {}, hits {}, misses {}".format(len(self), self.hits, self.misses)
@@ -0,0 +1,194 @@
+from typing import List, Tuple, Dict, Callable
+from collections import deque
+import os
+import re
+import time
+
+SIZE_UNITS = { "": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40 }
+
+def parse_size(text: str)->int:
+    """ A number of bytes from 512M, 2G, 1.5G or 1048576 """
+    match = re.fullmatch(r"\s*([0-9]+(?:\.[0-9]+)?)\s*([KMGT]?)I?B?\s*", text.upper())
+    if match is None:
+        raise ValueError("Invalid memory size {}, expected for example 512M or 2G".format(text))
+    return int(float(match.group(1))*SIZE_UNITS[match.group(2)])
+
+def format_size(size: float)->str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(size) < 1024:
+            return "{:.1f}{}".format(size, unit)
+        size /= 1024
+    return "{:.1f}TB".format(size)
+
+def read_rss()->int:
+    """ The resident memory of the current process in bytes, from /proc on Linux or the high water mark elsewhere """
+    try:
+        with open("/proc/self/statm", 'r') as statm:
+            return int(statm.read().split()[1])*os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return maxrss if os.uname().sysname == "Darwin" else maxrss*1024
+
+class GovernorAdjustment:
+    def __init__(self, workers: int, chunk_size: int, previous_workers: int, previous_chunk_size: int, reason: str, estimate: dict):
+        self.time = time.time()
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.previous_workers = previous_workers
+        self.previous_chunk_size = previous_chunk_size
+        self.reason = reason
+        self.estimate = estimate
+
+    def to_obj(self):
+        return {
+            "time": self.time,
+            "workers": self.workers,
+            "chunk-size": self.chunk_size,
+            "previous-workers": self.previous_workers,
+            "previous-chunk-size": self.previous_chunk_size,
+            "reason": self.reason,
+            "estimate": self.estimate
+        }
+
+    def __str__(self):
+        return "MemoryGovernor: workers {} -> {}, chunk size {} -> {} ({}; per worker {}, per system peak {}, total {})".format(
+            self.previous_workers, self.workers, self.previous_chunk_size, self.chunk_size, self.reason,
+            format_size(self.estimate["per-worker"]), format_size(self.estimate["system-peak"]), format_size(self.estimate["total-rss"]))
+
+class MemoryGovernor:
+    """
+    Sizes the generation workers and their chunks to stay under a memory budget, from what the workers report after each chunk:
+    their resident memory, and the peak allocated by a sampled data system (tracemalloc), which covers what a larger system would add.
+    The workers start at min_workers and at most double at each step, but are cut as soon as the estimate or the measured total is over the budget.
+    The chunk size aims at target_chunk_seconds of work, so that an adjustment takes effect quickly, and is capped so that the records queued between stages stay small.
+    """
+    def __init__(self, budget_bytes: int, max_workers: int = None, min_workers: int = 1):
+        self.budget_bytes = budget_bytes
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_workers = min_workers
+        self.headroom = 0.85
+        self.safety = 1.5
+        self.queue_fraction = 0.05
+        self.min_chunk_size = 1
+        self.max_chunk_size = 256
+        self.target_chunk_seconds = 2.0
+        self.sample_every = 8
+        self.window = 64
+        self.log = print
+        self.adjustments = []
+        self.system_peaks = deque(maxlen = self.window)
+        self.worker_rss = {}
+        self.worker_base_rss = None
+        self.record_bytes = 0.0
+        self.seconds_per_system = None
+        self.over_budget_logged = False
+
+    def set_headroom(self, headroom: float):
+        """ The fraction of the budget that the estimate may use, the rest absorbs the systems larger than any sampled so far """
+        self.headroom = headroom
+        return self
+
+    def set_safety(self, safety: float):
+        """ The factor applied to the largest sampled system peak """
+        self.safety = safety
+        return self
+
+    def set_chunk_size_range(self, min_chunk_size: int, max_chunk_size: int):
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        return self
+
+    def set_target_chunk_seconds(self, seconds: float):
+        self.target_chunk_seconds = seconds
+        return self
+
+    def set_sample_every(self, sample_every: int):
+        """ Measures one data system out of sample_every in each worker, tracemalloc slows down the systems it measures """
+        self.sample_every = sample_every
+        return self
+
+    def set_log(self, log: Callable[[GovernorAdjustment], None]):
+        """ Called with every adjustment, print by default """
+        self.log = log
+        return self
+
+    def get_initial(self)->Tuple[int, int]:
+        """ The workers and chunk size to start with, before any measurement """
+        return self.min_workers, max(self.min_chunk_size, min(4, self.max_chunk_size))
+
+    def observe(self, worker: str, systems: int, busy_seconds: float, memory: dict):
+        """ A chunk reported by a worker: memory has rss, peak (0 when no system was sampled) and record-bytes """
+        self.worker_rss[worker] = memory["rss"]
+        if self.worker_base_rss is None or memory["rss"] < self.worker_base_rss:
+            self.worker_base_rss = memory["rss"]
+        if memory["peak"] > 0:
+            self.system_peaks.append(memory["peak"])
+        if memory["record-bytes"] > 0:
+            self.record_bytes = max(self.record_bytes, memory["record-bytes"])
+        if systems > 0:
+            seconds = busy_seconds / systems
+            self.seconds_per_system = seconds if self.seconds_per_system is None else 0.8*self.seconds_per_system + 0.2*seconds
+
+    def forget_worker(self, worker: str):
+        self.worker_rss.pop(worker, None)
+
+    def get_estimate(self, parent_rss: int)->dict:
+        system_peak = max(self.system_peaks) if len(self.system_peaks) > 0 else 0
+        base = self.worker_base_rss or 0
+        largest_worker = max(self.worker_rss.values()) if len(self.worker_rss) > 0 else 0
+        return {
+            "parent-rss": parent_rss,
+            "system-peak": system_peak,
+            "per-worker": max(largest_worker, base + self.safety*system_peak),
+            "total-rss": parent_rss + sum(self.worker_rss.values())
+        }
+
+    def _plan_workers(self, estimate: dict, workers: int)->Tuple[int, str]:
+        available = self.headroom*self.budget_bytes - estimate["parent-rss"]
+        if estimate["per-worker"] <= 0:
+            return workers, None
+        fitting = max(self.min_workers, min(self.max_workers, int(available // estimate["per-worker"])))
+        if estimate["total-rss"] > self.budget_bytes and workers > self.min_workers:
+            return min(fitting, workers - 1), "measured total over the budget of {}".format(format_size(self.budget_bytes))
+        if fitting < workers:
+            return fitting, "estimate over {:.0%} of the budget of {}".format(self.headroom, format_size(self.budget_bytes))
+        if fitting > workers:
+            return min(fitting, 2*workers), "room for more workers in the budget of {}".format(format_size(self.budget_bytes))
+        return workers, None
+
+    def _plan_chunk_size(self, workers: int, queue_depth: int, chunk_size: int)->int:
+        if self.seconds_per_system is None:
+            return chunk_size
+        wanted = self.target_chunk_seconds / max(self.seconds_per_system, 1e-9)
+        # Only moves by powers of two once off by a factor of two, so that the noise in the timings does not move it at every chunk
+        planned = chunk_size if chunk_size / 2 <= wanted < 2*chunk_size else 1 << (max(int(wanted), 1).bit_length() - 1)
+        if self.record_bytes > 0:
+            # The chunks in the result queue, the writer queue and the workers
+            planned = min(planned, int(self.queue_fraction*self.budget_bytes / ((2*queue_depth + workers)*self.record_bytes)))
+        return max(self.min_chunk_size, min(self.max_chunk_size, planned))
+
+    def adjust(self, workers: int, chunk_size: int, queue_depth: int, parent_rss: int)->Tuple[int, int]:
+        """ The workers and chunk size to use from now on. Every change is logged and kept in adjustments."""
+        estimate = self.get_estimate(parent_rss)
+        new_workers, reason = self._plan_workers(estimate, workers)
+        new_chunk_size = self._plan_chunk_size(new_workers, queue_depth, chunk_size)
+        if new_workers == workers and new_chunk_size == chunk_size:
+            if new_workers == self.min_workers and estimate["total-rss"] > self.budget_bytes and not self.over_budget_logged:
+                # Logged once, there is nothing left to cut
+                self.over_budget_logged = True
+                self._record(GovernorAdjustment(workers, chunk_size, workers, chunk_size, "over the budget of {} with the minimum of {} workers".format(format_size(self.budget_bytes), self.min_workers), estimate))
+            return workers, chunk_size
+        if reason is None:
+            reason = "about {:.1f}s by chunk".format(self.target_chunk_seconds)
+        self._record(GovernorAdjustment(new_workers, new_chunk_size, workers, chunk_size, reason, estimate))
+        return new_workers, new_chunk_size
+
+    def _record(self, adjustment: GovernorAdjustment):
+        self.adjustments.append(adjustment)
+        if self.log is not None:
+            self.log(adjustment)
+
+    def __str__(self):
+        return "MemoryGovernor: budget {}, workers {}-{}, adjustments {}".format(format_size(self.budget_bytes), self.min_workers, self.max_workers, len(self.adjustments))
@@ -0,0 +1,171 @@
+from typing import List, Dict
+from math import log, exp
+import numpy as np
+from soadata import DataSystem, DataService, DataPropertyType, ServiceAndClass
+
+class LogGrid:
+    """ size latencies from low to high in geometric progression.
+    A value is split between the two points around it, so any value is represented within ratio - 1 relative error."""
+    def __init__(self, low: float, high: float, size: int):
+        self.low = low
+        self.high = max(high, low)
+        self.size = size
+        self.log_ratio = log(self.high / self.low) / (size - 1) if self.high > self.low else 1.0
+        self.points = self.low*np.exp(np.arange(size)*self.log_ratio)
+        self.points[-1] = self.high
+
+    def get_relative_error(self)->float:
+        return exp(self.log_ratio) - 1.0
+
+    def spread(self, values: np.ndarray, weights: np.ndarray):
+        """ The pmf of the weighted values on the grid, keeping the mean, and the weight above the grid """
+        above = values > self.high*(1 + 1e-12)
+        overflow = float(weights[above].sum())
+        values = np.maximum(values[~above], self.low)
+        weights = weights[~above]
+        low = np.clip(np.floor(np.log(values / self.low) / self.log_ratio), 0, self.size - 1).astype(np.int64)
+        high = np.minimum(low + 1, self.size - 1)
+        span = self.points[high] - self.points[low]
+        upper = np.clip(np.divide(values - self.points[low], span, out = np.zeros(len(values)), where = span > 0), 0.0, 1.0)
+        pmf = np.bincount(low, weights = weights*(1 - upper), minlength = self.size) + np.bincount(high, weights = weights*upper, minlength = self.size)
+        return pmf, overflow
+
+class LatencyDistribution:
+    """A discretized latency distribution in micro seconds.
+
+    The pmf gives the probability of each point of a LogGrid, so the relative error is the same for fast and slow latencies.
+    The overflow is the probability of a latency beyond the grid, which is used for chains cut by the depth limit."""
+    def __init__(self, grid: LogGrid, pmf: np.ndarray, overflow: float = 0.0):
+        self.grid = grid
+        self.pmf = pmf
+        self.overflow = overflow
+
+    @classmethod
+    def from_spikes(cls, grid: LogGrid, spikes: List[tuple]):
+        """ Spikes are (latency, probability). Each one is split between its two closest points."""
+        pmf, overflow = grid.spread(np.array([latency for latency, _ in spikes], dtype = float), np.array([p for _, p in spikes], dtype = float))
+        return cls(grid, pmf, overflow)
+
+    @classmethod
+    def from_overflow(cls, grid: LogGrid):
+        return cls(grid, np.zeros(grid.size), 1.0)
+
+    def __len__(self):
+        return len(self.pmf)
+
+    def convolve(self, other):
+        """ Distribution of the sum of two independent latencies.
+        On a log grid a sum is not a circular convolution, so the one with fewer points is applied as shifts of the other: O(points*size)."""
+        spikes, shifted = (self, other) if np.count_nonzero(self.pmf) <= np.count_nonzero(other.pmf) else (other, self)
+        finite = (1.0 - self.overflow)*(1.0 - other.overflow)
+        points = np.flatnonzero(spikes.pmf)
+        values = (self.grid.points[points][:, None] + self.grid.points[None, :]).ravel()
+        weights = (spikes.pmf[points][:, None]*shifted.pmf[None, :]).ravel()
+        pmf, overflow = self.grid.spread(values, weights)
+        return LatencyDistribution(self.grid, pmf, 1.0 - finite + overflow)
+
+    def maximum(self, other):
+        """ Distribution of the maximum of two independent latencies"""
+        cdf = np.cumsum(self.pmf)*np.cumsum(other.pmf)
+        pmf = np.diff(cdf, prepend = 0.0)
+        return LatencyDistribution(self.grid, pmf, 1.0 - (1.0 - self.overflow)*(1.0 - other.overflow))
+
+    def quantile(self, q: float)->float:
+        """ The first point of the grid reaching the probability q, infinite if q falls in the overflow"""
+        cdf = np.cumsum(self.pmf)
+        index = int(np.searchsorted(cdf, q - 1e-12))
+        if index >= len(cdf):
+            return float("inf")
+        return float(self.grid.points[index])
+
+    def probability_above(self, latency: float)->float:
+        return float(self.pmf[self.grid.points > latency].sum()) + self.overflow
+
+    def mean(self)->float:
+        if self.overflow > 0:
+            return float("inf")
+        return float(np.dot(self.pmf, self.grid.points))
+
+class UsageLatency:
+    """Latency percentiles (micro seconds) for a data usage"""
+    def __init__(self, datatype: DataPropertyType, distribution: LatencyDistribution, timeout_magnitude: int):
+        self.datatype = datatype
+        self.distribution = distribution
+        self.p50 = distribution.quantile(0.5)
+        self.p99 = distribution.quantile(0.99)
+        self.p999 = distribution.quantile(0.999)
+        self.timeout_probability = distribution.probability_above(float(2 ** timeout_magnitude))
+
+    def to_string(self):
+        return "UsageLatency {}: p50: {:.1f}, p99: {:.1f}, p999: {:.1f}, timeout probability: {:.3e}, depth overflow: {:.3e}, resolution: {:.2%}".format(
+            self.datatype, self.p50, self.p99, self.p999, self.timeout_probability, self.distribution.overflow, self.distribution.grid.get_relative_error())
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return self.to_string()
+
+class LatencyEvaluator:
+    """ Alternative to calculate_magnitude_recursively that propagates latency distributions along the reference chains.
+
+    A service takes 2^processing_magnitude micro seconds, or 2^error_processing_magnitude with a probability of error_rate.
+    The latency of a call is the latency of its service followed by the slowest of its children, which are called in parallel.
+    """
+    def __init__(self, datasystem: DataSystem, size: int = 4096, depth_limit: int = 6):
+        self.datasystem = datasystem
+        self.size = size
+        self.depth_limit = depth_limit
+
+    def _service_and_class(self, proptype: DataPropertyType)->ServiceAndClass:
+        return ServiceAndClass.from_data_property_type(self.datasystem.data_service_repo, self.datasystem.data_class_repo, proptype)
+
+    def service_spikes(self, service: DataService)->List[tuple]:
+        error_rate = float(service.error_rate)
+        return [(float(2 ** service.processing_magnitude), 1.0 - error_rate), (float(2 ** service.error_processing_magnitude), error_rate)]
+
+    def worst_latency(self, proptype: DataPropertyType, limit: int, cache: Dict)->float:
+        """ Upper bound of the finite latencies, used to size the grid"""
+        key = (proptype.to_string(), limit)
+        if key not in cache:
+            sc = self._service_and_class(proptype)
+            own = max([latency for latency, _ in self.service_spikes(sc.service)])
+            children = sc.dataclass.get_ref_datatypes()
+            if len(children) == 0 or limit <= 0:
+                cache[key] = own
+            else:
+                cache[key] = own + max([self.worst_latency(dt, limit - 1, cache) for dt in children])
+        return cache[key]
+
+    def best_latency(self)->float:
+        """ Lower bound of the latencies: the fastest outcome of any service """
+        return min([min([latency for latency, _ in self.service_spikes(s)]) for s in self.datasystem.get_services()])
+
+    def distribution(self, proptype: DataPropertyType, grid: LogGrid, limit: int, cache: Dict)->LatencyDistribution:
+        key = (proptype.to_string(), limit)
+        if key not in cache:
+            sc = self._service_and_class(proptype)
+            own = LatencyDistribution.from_spikes(grid, self.service_spikes(sc.service))
+            children = sc.dataclass.get_ref_datatypes()
+            if len(children) == 0:
+                cache[key] = own
+            elif limit <= 0:
+                cache[key] = LatencyDistribution.from_overflow(grid)
+            else:
+                slowest = None
+                for dt in children:
+                    child = self.distribution(dt, grid, limit - 1, cache)
+                    slowest = child if slowest is None else slowest.maximum(child)
+                cache[key] = own.convolve(slowest)
+        return cache[key]
+
+    def usage_distribution(self, proptype: DataPropertyType)->LatencyDistribution:
+        grid = LogGrid(self.best_latency(), self.worst_latency(proptype, self.depth_limit, {}), self.size)
+        return self.distribution(proptype, grid, self.depth_limit, {})
+
+    def evaluate(self)->List[UsageLatency]:
+        results = []
+        for usage in self.datasystem.get_usage_overview().usages:
+            sc = self._service_and_class(usage.datatype)
+            results.append(UsageLatency(usage.datatype, self.usage_distribution(usage.datatype), sc.service.timeout_magnitude))
+        return results
@@ -0,0 +1,249 @@
+from typing import List, Dict
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import bisect
+import json
+import threading
+import time
+from soadata import DataUsageOverview, ExperimentSummary
+
+# Upper bounds in seconds, for the latencies of the prepare phases
+LATENCY_BUCKETS = [0.00001, 0.00003, 0.0001, 0.0003, 0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0]
+
+class _ThreadMetrics:
+    """ The counters of a single thread, updated under the lock of the registry so that a snapshot never reads them half updated """
+    def __init__(self, name: str):
+        self.name = name
+        self.systems = 0
+        self.errors = 0
+        self.usages = 0
+        self.busy_seconds = 0.0
+        self.crashes = Counter()
+        self.phase_counts = {}
+        self.phase_sums = {}
+
+    def observe_phase(self, phase: str, seconds: float):
+        counts = self.phase_counts.get(phase)
+        if counts is None:
+            counts = [0]*(len(LATENCY_BUCKETS) + 1)
+            self.phase_counts[phase] = counts
+            self.phase_sums[phase] = 0.0
+        counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.phase_sums[phase] += seconds
+
+    def merge_phases(self, other):
+        for phase, counts in other.phase_counts.items():
+            merged = self.phase_counts.setdefault(phase, [0]*(len(LATENCY_BUCKETS) + 1))
+            for i, count in enumerate(counts):
+                merged[i] += count
+            self.phase_sums[phase] = self.phase_sums.get(phase, 0.0) + other.phase_sums[phase]
+        return self
+
+class RateTracker:
+    """ The systems per second since the previous snapshot seen by one consumer """
+    def __init__(self, started: float):
+        self.last = (started, 0)
+
+    def update(self, snapshot: dict)->float:
+        last_time, last_systems = self.last
+        self.last = (snapshot["time"], snapshot["systems"])
+        return (snapshot["systems"] - last_systems) / max(snapshot["time"] - last_time, 1e-9)
+
+class MetricsRegistry:
+    """
+    Progress of a run: systems completed, errors, crashes, prepare phase latencies and worker utilization.
+    Each thread has its own counters. The phase latencies of a system are batched without a lock in the thread, and added to its counters
+    under the registry lock with the system, so there is one lock by system. The counters of the threads are merged when scraped.
+    A snapshot has no side effect: the recent rates are computed by each consumer with its own RateTracker.
+    """
+    def __init__(self, prefix: str = "soa"):
+        self.prefix = prefix
+        self.started = time.time()
+        self.local = threading.local()
+        self.shards = []
+        self.lock = threading.Lock()
+
+    def get_thread_metrics(self)->_ThreadMetrics:
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = _ThreadMetrics(threading.current_thread().name)
+            self.local.shard = shard
+            self.local.batch = _ThreadMetrics(shard.name)
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def _take_batch(self)->_ThreadMetrics:
+        """ The phase latencies observed by the thread since its last system, replaced by an empty batch """
+        batch = self.local.batch
+        if len(batch.phase_counts) > 0:
+            self.local.batch = _ThreadMetrics(batch.name)
+        return batch
+
+    def observe_phase(self, phase: str, seconds: float):
+        """ Suitable as the on_phase argument of DataSystem.prepare. Visible in a snapshot once the system is added, or after flush."""
+        self.get_thread_metrics()
+        self.local.batch.observe_phase(phase, seconds)
+
+    def flush(self):
+        """ Adds the phase latencies batched by the current thread, for a thread that observes phases without adding systems """
+        shard = self.get_thread_metrics()
+        batch = self._take_batch()
+        with self.lock:
+            shard.merge_phases(batch)
+        return self
+
+    def add_system(self, overview: DataUsageOverview, busy_seconds: float):
+        shard = self.get_thread_metrics()
+        batch = self._take_batch()
+        with self.lock:
+            shard.merge_phases(batch)
+            shard.systems += 1
+            shard.usages += len(overview)
+            shard.busy_seconds += busy_seconds
+            shard.crashes.update(overview.crashes)
+
+    def add_error(self, busy_seconds: float):
+        shard = self.get_thread_metrics()
+        batch = self._take_batch()
+        with self.lock:
+            shard.merge_phases(batch)
+            shard.errors += 1
+            shard.busy_seconds += busy_seconds
+
+    def add_summary(self, summary: ExperimentSummary, busy_seconds: float, worker: str):
+        """ For systems generated in another process, reported as a summary by the single thread that collects them """
+        with self.lock:
+            shard = next((s for s in self.shards if s.name == worker), None)
+            if shard is None:
+                shard = _ThreadMetrics(worker)
+                self.shards.append(shard)
+            shard.systems += summary.systems
+            shard.errors += summary.errors
+            shard.usages += summary.usages
+            shard.busy_seconds += busy_seconds
+            shard.crashes.update(summary.crashes)
+
+    def snapshot(self)->dict:
+        """ The merged counters of all the threads """
+        now = time.time()
+        elapsed = max(now - self.started, 1e-9)
+        crashes = Counter()
+        merged = _ThreadMetrics("all")
+        with self.lock:
+            for shard in self.shards:
+                crashes.update(shard.crashes)
+                merged.merge_phases(shard)
+            systems = sum([s.systems for s in self.shards])
+            errors = sum([s.errors for s in self.shards])
+            usages = sum([s.usages for s in self.shards])
+            workers = dict([(s.name, s.busy_seconds / elapsed) for s in self.shards])
+        return {
+            "time": now,
+            "elapsed-seconds": elapsed,
+            "systems": systems,
+            "errors": errors,
+            "usages": usages,
+            "systems-per-second": systems / elapsed,
+            "crashes": dict(crashes),
+            "workers": workers,
+            "phase-counts": merged.phase_counts,
+            "phase-sums": merged.phase_sums
+        }
+
+    def to_prometheus(self, rate: RateTracker = None)->str:
+        """ The text exposition format. The systems per second gauge is recent with the rate of the scraper, over the whole run otherwise."""
+        snapshot = self.snapshot()
+        systems_per_second = rate.update(snapshot) if rate is not None else snapshot["systems-per-second"]
+        p = self.prefix
+        lines = [
+            "# TYPE {}_systems_total counter".format(p),
+            "{}_systems_total {}".format(p, snapshot["systems"]),
+            "# TYPE {}_errors_total counter".format(p),
+            "{}_errors_total {}".format(p, snapshot["errors"]),
+            "# TYPE {}_usages_total counter".format(p),
+            "{}_usages_total {}".format(p, snapshot["usages"]),
+            "# TYPE {}_systems_per_second gauge".format(p),
+            "{}_systems_per_second {}".format(p, systems_per_second),
+            "# TYPE {}_crashes_total counter".format(p)
+        ]
+        for reason, count in sorted(snapshot["crashes"].items()):
+            lines.append('{}_crashes_total{{reason="{}"}} {}'.format(p, reason, count))
+        lines.append("# TYPE {}_worker_utilization gauge".format(p))
+        for worker, utilization in sorted(snapshot["workers"].items()):
+            lines.append('{}_worker_utilization{{worker="{}"}} {}'.format(p, worker, utilization))
+        lines.append("# TYPE {}_prepare_phase_seconds histogram".format(p))
+        for phase, counts in sorted(snapshot["phase-counts"].items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ["+Inf"], counts):
+                cumulative += count
+                lines.append('{}_prepare_phase_seconds_bucket{{phase="{}",le="{}"}} {}'.format(p, phase, bound, cumulative))
+            lines.append('{}_prepare_phase_seconds_sum{{phase="{}"}} {}'.format(p, phase, snapshot["phase-sums"][phase]))
+            lines.append('{}_prepare_phase_seconds_count{{phase="{}"}} {}'.format(p, phase, cumulative))
+        return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        with self.server.rate_lock:
+            body = self.server.registry.to_prometheus(self.server.rate).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MetricsServer(ThreadingHTTPServer):
+    """ Serves the registry on http://host:port/metrics from a background thread """
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _MetricsHandler)
+        self.registry = registry
+        self.rate = RateTracker(registry.started)
+        self.rate_lock = threading.Lock()
+
+    def get_port(self)->int:
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target = self.serve_forever, daemon = True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class JsonLinesReporter:
+    """ Appends a snapshot of the registry to a file every interval seconds, and a last one when stopped """
+    def __init__(self, registry: MetricsRegistry, filename: str, interval: float = 10.0):
+        self.registry = registry
+        self.filename = filename
+        self.interval = interval
+        self.rate = RateTracker(registry.started)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target = self._run, daemon = True)
+
+    def _write(self):
+        snapshot = self.registry.snapshot()
+        snapshot["recent-systems-per-second"] = self.rate.update(snapshot)
+        with open(self.filename, 'a') as metricsfile:
+            metricsfile.write(json.dumps(snapshot) + "\n")
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self._write()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self._write()
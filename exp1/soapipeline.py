@@ -0,0 +1,297 @@
+from typing import List
+import csv
+import multiprocessing
+import pickle
+import queue
+import random
+import sqlite3
+import threading
+import tracemalloc
+from time import perf_counter
+from soadata import DataSystem, ExperimentSummary
+from soarun import PreparedExperiment
+from soametrics import MetricsRegistry
+from soagovernor import MemoryGovernor, read_rss
+
+class SystemRecord:
+    """ The summary of a single data system, as it goes from a generation worker to the sinks """
+    FIELDS = ["seed", "error", "usages", "data-storage", "monthly-data-transfer", "service-cost", "max-processing-magnitude", "crashes"]
+
+    def __init__(self, seed: int, summary: ExperimentSummary):
+        self.seed = seed
+        self.summary = summary
+
+    def to_row(self)->dict:
+        s = self.summary
+        return {
+            "seed": self.seed,
+            "error": s.errors,
+            "usages": s.usages,
+            "data-storage": s.data_storage,
+            "monthly-data-transfer": s.monthly_data_transfer,
+            "service-cost": s.service_cost,
+            "max-processing-magnitude": s.max_processing_magnitude,
+            "crashes": sum(s.crashes.values())
+        }
+
+    def __str__(self):
+        if self.summary.errors > 0:
+            return "SystemRecord {}: error".format(self.seed)
+        return "SystemRecord {}: usages: {}, cost: {}, crashes: {}".format(self.seed, self.summary.usages, self.summary.service_cost, sum(self.summary.crashes.values()))
+
+def _generate(wholeconfig: dict, tasks, results, name: str, sample_every: int = 0):
+    """
+    Generation worker: turns seed ranges into batches of records.
+    With sample_every, one system out of sample_every is traced to report its peak allocation with the resident memory of the worker.
+    """
+    try:
+        prepared = PreparedExperiment(wholeconfig)
+        generated = 0
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            start = perf_counter()
+            records = []
+            peak = 0
+            for seed in range(task[0], task[1]):
+                sampled = sample_every > 0 and generated % sample_every == 0
+                generated += 1
+                if sampled:
+                    tracemalloc.start()
+                random.seed(seed)
+                datasystem = DataSystem(prepared.dataconfig, service_cost = prepared.service_cost)
+                summary = ExperimentSummary()
+                try:
+                    datasystem.prepare()
+                    summary.add_overview(datasystem.get_usage_overview().summarise(verbose = False))
+                except ValueError as e:
+                    summary.add_error(e)
+                finally:
+                    if sampled:
+                        peak = max(peak, tracemalloc.get_traced_memory()[1])
+                        tracemalloc.stop()
+                datasystem = None
+                records.append(SystemRecord(seed, summary))
+            busy_seconds = perf_counter() - start
+            memory = None
+            if sample_every > 0:
+                memory = { "rss": read_rss(), "peak": peak, "record-bytes": len(pickle.dumps(records)) / max(len(records), 1) }
+            results.put((name, records, busy_seconds, memory))
+        results.put((name, None, 0.0, None))
+    except Exception as error:
+        results.put((name, "{}: {}".format(type(error).__name__, error), 0.0, None))
+
+class PrintSink:
+    def open(self):
+        pass
+
+    def write(self, records: List[SystemRecord]):
+        for record in records:
+            print(record)
+
+    def close(self):
+        pass
+
+class CsvSink:
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.file = None
+        self.writer = None
+
+    def open(self):
+        self.file = open(self.filename, 'w', newline = '')
+        self.writer = csv.DictWriter(self.file, fieldnames = SystemRecord.FIELDS)
+        self.writer.writeheader()
+
+    def write(self, records: List[SystemRecord]):
+        self.writer.writerows([r.to_row() for r in records])
+
+    def close(self):
+        self.file.close()
+
+class SqliteSink:
+    """ One row by system in a table, one transaction by batch """
+    def __init__(self, filename: str, table: str = "systems"):
+        self.filename = filename
+        self.table = table
+        self.connection = None
+
+    def _columns(self)->List[str]:
+        return [f.replace("-", "_") for f in SystemRecord.FIELDS]
+
+    def open(self):
+        # The connection belongs to the writer thread, which calls open
+        self.connection = sqlite3.connect(self.filename)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS {} ({})".format(self.table, ", ".join(self._columns())))
+
+    def write(self, records: List[SystemRecord]):
+        statement = "INSERT INTO {} VALUES ({})".format(self.table, ", ".join(["?"]*len(SystemRecord.FIELDS)))
+        with self.connection:
+            self.connection.executemany(statement, [tuple(r.to_row()[f] for f in SystemRecord.FIELDS) for r in records])
+
+    def close(self):
+        self.connection.close()
+
+def sink_for(filename: str):
+    """ A sink chosen from the extension of the file: .csv, .db, .sqlite or .sqlite3 """
+    if filename.endswith(".csv"):
+        return CsvSink(filename)
+    elif filename.endswith((".db", ".sqlite", ".sqlite3")):
+        return SqliteSink(filename)
+    raise ValueError("Unsupported output file {}, expected .csv, .db, .sqlite or .sqlite3".format(filename))
+
+class ExperimentPipeline:
+    """
+    Generation workers (processes) -> aggregation (caller thread) -> writer (background thread), connected by bounded queues.
+    A slow sink blocks the aggregation, which blocks the workers once the result queue is full, so the records in flight are capped.
+    System i is generated after random.seed(seed + i), like run_experiment, and the records are added to the summary in seed order,
+    holding back the chunks that complete early. The float sums are then the same as run_experiment's, whatever the number of workers.
+    """
+    def __init__(self, wholeconfig: dict, workers: int = 2):
+        self.wholeconfig = wholeconfig
+        self.workers = workers
+        self.chunk_size = 16
+        self.queue_depth = 8
+        self.sinks = []
+        self.metrics = None
+        self.governor = None
+        self.started_workers = 0
+
+    def set_chunk_size(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        return self
+
+    def set_queue_depth(self, queue_depth: int):
+        """ The number of chunks waiting in each queue """
+        self.queue_depth = queue_depth
+        return self
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return self
+
+    def set_metrics(self, metrics: MetricsRegistry):
+        self.metrics = metrics
+        return self
+
+    def set_governor(self, governor: MemoryGovernor):
+        """ Lets the governor choose the number of workers and the chunk size as the run goes, instead of workers and chunk_size """
+        self.governor = governor
+        return self
+
+    def _write(self, batches: queue.Queue, failures: List[Exception]):
+        try:
+            for sink in self.sinks:
+                sink.open()
+            while True:
+                records = batches.get()
+                if records is None:
+                    break
+                for sink in self.sinks:
+                    sink.write(records)
+        except Exception as error:
+            failures.append(error)
+            # Keep draining so that the aggregation is never blocked by a dead writer
+            while batches.get() is not None:
+                pass
+        finally:
+            for sink in self.sinks:
+                try:
+                    sink.close()
+                except Exception:
+                    pass
+
+    def _start_worker(self, context, tasks, results, sample_every: int):
+        name = "worker-{}".format(self.started_workers)
+        self.started_workers += 1
+        process = context.Process(target = _generate, args = (self.wholeconfig, tasks, results, name, sample_every), daemon = True)
+        process.start()
+        return name, process
+
+    def run(self, seed: int, n: int)->ExperimentSummary:
+        context = multiprocessing.get_context()
+        tasks = context.Queue()
+        results = context.Queue(maxsize = self.queue_depth)
+        governor = self.governor
+        sample_every = governor.sample_every if governor is not None else 0
+        workers, chunk_size = governor.get_initial() if governor is not None else (self.workers, self.chunk_size)
+        self.started_workers = 0
+        processes = dict([self._start_worker(context, tasks, results, sample_every) for _ in range(workers)])
+        # Workers told to stop that have not exited yet
+        retiring = 0
+
+        batches = queue.Queue(maxsize = self.queue_depth)
+        failures = []
+        writer = threading.Thread(target = self._write, args = (batches, failures), daemon = True)
+        writer.start()
+
+        # The seed ranges are handed out a few at a time, so that a new chunk size applies to the next ones
+        cursor = seed
+        stop = seed + n
+        pending = 0
+        summary = ExperimentSummary()
+        # Chunks that completed before the ones with smaller seeds, by first seed
+        early = {}
+        next_seed = seed
+        try:
+            while cursor < stop or pending > 0 or len(processes) > 0:
+                while cursor < stop and pending < 2*workers:
+                    # Smaller chunks towards the end, so that all the workers get some
+                    size = max(1, min(chunk_size, (stop - cursor) // (2*workers)))
+                    tasks.put((cursor, cursor + size))
+                    cursor += size
+                    pending += 1
+                if cursor >= stop and pending == 0 and retiring < len(processes):
+                    for _ in range(len(processes) - retiring):
+                        tasks.put(None)
+                    retiring = len(processes)
+                try:
+                    name, records, busy_seconds, memory = results.get(timeout = 1.0)
+                except queue.Empty:
+                    for name, process in processes.items():
+                        if not process.is_alive() and process.exitcode != 0:
+                            raise RuntimeError("Generation {} died with exit code {}, which can be the out of memory killer".format(name, process.exitcode))
+                    continue
+                if records is None:
+                    processes.pop(name).join()
+                    retiring -= 1
+                    if governor is not None:
+                        governor.forget_worker(name)
+                    continue
+                if isinstance(records, str):
+                    raise RuntimeError("Generation {} failed: {}".format(name, records))
+                pending -= 1
+                chunk = ExperimentSummary()
+                for record in records:
+                    chunk.merge(record.summary)
+                early[records[0].seed] = records
+                while next_seed in early:
+                    ordered = early.pop(next_seed)
+                    for record in ordered:
+                        summary.merge(record.summary)
+                    next_seed += len(ordered)
+                if self.metrics is not None:
+                    self.metrics.add_summary(chunk, busy_seconds, name)
+                batches.put(records)
+                if governor is not None:
+                    governor.observe(name, len(records), busy_seconds, memory)
+                    # Wait for the previous reduction to take effect before measuring again
+                    if retiring == 0 and cursor < stop:
+                        workers, chunk_size = governor.adjust(workers, chunk_size, self.queue_depth, read_rss())
+                        for _ in range(len(processes) - workers):
+                            tasks.put(None)
+                            retiring += 1
+                        for _ in range(workers - len(processes)):
+                            new_name, process = self._start_worker(context, tasks, results, sample_every)
+                            processes[new_name] = process
+        finally:
+            batches.put(None)
+            writer.join()
+            for process in processes.values():
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+        if len(failures) > 0:
+            raise failures[0]
+        return summary
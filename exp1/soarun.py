@@ -0,0 +1,297 @@
+from typing import Callable, Dict
+import json
+import hashlib
+import os
+import random
+import socket
+import socketserver
+import threading
+import time
+from time import perf_counter
+from fractions import Fraction
+from soadata import DataSystem, DataSystemConfig, ServiceCost, ExperimentSummary
+from soametrics import MetricsRegistry
+
+def config_key(wholeconfig: dict)->str:
+    """ A digest of a whole configuration, independent of the order of its keys """
+    return hashlib.blake2b(json.dumps(wholeconfig, sort_keys = True).encode("utf-8"), digest_size = 16).hexdigest()
+
+class PreparedExperiment:
+    """ A whole configuration (experiment and calculator) parsed once, ready to generate any number of systems """
+    def __init__(self, wholeconfig: dict):
+        self.wholeconfig = wholeconfig
+        self.key = config_key(wholeconfig)
+        self.dataconfig = DataSystemConfig.from_obj(wholeconfig["experiment"])
+        self.service_cost = ServiceCost.from_obj(wholeconfig["calculator"]["cost"])
+        self.traffic_config = None
+        if "traffic" in wholeconfig["calculator"]:
+            # The traffic simulation needs numpy, which is only imported when it is configured
+            from soatraffic import TrafficConfig
+            self.traffic_config = TrafficConfig.from_obj(wholeconfig["calculator"]["traffic"])
+        self.growth_config = None
+        if "capacity" in wholeconfig["calculator"]:
+            from soacapacity import GrowthConfig
+            self.growth_config = GrowthConfig.from_obj(wholeconfig["calculator"]["capacity"])
+
+    def __str__(self):
+        return "PreparedExperiment: {}, {}".format(self.key, self.dataconfig)
+
+def run_experiment(config, seed: int, n: int, verbose: bool = False, on_system: Callable[[DataSystem], None] = None, metrics: MetricsRegistry = None, summary: ExperimentSummary = None)->ExperimentSummary:
+    """
+    Generates n data systems and summarises them. The config is either a whole configuration or a PreparedExperiment.
+    The system i is generated after random.seed(seed + i), so a run gives the same summary however it is split.
+    Without seed, the systems are drawn from the current random state. The progress goes to metrics, if any.
+    The systems are added to summary when given, so that a run continued in steps sums in the same order as in one go.
+    """
+    prepared = config if isinstance(config, PreparedExperiment) else PreparedExperiment(config)
+    summary = summary if summary is not None else ExperimentSummary()
+    for i in range(n):
+        if seed is not None:
+            random.seed(seed + i)
+        datasystem = DataSystem(prepared.dataconfig, service_cost = prepared.service_cost)
+        start = perf_counter()
+        try:
+            datasystem.prepare(on_phase = metrics.observe_phase if metrics is not None else None)
+        except ValueError as e:
+            summary.add_error(e)
+            if metrics is not None:
+                metrics.add_error(perf_counter() - start)
+            continue
+        overview = datasystem.get_usage_overview().summarise(verbose = verbose)
+        summary.add_overview(overview)
+        if metrics is not None:
+            metrics.add_system(overview, perf_counter() - start)
+        if on_system is not None:
+            on_system(datasystem)
+    return summary
+
+class Checkpoint:
+    """ The progress of a run: the next system, the random state, the summary of the systems before it and, if any, what on_system accumulated from them """
+    def __init__(self, key: str, seed: int, count: int, next_index: int, random_state, summary: ExperimentSummary, accumulated = None):
+        self.key = key
+        self.seed = seed
+        self.count = count
+        self.next_index = next_index
+        self.random_state = random_state
+        self.summary = summary
+        self.accumulated = accumulated
+
+    def is_complete(self)->bool:
+        return self.next_index >= self.count
+
+    def to_obj(self):
+        version, internal, gauss_next = self.random_state
+        return {
+            "config-key": self.key,
+            "seed": self.seed,
+            "count": self.count,
+            "next-index": self.next_index,
+            "random-state": [version, list(internal), gauss_next],
+            "summary": self.summary.to_obj(),
+            "accumulated": self.accumulated
+        }
+
+    @classmethod
+    def from_obj(cls, content):
+        version, internal, gauss_next = content["random-state"]
+        return cls(content["config-key"], content["seed"], int(content["count"]), int(content["next-index"]), (version, tuple(internal), gauss_next), ExperimentSummary.from_obj(content["summary"]), content.get("accumulated"))
+
+    def save(self, filename: str):
+        """ Atomic: a crash while saving leaves the previous checkpoint in place """
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'w') as checkpointfile:
+            json.dump(self.to_obj(), checkpointfile)
+            checkpointfile.flush()
+            os.fsync(checkpointfile.fileno())
+        os.replace(tmp_filename, filename)
+
+    @classmethod
+    def load(cls, filename: str):
+        with open(filename, 'r') as checkpointfile:
+            return cls.from_obj(json.load(checkpointfile))
+
+    def __str__(self):
+        return "Checkpoint: {} of {} systems, seed {}".format(self.next_index, self.count, self.seed)
+
+def run_with_checkpoints(config, seed: int, n: int, filename: str, every: int = 1000, resume: bool = False, verbose: bool = False, on_system: Callable[[DataSystem], None] = None, metrics: MetricsRegistry = None, accumulator = None)->ExperimentSummary:
+    """
+    Same as run_experiment, saving a checkpoint every few systems. With resume, continues from the checkpoint of the same run, if any.
+    The result is identical to a run without interruption, seeded or not.
+    accumulator, if any, is what on_system fills, with to_obj and restore(content): it is saved with the checkpoint and restored on resume.
+    """
+    if every <= 0:
+        raise ValueError("A checkpoint every {} systems, expected a positive number".format(every))
+    prepared = config if isinstance(config, PreparedExperiment) else PreparedExperiment(config)
+    summary = ExperimentSummary()
+    start = 0
+    if resume and os.path.exists(filename):
+        checkpoint = Checkpoint.load(filename)
+        if (checkpoint.key, checkpoint.seed, checkpoint.count) != (prepared.key, seed, n):
+            raise ValueError("The checkpoint {} belongs to another run: {}".format(filename, checkpoint))
+        if accumulator is not None and checkpoint.accumulated is None:
+            raise ValueError("The checkpoint {} was saved without the accumulated reports, it cannot be resumed with them".format(filename))
+        summary = checkpoint.summary
+        start = checkpoint.next_index
+        random.setstate(checkpoint.random_state)
+        if accumulator is not None and checkpoint.accumulated is not None:
+            accumulator.restore(checkpoint.accumulated)
+    for block_start in range(start, n, every):
+        block_stop = min(block_start + every, n)
+        run_experiment(prepared, seed + block_start if seed is not None else None, block_stop - block_start, verbose = verbose, on_system = on_system, metrics = metrics, summary = summary)
+        Checkpoint(prepared.key, seed, n, block_stop, random.getstate(), summary, accumulator.to_obj() if accumulator is not None else None).save(filename)
+    return summary
+
+class NumericCrossCheck:
+    """ The largest divergence between the float and the exact service costs of the same systems """
+    def __init__(self):
+        self.systems = 0
+        self.max_absolute = 0.0
+        self.max_relative = 0.0
+        self.worst_seed = None
+        self.mismatches = 0
+
+    def add(self, seed: int, float_cost: float, exact_cost: Fraction):
+        self.systems += 1
+        absolute = abs(Fraction(float_cost) - exact_cost)
+        relative = absolute / abs(exact_cost) if exact_cost != 0 else absolute
+        if relative > self.max_relative:
+            self.max_relative = float(relative)
+            self.worst_seed = seed
+        self.max_absolute = max(self.max_absolute, float(absolute))
+        return self
+
+    def to_string(self):
+        return "NumericCrossCheck: systems: {}, structure mismatches: {}, max absolute divergence: {:.3g}, max relative divergence: {:.3g}, worst seed: {}".format(self.systems, self.mismatches, self.max_absolute, self.max_relative, self.worst_seed)
+
+    def __str__(self):
+        return self.to_string()
+
+def cross_check_numeric(wholeconfig: dict, seed: int, n: int)->NumericCrossCheck:
+    """ Generates every system with the float and the exact backends, from the same seed, and compares their service costs """
+    check = NumericCrossCheck()
+    dataconfigs = dict([(numeric, DataSystemConfig.from_obj(wholeconfig["experiment"]).set_numeric(numeric)) for numeric in ["float", "exact"]])
+    service_cost = ServiceCost.from_obj(wholeconfig["calculator"]["cost"])
+    for i in range(n):
+        overviews = {}
+        for numeric, dataconfig in dataconfigs.items():
+            random.seed(seed + i)
+            datasystem = DataSystem(dataconfig, service_cost = service_cost)
+            try:
+                datasystem.prepare()
+            except ValueError:
+                break
+            overviews[numeric] = datasystem.get_usage_overview().summarise(verbose = False)
+        if len(overviews) < 2:
+            continue
+        if len(overviews["float"]) != len(overviews["exact"]) or overviews["float"].crashes != overviews["exact"].crashes:
+            check.mismatches += 1
+        check.add(seed + i, overviews["float"].service_cost, overviews["exact"].service_cost)
+    return check
+
+UNKNOWN_CONFIG = "unknown-config"
+
+class ExperimentDaemon:
+    """
+    Keeps the parsed configurations of the jobs it has seen, keyed by their digest.
+    The data system generation uses the global random state, so the jobs run one at a time.
+    """
+    def __init__(self, max_configs: int = 256):
+        self.max_configs = max_configs
+        self.prepared = {}
+        self.run_lock = threading.Lock()
+        self.config_lock = threading.Lock()
+        self.jobs = 0
+        self.started = time.time()
+
+    def load(self, wholeconfig: dict)->PreparedExperiment:
+        key = config_key(wholeconfig)
+        with self.config_lock:
+            if key not in self.prepared:
+                if len(self.prepared) >= self.max_configs:
+                    self.prepared.pop(next(iter(self.prepared)))
+                self.prepared[key] = PreparedExperiment(wholeconfig)
+            return self.prepared[key]
+
+    def run(self, message: dict)->dict:
+        if "config" in message:
+            prepared = self.load(message["config"])
+        else:
+            with self.config_lock:
+                prepared = self.prepared.get(message.get("config-id"))
+            if prepared is None:
+                return { "error": "unknown config-id {}, send the config first".format(message.get("config-id")), "code": UNKNOWN_CONFIG }
+        with self.run_lock:
+            summary = run_experiment(prepared, message.get("seed"), int(message.get("n", 1)))
+            self.jobs += 1
+        return { "config-id": prepared.key, "summary": summary.to_obj() }
+
+    def status(self)->dict:
+        with self.config_lock:
+            return { "configs": len(self.prepared), "jobs": self.jobs, "uptime": time.time() - self.started }
+
+    def handle(self, message: dict)->dict:
+        op = message.get("op")
+        if op == "run":
+            return self.run(message)
+        elif op == "load":
+            return { "config-id": self.load(message["config"]).key }
+        elif op == "status":
+            return self.status()
+        return { "error": "unknown op {}".format(op) }
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                reply = self.server.daemon.handle(json.loads(line))
+            except (ValueError, KeyError) as error:
+                reply = { "error": "{}: {}".format(type(error).__name__, error) }
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    """ JSON lines over a Unix socket: one job per line, one reply per line. A client can keep its connection for many jobs."""
+    daemon_threads = True
+
+    def __init__(self, daemon: ExperimentDaemon, path: str):
+        super().__init__(path, _DaemonHandler)
+        self.daemon = daemon
+
+class DaemonClient:
+    def __init__(self, path: str, timeout: float = None):
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.settimeout(timeout)
+        self.connection.connect(path)
+        self.reader = self.connection.makefile("r", encoding = "utf-8")
+
+    def send(self, message: dict)->dict:
+        """ The reply as it is, errors included """
+        self.connection.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("The daemon closed the connection")
+        return json.loads(line)
+
+    def request(self, message: dict)->dict:
+        reply = self.send(message)
+        if "error" in reply:
+            raise ValueError(reply["error"])
+        return reply
+
+    def run_experiment(self, wholeconfig: dict, seed: int, n: int)->ExperimentSummary:
+        """ Same as run_experiment, in the daemon. The configuration is only sent when the daemon does not know its digest."""
+        reply = self.send({ "op": "run", "config-id": config_key(wholeconfig), "seed": seed, "n": n })
+        if reply.get("code") == UNKNOWN_CONFIG:
+            reply = self.send({ "op": "run", "config": wholeconfig, "seed": seed, "n": n })
+        if "error" in reply:
+            raise ValueError(reply["error"])
+        return ExperimentSummary.from_obj(reply["summary"])
+
+    def status(self)->dict:
+        return self.request({ "op": "status" })
+
+    def close(self):
+        self.reader.close()
+        self.connection.close()
@@ -0,0 +1,173 @@
+from typing import List, Tuple, Callable
+from random import Random
+from math import exp
+import copy
+from soadata import DataSystem, DataClass, DataService, DataProperty, DataPropertyType, DataUsageOverview, DataClassRepo, DataServiceRepo
+from soafingerprint import system_fingerprint, FingerprintCache
+
+class DesignScore:
+    """ Weighted service cost of a system plus a penalty for every usage that crashes """
+    def __init__(self):
+        self.crash_penalty = 1000000.0
+
+    def set_crash_penalty(self, crash_penalty: float):
+        self.crash_penalty = crash_penalty
+        return self
+
+    def score(self, overview: DataUsageOverview)->float:
+        crashes = overview.table.get_crash_count()
+        return float(overview.service_cost) + self.crash_penalty*crashes
+
+def shallow_copy(datasystem: DataSystem)->DataSystem:
+    """ A copy with its own repositories of types, classes and services, which share the classes and services of the original """
+    copied = copy.copy(datasystem)
+    copied.data_property_type_repo = copy.copy(datasystem.data_property_type_repo)
+    copied.data_property_type_repo.simple_store = dict(datasystem.data_property_type_repo.simple_store)
+    copied.data_property_type_repo.ref_store = dict(datasystem.data_property_type_repo.ref_store)
+    copied.data_class_repo = DataClassRepo()
+    copied.data_class_repo.dataclasses = dict(datasystem.data_class_repo.dataclasses)
+    copied.data_service_repo = DataServiceRepo()
+    copied.data_service_repo.dataservices = dict(datasystem.data_service_repo.dataservices)
+    copied.fingerprint = None
+    return copied
+
+class DesignMutator:
+    """ Random changes of the structure of a prepared system.
+    A mutation works on a shallow copy, and a move copies a class or a service before changing it, so the original is left as it was."""
+    def __init__(self, rng: Random):
+        self.rng = rng
+
+    def _own_class(self, datasystem: DataSystem, dataclass: DataClass)->DataClass:
+        owned = copy.copy(dataclass)
+        datasystem.data_class_repo.add_dataclass(owned)
+        return owned
+
+    def _own_service(self, datasystem: DataSystem, service: DataService)->DataService:
+        owned = copy.copy(service)
+        datasystem.data_service_repo.add_dataservice(owned)
+        return owned
+
+    def reassign_class(self, datasystem: DataSystem)->bool:
+        """ Moves a class to another service: every reference Service:Class now points to the new service """
+        dataclass = self.rng.choice(datasystem.get_dataclasses())
+        service = self.rng.choice(datasystem.get_services())
+        new_type = DataPropertyType.from_ref_datatype(service.name, dataclass.name)
+        old_types = [t for t in datasystem.get_all_ref_datatypes() if t.match_dataname(dataclass.name) and t != new_type]
+        if len(old_types) == 0:
+            return False
+        old_type = self.rng.choice(old_types)
+        datasystem.data_property_type_repo.discard(old_type).add(new_type)
+        for cl in datasystem.get_dataclasses():
+            if old_type in cl.get_ref_datatypes():
+                self._own_class(datasystem, cl).set_properties(set([self._with_datatype(p, new_type) if p.datatype == old_type else p for p in cl.properties]))
+        return True
+
+    def change_features(self, datasystem: DataSystem)->bool:
+        """ Replaces one feature of a service, or removes one """
+        service = self.rng.choice(datasystem.get_services())
+        features = list(service.features)
+        if len(features) > 0 and self.rng.random() < 0.5:
+            features.pop(self.rng.randrange(len(features)))
+        elif len(features) > 0:
+            features[self.rng.randrange(len(features))] = datasystem.data_feature_repo.choice()
+        else:
+            features.append(datasystem.data_feature_repo.choice())
+        self._own_service(datasystem, service).set_features(features)
+        return True
+
+    def reroute_reference(self, datasystem: DataSystem)->bool:
+        """ Points a reference property to another ref datatype """
+        candidates = [(cl, p) for cl in datasystem.get_dataclasses() for p in cl.properties if p.is_ref()]
+        if len(candidates) == 0:
+            return False
+        dataclass, prop = self.rng.choice(candidates)
+        new_type = self.rng.choice(sorted(datasystem.get_all_ref_datatypes(), key = str))
+        if new_type == prop.datatype:
+            return False
+        self._own_class(datasystem, dataclass).set_properties(set([self._with_datatype(p, new_type) if p is prop else p for p in dataclass.properties]))
+        return True
+
+    def _with_datatype(self, prop: DataProperty, datatype: DataPropertyType)->DataProperty:
+        return DataProperty().set_name(prop.name).set_datatype(datatype).set_min_items(prop.min_items).set_max_items(prop.max_items)
+
+    def mutate(self, datasystem: DataSystem)->DataSystem:
+        """ A mutated copy of the system. Its fingerprint is computed again, but its data usages are only rebuilt when they are read, so not for a design that is already memoized."""
+        mutated = shallow_copy(datasystem)
+        moves = [self.reassign_class, self.change_features, self.reroute_reference]
+        while not self.rng.choice(moves)(mutated):
+            pass
+        return mutated.mark_structure_changed()
+
+class SearchResult:
+    def __init__(self, best: DataSystem, best_score: float, evaluations: int, cache_hits: int, iterations: int):
+        self.best = best
+        self.best_score = best_score
+        self.evaluations = evaluations
+        self.cache_hits = cache_hits
+        self.iterations = iterations
+
+    def to_obj(self):
+        return {
+            "best-score": self.best_score,
+            "evaluations": self.evaluations,
+            "cache-hits": self.cache_hits,
+            "iterations": self.iterations
+        }
+
+    def to_string(self):
+        return "SearchResult: best score: {}, evaluations: {}, cache hits: {}, iterations: {}".format(self.best_score, self.evaluations, self.cache_hits, self.iterations)
+
+    def __str__(self):
+        return self.to_string()
+
+class AnnealingSearch:
+    """ Simulated annealing over mutations of a system. Every design is evaluated once, designs that only differ by names included."""
+    def __init__(self, score: DesignScore = None, seed: int = None):
+        self.score = score or DesignScore()
+        self.rng = Random(seed)
+        self.mutator = DesignMutator(self.rng)
+        self.iterations = 2000
+        self.initial_temperature = 0.1
+        self.cooling = 0.998
+        self.target_score = None
+        self.cache = FingerprintCache()
+
+    def set_iterations(self, iterations: int):
+        self.iterations = iterations
+        return self
+
+    def set_initial_temperature(self, initial_temperature: float):
+        """ Relative to the score of the initial design """
+        self.initial_temperature = initial_temperature
+        return self
+
+    def set_cooling(self, cooling: float):
+        self.cooling = cooling
+        return self
+
+    def set_target_score(self, target_score: float):
+        self.target_score = target_score
+        return self
+
+    def evaluate(self, datasystem: DataSystem)->float:
+        """ The score of the design, memoized by its structure. get_usage_overview rebuilds stale data usages, on a cache miss only."""
+        return self.cache.get_or_compute(system_fingerprint(datasystem), lambda: self.score.score(datasystem.get_usage_overview().summarise(verbose = False)))
+
+    def run(self, datasystem: DataSystem)->SearchResult:
+        current = datasystem
+        current_score = self.evaluate(current)
+        best, best_score = current, current_score
+        temperature = self.initial_temperature*max(abs(current_score), 1.0)
+        iteration = 0
+        for iteration in range(1, self.iterations + 1):
+            if self.target_score is not None and best_score <= self.target_score:
+                break
+            candidate = self.mutator.mutate(current)
+            candidate_score = self.evaluate(candidate)
+            delta = candidate_score - current_score
+            if delta <= 0 or self.rng.random() < exp(-delta / max(temperature, 1e-12)):
+                current, current_score = candidate, candidate_score
+                if current_score < best_score:
+                    best, best_score = current, current_score
+            temperature *= self.cooling
+        return SearchResult(best, best_score, self.cache.misses, self.cache.hits, iteration)
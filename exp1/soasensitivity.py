@@ -0,0 +1,173 @@
+from typing import List, Tuple, Dict
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import numpy as np
+from soasurrogate import INT_RANGE_KEYS, RATIO_RANGE_KEYS, METRIC_TRANSFORMS, scale_range
+from soarun import run_experiment, config_key
+
+def scaled_experiment(experiment: dict, keys: List[str], levels: List[float], spread: float)->dict:
+    """ The experiment with the range of each key scaled by spread^(2 level - 1), so a level in [0, 1] is a factor within [1/spread, spread]"""
+    candidate = json.loads(json.dumps(experiment))
+    for key, level in zip(keys, levels):
+        factor = spread**(2.0*level - 1.0)
+        scale_range(candidate, experiment, key, factor, factor)
+    return candidate
+
+def _evaluate(wholeconfig: dict, seed: int, systems: int)->dict:
+    return run_experiment(wholeconfig, seed, systems).get_metrics()
+
+def saltelli_indices(f_a: np.ndarray, f_b: np.ndarray, f_ab: np.ndarray)->Tuple[np.ndarray, np.ndarray]:
+    """
+    First order (Saltelli 2010) and total effect (Jansen) indices of each parameter, from the outputs of the rows of A, of B,
+    and of the rows of A with the column of the parameter taken from B (one row of f_ab by parameter).
+    """
+    variance = np.var(np.concatenate([f_a, f_b]), ddof = 1)
+    if variance <= 0:
+        return np.zeros(len(f_ab)), np.zeros(len(f_ab))
+    first_order = np.mean(f_b*(f_ab - f_a), axis = 1) / variance
+    total = 0.5*np.mean((f_a - f_ab)**2, axis = 1) / variance
+    return first_order, total
+
+class SobolIndices:
+    """ The indices of every parameter for one metric, with bootstrap confidence intervals """
+    def __init__(self, metric: str, keys: List[str], first_order: np.ndarray, total: np.ndarray, first_order_ci: np.ndarray, total_ci: np.ndarray):
+        self.metric = metric
+        self.keys = keys
+        self.first_order = first_order
+        self.total = total
+        self.first_order_ci = first_order_ci
+        self.total_ci = total_ci
+
+    def get_ranking(self)->List[int]:
+        """ The parameters by decreasing total effect """
+        return sorted(range(len(self.keys)), key = lambda i: -self.total[i])
+
+    def to_obj(self):
+        return {
+            "metric": self.metric,
+            "parameters": [{
+                "key": self.keys[i],
+                "first-order": float(self.first_order[i]),
+                "first-order-ci": [float(v) for v in self.first_order_ci[i]],
+                "total": float(self.total[i]),
+                "total-ci": [float(v) for v in self.total_ci[i]]
+            } for i in self.get_ranking()]
+        }
+
+    def to_string(self):
+        lines = ["SobolIndices: {}".format(self.metric)]
+        for rank, i in enumerate(self.get_ranking()):
+            lines.append("{:>3} {:<34} total {:6.3f} [{:6.3f}, {:6.3f}]  first order {:6.3f} [{:6.3f}, {:6.3f}]".format(
+                rank + 1, self.keys[i], self.total[i], self.total_ci[i][0], self.total_ci[i][1],
+                self.first_order[i], self.first_order_ci[i][0], self.first_order_ci[i][1]))
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.to_string()
+
+class SensitivityAnalysis:
+    """
+    Sobol indices of the range parameters of an experiment configuration, each scaled by a log uniform factor within [1/spread, spread].
+    The Saltelli design evaluates the rows of two random matrices A and B, and for each parameter the rows of A with its column from B:
+    samples*(d + 2) evaluations give the first order and total effect indices of all the d parameters for all the metrics at once.
+    Every evaluation generates the same seeded data systems, so that the differences come from the configurations rather than from the draws,
+    and the configurations that end up identical after rounding are only evaluated once.
+    """
+    def __init__(self, wholeconfig: dict, keys: List[str] = None):
+        self.wholeconfig = wholeconfig
+        self.keys = keys or INT_RANGE_KEYS + RATIO_RANGE_KEYS
+        self.samples = 64
+        self.spread = 2.0
+        self.systems = 100
+        self.seed = 0
+        self.workers = os.cpu_count() or 1
+        self.bootstrap = 200
+        self.requested = 0
+        self.evaluations = 0
+
+    def set_samples(self, samples: int):
+        """ The number of rows of A and B """
+        self.samples = samples
+        return self
+
+    def set_spread(self, spread: float):
+        self.spread = spread
+        return self
+
+    def set_systems(self, systems: int):
+        """ The number of data systems generated by evaluation """
+        self.systems = systems
+        return self
+
+    def set_seed(self, seed: int):
+        self.seed = seed
+        return self
+
+    def set_workers(self, workers: int):
+        self.workers = workers
+        return self
+
+    def set_bootstrap(self, bootstrap: int):
+        self.bootstrap = bootstrap
+        return self
+
+    def get_design(self)->Tuple[np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(self.seed)
+        return rng.random((self.samples, len(self.keys))), rng.random((self.samples, len(self.keys)))
+
+    def get_experiments(self, a: np.ndarray, b: np.ndarray)->List[dict]:
+        """ The rows of A, then of B, then of AB_i for each parameter i """
+        rows = list(a) + list(b)
+        for i in range(len(self.keys)):
+            ab = a.copy()
+            ab[:, i] = b[:, i]
+            rows.extend(list(ab))
+        experiment = self.wholeconfig["experiment"]
+        return [scaled_experiment(experiment, self.keys, row, self.spread) for row in rows]
+
+    def evaluate(self, experiments: List[dict])->List[dict]:
+        """ The metrics of every experiment, in parallel, with the duplicate configurations evaluated once """
+        configs = [dict(self.wholeconfig, experiment = e) for e in experiments]
+        keys = [config_key(c) for c in configs]
+        unique = dict(zip(keys, configs))
+        self.requested += len(configs)
+        self.evaluations += len(unique)
+        unique_configs = list(unique.values())
+        if self.workers <= 1:
+            metrics = [_evaluate(c, self.seed, self.systems) for c in unique_configs]
+        else:
+            with ProcessPoolExecutor(max_workers = self.workers) as executor:
+                count = len(unique_configs)
+                metrics = list(executor.map(_evaluate, unique_configs, [self.seed]*count, [self.systems]*count, chunksize = max(1, count // (4*self.workers))))
+        results = dict(zip(unique.keys(), metrics))
+        return [results[k] for k in keys]
+
+    def _bootstrap_ci(self, f_a: np.ndarray, f_b: np.ndarray, f_ab: np.ndarray)->Tuple[np.ndarray, np.ndarray]:
+        """ 95% percentile intervals from resampling the rows, which reuses the evaluations """
+        rng = np.random.default_rng(self.seed)
+        first_orders = []
+        totals = []
+        for _ in range(self.bootstrap):
+            rows = rng.integers(0, len(f_a), len(f_a))
+            first_order, total = saltelli_indices(f_a[rows], f_b[rows], f_ab[:, rows])
+            first_orders.append(first_order)
+            totals.append(total)
+        return np.percentile(first_orders, [2.5, 97.5], axis = 0).T, np.percentile(totals, [2.5, 97.5], axis = 0).T
+
+    def run(self)->Dict[str, SobolIndices]:
+        a, b = self.get_design()
+        results = self.evaluate(self.get_experiments(a, b))
+        n = self.samples
+        indices = {}
+        for metric in METRIC_TRANSFORMS.keys():
+            values = np.array([r[metric] for r in results], dtype = float)
+            f_a, f_b = values[:n], values[n:2*n]
+            f_ab = values[2*n:].reshape(len(self.keys), n)
+            first_order, total = saltelli_indices(f_a, f_b, f_ab)
+            first_order_ci, total_ci = self._bootstrap_ci(f_a, f_b, f_ab)
+            indices[metric] = SobolIndices(metric, self.keys, first_order, total, first_order_ci, total_ci)
+        return indices
+
+    def __str__(self):
+        return "SensitivityAnalysis: parameters: {}, samples: {}, spread: {}, systems: {}, evaluations: {} of {}".format(len(self.keys), self.samples, self.spread, self.systems, self.evaluations, self.requested)
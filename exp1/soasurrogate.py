@@ -0,0 +1,182 @@
+from typing import List, Tuple, Dict
+from fractions import Fraction
+from random import Random
+import json
+import numpy as np
+
+INT_RANGE_KEYS = [
+    "simple-datatype-count-range",
+    "class-count-range",
+    "class-instance-count-range",
+    "class-req-by-day-count-range",
+    "service-count-range",
+    "feature-count-range",
+    "requirement-count-range",
+    "reusable-property-count-range",
+    "property-count-range",
+    "service-feature-count-range",
+    "service-requirement-count-range",
+    "max-items-range",
+    "max-memory-byte-range",
+    "proc-micro-sec-range",
+    "error-rate-range",
+    "timeout-magnitude-range"
+]
+
+RATIO_RANGE_KEYS = [
+    "ref-datatype-ratio-range",
+    "ref-property-ratio-range",
+    "service-requirement-ratio-range"
+]
+
+METRIC_TRANSFORMS = {
+    "mean-cost": "identity",
+    "mean-storage": "log",
+    "mean-transfer": "log",
+    "timeout-crash-rate": "identity"
+}
+
+def config_features(experiment: dict)->List[float]:
+    """ The range parameters of an experiment configuration as numbers. Int ranges use a log scale."""
+    features = []
+    for key in INT_RANGE_KEYS:
+        features.append(np.log1p(float(experiment[key]["start"])))
+        features.append(np.log1p(float(experiment[key]["stop"])))
+    for key in RATIO_RANGE_KEYS:
+        features.append(float(Fraction(experiment[key]["start"])))
+        features.append(float(Fraction(experiment[key]["stop"])))
+    return features
+
+def feature_names()->List[str]:
+    return [key + suffix for key in INT_RANGE_KEYS + RATIO_RANGE_KEYS for suffix in [".start", ".stop"]]
+
+def load_samples(filename: str)->List[dict]:
+    """ Lines of {experiment, calculator, summary} as written by gen_soa.py --summaryfile """
+    with open(filename, 'r') as samplefile:
+        return [json.loads(line) for line in samplefile if line.strip()]
+
+def _to_target(values: np.ndarray, transform: str)->np.ndarray:
+    return np.log1p(np.maximum(values, 0.0)) if transform == "log" else values
+
+def _from_target(values: np.ndarray, transform: str)->np.ndarray:
+    return np.expm1(values) if transform == "log" else values
+
+class SurrogateModel:
+    """
+    Ridge regression on the quadratic terms of the config features, one per metric.
+    The uncertainty is the spread of the predictions of models fitted on bootstrap resamples.
+    """
+    def __init__(self, degree: int = 2, alpha: float = 1.0, bootstrap: int = 20, seed: int = None):
+        self.degree = degree
+        self.alpha = alpha
+        self.bootstrap = bootstrap
+        self.rng = np.random.default_rng(seed)
+        self.feature_mean = None
+        self.feature_std = None
+        self.coefficients = {}
+
+    def _design(self, features: np.ndarray)->np.ndarray:
+        scaled = (features - self.feature_mean) / self.feature_std
+        columns = [np.ones((len(scaled), 1)), scaled]
+        if self.degree >= 2:
+            upper = np.triu_indices(scaled.shape[1])
+            columns.append((scaled[:, :, None]*scaled[:, None, :])[:, upper[0], upper[1]])
+        return np.hstack(columns)
+
+    def _ridge(self, design: np.ndarray, target: np.ndarray)->np.ndarray:
+        penalty = self.alpha*np.eye(design.shape[1])
+        penalty[0, 0] = 0.0
+        return np.linalg.solve(design.T @ design + penalty, design.T @ target)
+
+    def fit(self, samples: List[dict]):
+        features = np.array([config_features(s["experiment"]) for s in samples])
+        self.feature_mean = features.mean(axis = 0)
+        self.feature_std = np.where(features.std(axis = 0) > 0, features.std(axis = 0), 1.0)
+        design = self._design(features)
+        for metric, transform in METRIC_TRANSFORMS.items():
+            target = _to_target(np.array([float(s["summary"]["metrics"][metric]) for s in samples]), transform)
+            fits = []
+            for _ in range(self.bootstrap):
+                chosen = self.rng.integers(0, len(samples), len(samples))
+                fits.append(self._ridge(design[chosen], target[chosen]))
+            self.coefficients[metric] = np.array(fits)
+        return self
+
+    def predict(self, experiments: List[dict])->Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """ Mean and standard deviation of every metric for every experiment configuration"""
+        design = self._design(np.array([config_features(e) for e in experiments]))
+        predictions = {}
+        for metric, transform in METRIC_TRANSFORMS.items():
+            ensemble = _from_target(design @ self.coefficients[metric].T, transform)
+            predictions[metric] = (ensemble.mean(axis = 1), ensemble.std(axis = 1))
+        return predictions
+
+    def __str__(self):
+        return "SurrogateModel: degree: {}, alpha: {}, bootstrap: {}, metrics: {}".format(self.degree, self.alpha, self.bootstrap, list(self.coefficients.keys()))
+
+def scale_range(candidate: dict, experiment: dict, key: str, start_factor: float, stop_factor: float):
+    """ Sets the range key of the candidate to the range of the experiment with its bounds scaled. Int bounds stay at least 1 and the stop at least the start."""
+    if key in RATIO_RANGE_KEYS:
+        start = Fraction(experiment[key]["start"])*Fraction(start_factor).limit_denominator(1000)
+        stop = max(start, Fraction(experiment[key]["stop"])*Fraction(stop_factor).limit_denominator(1000))
+        candidate[key] = { "start": str(start), "stop": str(stop) }
+    else:
+        start = max(1, int(round(int(experiment[key]["start"])*start_factor)))
+        stop = max(start, int(round(int(experiment[key]["stop"])*stop_factor)))
+        candidate[key] = { "start": start, "stop": stop }
+    return candidate
+
+def random_candidates(experiment: dict, count: int, rng: Random, spread: float = 2.0)->List[dict]:
+    """ Variations of an experiment configuration, with every range bound scaled by a log uniform factor within [1/spread, spread]"""
+    candidates = []
+    for _ in range(count):
+        candidate = json.loads(json.dumps(experiment))
+        for key in INT_RANGE_KEYS + RATIO_RANGE_KEYS:
+            scale_range(candidate, experiment, key, spread**rng.uniform(-1, 1), spread**rng.uniform(-1, 1))
+        candidates.append(candidate)
+    return candidates
+
+class ScreenedCandidate:
+    def __init__(self, experiment: dict, mean: float, std: float, reason: str):
+        self.experiment = experiment
+        self.mean = mean
+        self.std = std
+        self.reason = reason
+
+    def to_string(self):
+        return "ScreenedCandidate: predicted {:.4g} +/- {:.2g}, {}".format(self.mean, self.std, self.reason)
+
+    def __str__(self):
+        return self.to_string()
+
+class Screening:
+    """ Keeps the candidates predicted to be the lowest for a metric, and the ones the model is unsure about """
+    def __init__(self, model: SurrogateModel, metric: str = "mean-cost"):
+        self.model = model
+        self.metric = metric
+        self.keep = 10
+        self.kappa = 1.0
+        self.max_relative_std = 0.5
+
+    def set_keep(self, keep: int):
+        self.keep = keep
+        return self
+
+    def set_kappa(self, kappa: float):
+        self.kappa = kappa
+        return self
+
+    def set_max_relative_std(self, max_relative_std: float):
+        self.max_relative_std = max_relative_std
+        return self
+
+    def screen(self, experiments: List[dict])->List[ScreenedCandidate]:
+        mean, std = self.model.predict(experiments)[self.metric]
+        lower_bound = mean - self.kappa*std
+        promising = set(np.argsort(lower_bound)[:self.keep].tolist())
+        uncertain = set(np.flatnonzero(std > self.max_relative_std*np.abs(mean)).tolist())
+        selected = []
+        for i in sorted(promising.union(uncertain), key = lambda i: lower_bound[i]):
+            reason = "promising" if i in promising else "uncertain"
+            selected.append(ScreenedCandidate(experiments[i], float(mean[i]), float(std[i]), reason))
+        return selected
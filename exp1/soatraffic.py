@@ -0,0 +1,351 @@
+from typing import List, Dict
+from heapq import heappush, heappop, heapify
+from math import inf
+from collections import deque
+from random import Random
+import numpy as np
+from soadata import DataSystem, DataService, DataPropertyType, ServiceAndClass, FailureSampler
+
+MICRO_SEC_BY_DAY = 86400 * 1000000
+
+class TrafficConfig:
+    """Parameters of the discrete event simulation of one day of traffic"""
+    def __init__(self):
+        self.concurrency = 8
+        self.memory_per_request_byte = 0
+        self.depth_limit = 6
+        self.max_hops = 64
+        self.jitter = True
+
+    @classmethod
+    def from_obj(cls, content):
+        config = cls()
+        config.set_concurrency(int(content.get("concurrency", config.concurrency)))
+        config.set_memory_per_request_byte(int(content.get("memory-per-request-byte", config.memory_per_request_byte)))
+        config.set_depth_limit(int(content.get("depth-limit", config.depth_limit)))
+        config.set_max_hops(int(content.get("max-hops", config.max_hops)))
+        config.set_jitter(bool(content.get("jitter", config.jitter)))
+        return config
+
+    def set_concurrency(self, concurrency: int):
+        self.concurrency = concurrency
+        return self
+
+    def set_memory_per_request_byte(self, memory_per_request_byte: int):
+        self.memory_per_request_byte = memory_per_request_byte
+        return self
+
+    def set_depth_limit(self, depth_limit: int):
+        self.depth_limit = depth_limit
+        return self
+
+    def set_max_hops(self, max_hops: int):
+        self.max_hops = max_hops
+        return self
+
+    def set_jitter(self, jitter: bool):
+        self.jitter = jitter
+        return self
+
+    def get_concurrency(self, service: DataService)->int:
+        """ The number of requests a service can process at the same time"""
+        if self.memory_per_request_byte > 0:
+            return max(1, service.max_memory_byte // self.memory_per_request_byte)
+        return self.concurrency
+
+    def __str__(self):
+        return "TrafficConfig: concurrency: {}, memory/request (bytes): {}, depth limit: {}, max hops: {}, jitter: {}".format(
+            self.concurrency, self.memory_per_request_byte, self.depth_limit, self.max_hops, self.jitter)
+
+def percentiles(values: np.ndarray)->List[float]:
+    if len(values) == 0:
+        return [0.0, 0.0, 0.0]
+    return [float(v) for v in np.percentile(values, [50, 99, 99.9])]
+
+def group_by(keys: np.ndarray, count: int)->List[np.ndarray]:
+    """ The positions of each key in [0, count), in their original order """
+    # A stable sort of small integers is a radix sort
+    order = np.argsort(keys.astype(np.int16) if count <= np.iinfo(np.int16).max else keys, kind = "stable")
+    return np.split(order, np.cumsum(np.bincount(keys, minlength = count))[:-1])
+
+class ServiceTraffic:
+    """Latency (micro seconds) and queueing statistics for one service"""
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.queued = 0
+        self.mean_wait = 0.0
+        self.p50 = 0.0
+        self.p99 = 0.0
+        self.p999 = 0.0
+
+    def get_timeout_rate(self)->float:
+        return self.timeouts / self.requests if self.requests > 0 else 0.0
+
+    def get_queued_rate(self)->float:
+        return self.queued / self.requests if self.requests > 0 else 0.0
+
+    def to_string(self):
+        return "ServiceTraffic {}: concurrency: {}, requests: {}, errors: {}, timeout rate: {:.6f}, queued rate: {:.6f}, mean wait: {:.1f}, p50: {:.1f}, p99: {:.1f}, p999: {:.1f}".format(
+            self.name, self.concurrency, self.requests, self.errors, self.get_timeout_rate(), self.get_queued_rate(), self.mean_wait, self.p50, self.p99, self.p999)
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return self.to_string()
+
+class UsageTraffic:
+    """End to end latency (micro seconds) for the requests of one data usage"""
+    def __init__(self, datatype: DataPropertyType, hops: int):
+        self.datatype = datatype
+        self.hops = hops
+        self.requests = 0
+        self.timeouts = 0
+        self.p50 = 0.0
+        self.p99 = 0.0
+        self.p999 = 0.0
+
+    def to_string(self):
+        return "UsageTraffic {}: hops: {}, requests: {}, timeouts: {}, p50: {:.1f}, p99: {:.1f}, p999: {:.1f}".format(
+            self.datatype, self.hops, self.requests, self.timeouts, self.p50, self.p99, self.p999)
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return self.to_string()
+
+class TrafficReport:
+    def __init__(self):
+        self.events = 0
+        self.services = []
+        self.usages = []
+
+    def to_string(self):
+        return "TrafficReport: events: {}\n".format(self.events) + "\n".join([str(s) for s in self.services] + [str(u) for u in self.usages])
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return self.to_string()
+
+class TrafficSimulation:
+    """ Replays one day of requests of every data usage through its reference chain.
+
+    Each request visits the services of the chain one after the other (depth first, like calculate_magnitude_recursively).
+    A service processes at most `concurrency` requests at the same time, the others wait in a FIFO queue.
+    A hop taking longer than 2^timeout_magnitude micro seconds aborts the request.
+    The arrivals and service times of all the hops are drawn in numpy batches and the hops computed level by level, as if nothing queued.
+    That is exact as long as no service exceeds its concurrency, otherwise an event loop takes over from the first overflow.
+    """
+    def __init__(self, datasystem: DataSystem, config: TrafficConfig, seed: int = None):
+        self.datasystem = datasystem
+        self.config = config
+        self.rng = np.random.default_rng(seed)
+        self.failure_sampler = FailureSampler(Random(seed))
+        self.services = datasystem.get_services()
+        self.service_index = dict([(s.name, i) for i, s in enumerate(self.services)])
+
+    def get_route(self, proptype: DataPropertyType)->List[int]:
+        """ Service indexes visited by a request to the given ref datatype """
+        route = []
+        self._add_route(route, proptype, self.config.depth_limit)
+        return route[:self.config.max_hops]
+
+    def _add_route(self, route: List[int], proptype: DataPropertyType, limit: int):
+        if len(route) >= self.config.max_hops:
+            return
+        sc = ServiceAndClass.from_data_property_type(self.datasystem.data_service_repo, self.datasystem.data_class_repo, proptype)
+        route.append(self.service_index[sc.service.name])
+        if limit <= 0:
+            return
+        for dt in sorted(sc.dataclass.get_ref_datatypes(), key = str):
+            self._add_route(route, dt, limit - 1)
+
+    def _service_times(self, service: DataService, count: int)->np.ndarray:
+        """ Batch of processing times in micro seconds, with the failed requests using the error processing time.
+        A failed request is flagged with a negative time."""
+        times = np.full(count, float(2 ** service.processing_magnitude))
+        if self.config.jitter:
+            times *= self.rng.exponential(1.0, count)
+        failed = self.failure_sampler.service_positions(service, count)
+        if len(failed) > 0:
+            times[failed] = -float(2 ** service.error_processing_magnitude)
+            if self.config.jitter:
+                times[failed] *= self.rng.exponential(1.0, len(failed))
+        return times
+
+    def _hop_service_times(self, hop_services: np.ndarray)->np.ndarray:
+        """ The processing time of every hop, drawn in one batch by service. A failed hop is flagged with a negative time."""
+        times = np.zeros(len(hop_services))
+        for service, positions in zip(self.services, group_by(hop_services, len(self.services))):
+            if len(positions) > 0:
+                times[positions] = self._service_times(service, len(positions))
+        return times
+
+    def _first_overflow(self, groups: List[np.ndarray], starts: np.ndarray, ends: np.ndarray, limits: np.ndarray)->float:
+        """ The first time a service would exceed its concurrency with every hop started as soon as it arrives, inf if never.
+        At equal times a start counts before an end, so a tie never hides a queue."""
+        first = inf
+        for svc, positions in enumerate(groups):
+            if len(positions) <= limits[svc]:
+                continue
+            sorted_starts = np.sort(starts[positions])
+            sorted_ends = np.sort(ends[positions])
+            # Running at the i-th start: the i + 1 started so far minus the ones ended strictly before
+            running = np.arange(1, len(positions) + 1) - np.searchsorted(sorted_ends, sorted_starts, side = "left")
+            over = np.flatnonzero(running > limits[svc])
+            if len(over) > 0:
+                first = min(first, float(sorted_starts[over[0]]))
+        return first
+
+    def _run_without_queues(self, arrival_times: np.ndarray, hop_counts: np.ndarray, hop_offsets: np.ndarray, hop_services: np.ndarray, service_times: np.ndarray, timeouts_us: np.ndarray, hops: dict)->np.ndarray:
+        """ Every hop starts when it arrives: the hops are computed one level at a time for all the requests. Returns the timed out requests."""
+        clock = arrival_times.copy()
+        timed_out = np.zeros(len(arrival_times), dtype = bool)
+        requests = np.arange(len(arrival_times))
+        hop = 0
+        while len(requests) > 0:
+            positions = hop_offsets[requests] + hop
+            durations = np.abs(service_times[positions])
+            hops["arrivals"][positions] = clock[requests]
+            hops["starts"][positions] = clock[requests]
+            clock[requests] += durations
+            hops["ends"][positions] = clock[requests]
+            late = durations > timeouts_us[hop_services[positions]]
+            timed_out[requests[late]] = True
+            hop += 1
+            requests = requests[~late & (hop_counts[requests] > hop)]
+        hops["request-ends"][:] = clock
+        return timed_out
+
+    def _run_events(self, arrival_times: np.ndarray, hop_counts: np.ndarray, hop_offsets: np.ndarray, hop_services: np.ndarray, service_times: np.ndarray, timeouts_us: np.ndarray, limits: np.ndarray, hops: dict, timed_out: np.ndarray, since: float):
+        """
+        The event loop, for when some service has to queue requests. Up to the time since, nothing queued, so the hops computed without queues are kept:
+        the loop starts with the hops running at that time and replaces everything after. The heap holds (end, hop position, arrival).
+        """
+        arrivals, starts, ends, request_ends = hops["arrivals"], hops["starts"], hops["ends"], hops["request-ends"]
+        started = starts < since
+        running = np.flatnonzero(started & (ends >= since))
+        heap = list(zip(ends[running].tolist(), running.tolist(), arrivals[running].tolist()))
+        heapify(heap)
+        busy = np.bincount(hop_services[running], minlength = len(self.services)).tolist()
+        for values in (arrivals, starts, ends):
+            values[~started] = np.nan
+        ends[running] = np.nan
+        unfinished = request_ends >= since
+        timed_out[unfinished] = False
+        request_ends[unfinished] = np.nan
+
+        total = len(arrival_times)
+        queues = [deque() for _ in self.services]
+        # Read only in the loop, where indexing a list is several times faster than a numpy array
+        services = hop_services.tolist()
+        durations = np.abs(service_times).tolist()
+        requests = np.repeat(np.arange(total), hop_counts).tolist()
+        lasts = (hop_offsets + hop_counts - 1).tolist()
+        firsts = hop_offsets.tolist()
+        arrival_list = arrival_times.tolist()
+        limit_list = limits.tolist()
+        timeout_list = timeouts_us.tolist()
+
+        next_arrival = int(np.searchsorted(arrival_times, since, side = "left"))
+        while next_arrival < total or heap:
+            if next_arrival < total and (not heap or arrival_list[next_arrival] <= heap[0][0]):
+                position = firsts[next_arrival]
+                now = arrival_list[next_arrival]
+                next_arrival += 1
+            else:
+                now, done, arrived = heappop(heap)
+                svc = services[done]
+                ends[done] = now
+                busy[svc] -= 1
+                if queues[svc]:
+                    queued, queued_at = queues[svc].popleft()
+                    busy[svc] += 1
+                    starts[queued] = now
+                    heappush(heap, (now + durations[queued], queued, queued_at))
+                req = requests[done]
+                if now - arrived > timeout_list[svc]:
+                    timed_out[req] = True
+                    request_ends[req] = now
+                    continue
+                if done == lasts[req]:
+                    request_ends[req] = now
+                    continue
+                position = done + 1
+            svc = services[position]
+            arrivals[position] = now
+            if busy[svc] < limit_list[svc]:
+                busy[svc] += 1
+                starts[position] = now
+                heappush(heap, (now + durations[position], position, now))
+            else:
+                queues[svc].append((position, now))
+
+    def run(self)->TrafficReport:
+        usages = self.datasystem.get_usage_overview().usages
+        routes = [self.get_route(usage.datatype) for usage in usages]
+        req_counts = np.array([usage.req_by_day for usage in usages], dtype = np.int64)
+        total = int(req_counts.sum())
+
+        # Requests are generated in one batch: arrival time and usage of each request
+        arrival_times = self.rng.uniform(0, MICRO_SEC_BY_DAY, total)
+        request_usages = np.repeat(np.arange(len(usages)), req_counts)
+        order = np.argsort(arrival_times, kind = "stable")
+        arrival_times = arrival_times[order]
+        request_usages = request_usages[order]
+
+        # The hops of all the requests, request after request: hop h of request r is at hop_offsets[r] + h
+        route_lengths = np.array([len(route) for route in routes], dtype = np.int64)
+        route_table = np.full((len(routes), int(route_lengths.max(initial = 0))), -1, dtype = np.int64)
+        for u, route in enumerate(routes):
+            route_table[u, :len(route)] = route
+        hop_counts = route_lengths[request_usages]
+        hop_offsets = np.cumsum(hop_counts) - hop_counts
+        hop_total = int(hop_counts.sum())
+        hop_requests = np.repeat(np.arange(total), hop_counts)
+        hop_services = route_table[request_usages[hop_requests], np.arange(hop_total) - hop_offsets[hop_requests]]
+        service_times = self._hop_service_times(hop_services)
+
+        limits = np.array([self.config.get_concurrency(s) for s in self.services], dtype = np.int64)
+        timeouts_us = np.array([float(2 ** s.timeout_magnitude) for s in self.services])
+        # NaN for the hops that never ran, after a time out
+        hops = { "arrivals": np.full(hop_total, np.nan), "starts": np.full(hop_total, np.nan), "ends": np.full(hop_total, np.nan), "request-ends": np.zeros(total) }
+        timed_out = self._run_without_queues(arrival_times, hop_counts, hop_offsets, hop_services, service_times, timeouts_us, hops)
+        ran = ~np.isnan(hops["ends"])
+        ran_positions = np.flatnonzero(ran)
+        since = self._first_overflow([ran_positions[g] for g in group_by(hop_services[ran_positions], len(self.services))], hops["starts"], hops["ends"], limits)
+        if since < inf:
+            self._run_events(arrival_times, hop_counts, hop_offsets, hop_services, service_times, timeouts_us, limits, hops, timed_out, since)
+            ran = ~np.isnan(hops["ends"])
+
+        report = TrafficReport()
+        report.events = total + int(np.count_nonzero(ran))
+        latencies = hops["ends"] - hops["arrivals"]
+        waits = hops["starts"] - hops["arrivals"]
+        ran_positions = np.flatnonzero(ran)
+        for i, positions in enumerate(group_by(hop_services[ran_positions], len(self.services))):
+            positions = ran_positions[positions]
+            traffic = ServiceTraffic(self.services[i].name, int(limits[i]))
+            traffic.requests = len(positions)
+            traffic.errors = int(np.count_nonzero(service_times[positions] < 0))
+            traffic.timeouts = int(np.count_nonzero(latencies[positions] > timeouts_us[i]))
+            traffic.queued = int(np.count_nonzero(waits[positions] > 0))
+            traffic.mean_wait = float(waits[positions].mean()) if traffic.requests > 0 else 0.0
+            traffic.p50, traffic.p99, traffic.p999 = percentiles(latencies[positions])
+            report.services.append(traffic)
+
+        durations = hops["request-ends"] - arrival_times
+        for u, requests in enumerate(group_by(request_usages, len(usages))):
+            traffic = UsageTraffic(usages[u].datatype, len(routes[u]))
+            traffic.requests = len(requests)
+            traffic.timeouts = int(np.count_nonzero(timed_out[requests]))
+            traffic.p50, traffic.p99, traffic.p999 = percentiles(durations[requests[~timed_out[requests]]])
+            report.usages.append(traffic)
+        return report
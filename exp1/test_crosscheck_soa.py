@@ -0,0 +1,24 @@
+import json
+from fractions import Fraction
+import pytest
+from soadata import ExactNumeric
+import crosscheck_soa
+
+LOG10_2 = Fraction("0.30102999566398119521373889472449302676818988146211")
+
+def test_exact_log_has_the_stated_precision():
+    numeric = ExactNumeric()
+    assert abs(numeric.log(2, 10) - LOG10_2) < Fraction(1, 10**40)
+    assert abs(numeric.log(Fraction(1, 2), 10) + LOG10_2) < Fraction(1, 10**40)
+    assert abs(ExactNumeric(log_digits = 60).log(2, 10) - numeric.log(2, 10)) < Fraction(1, 10**40)
+    assert numeric.log(Fraction(1, 1000), 10) == -3 and numeric.log(125, 5) == 3
+
+def test_cross_check_compares_float_with_the_exact_costs(wholeconfig, tmp_path):
+    configfile = tmp_path / "config.json"
+    configfile.write_text(json.dumps(wholeconfig))
+    check = crosscheck_soa.main(["-c", str(configfile), "-n", "6"])
+    assert check.systems > 0 and check.mismatches == 0
+    # The exact costs are no longer the floats converted to Fractions
+    assert 0 < check.max_relative < 1e-12
+    with pytest.raises(SystemExit):
+        crosscheck_soa.main(["-c", str(configfile), "-n", "6", "--tolerance", "0"])
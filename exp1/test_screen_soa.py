@@ -0,0 +1,31 @@
+import json
+import os
+from random import Random
+from soasurrogate import random_candidates, config_features
+from soarun import PreparedExperiment
+import screen_soa
+
+def synthetic_cost(experiment: dict)->float:
+    return 1000.0 + sum([(i + 1)*10.0*v for i, v in enumerate(config_features(experiment))])
+
+def test_selected_candidates_are_written_as_gen_soa_configs(wholeconfig, tmp_path):
+    samples = [{ "experiment": e, "summary": { "metrics": { "mean-cost": synthetic_cost(e), "mean-storage": 1e6, "mean-transfer": 1e7, "timeout-crash-rate": 0.01 } } }
+        for e in random_candidates(wholeconfig["experiment"], 80, Random(0))]
+    trainingfile = tmp_path / "training.jsonl"
+    trainingfile.write_text("".join([json.dumps(s) + "\n" for s in samples]))
+    configfile = tmp_path / "config.json"
+    configfile.write_text(json.dumps(wholeconfig))
+    outputdir = tmp_path / "selected"
+    selected = screen_soa.main(["-t", str(trainingfile), "-c", str(configfile), "-n", "200", "--keep", "5", "--seed", "1", "-d", str(outputdir), "-o", str(tmp_path / "selected.jsonl")])
+    assert len(selected) >= 5
+    assert sorted(os.listdir(str(outputdir))) == sorted(["candidate-{}.json".format(i + 1) for i in range(len(selected))])
+    with open(str(outputdir / "candidate-1.json")) as candidatefile:
+        config = json.load(candidatefile)
+    assert config["experiment"] == selected[0].experiment and config["calculator"] == wholeconfig["calculator"]
+    PreparedExperiment(config)
+    with open(str(tmp_path / "selected.jsonl")) as linesfile:
+        assert [json.loads(line) for line in linesfile] == [json.load(open(str(outputdir / "candidate-{}.json".format(i + 1)))) for i in range(len(selected))]
+    # The metric is a function of the features, so the promising candidates are among the cheapest
+    costs = sorted([synthetic_cost(e) for e in random_candidates(wholeconfig["experiment"], 200, Random(1))])
+    ranks = [costs.index(synthetic_cost(c.experiment)) for c in selected if c.reason == "promising"]
+    assert sum(ranks) / len(ranks) < len(costs) / 4
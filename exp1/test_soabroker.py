@@ -0,0 +1,112 @@
+import json
+import multiprocessing
+import socket
+import threading
+import time
+import soabroker
+from soabroker import Coordinator, CoordinatorServer, Worker, run_unit
+from soadata import ExperimentSummary
+
+def serve(coordinator: Coordinator, workers: int = 1)->Coordinator:
+    """ Runs workers in threads until the coordinator is done. They share the random module, so more than one only fits units that do not generate systems."""
+    server = CoordinatorServer(coordinator)
+    threads = [threading.Thread(target = Worker("127.0.0.1", server.get_port(), "worker-{}".format(i)).run) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    server.serve_until_done(poll_interval = 0.05)
+    for thread in threads:
+        thread.join()
+    return coordinator
+
+def test_units_merge_like_a_sequential_run(wholeconfig):
+    coordinator = serve(Coordinator().add_config(wholeconfig, 0, 12, 5))
+    expected = ExperimentSummary()
+    for start in [0, 5, 10]:
+        expected.merge(run_unit(wholeconfig, start, min(start + 5, 12)))
+    summary = coordinator.get_summaries()[0]
+    assert summary.to_obj() == expected.to_obj()
+    assert summary.systems + summary.errors == 12
+
+def test_summaries_merge_in_unit_order_whatever_the_completion_order(wholeconfig):
+    partial = [run_unit(wholeconfig, start, start + 3) for start in [0, 3, 6]]
+    summaries = []
+    for order in [[0, 1, 2], [2, 0, 1], [1, 2, 0]]:
+        coordinator = Coordinator().add_config(wholeconfig, 0, 9, 3)
+        leases = dict([(reply["unit"]["id"], reply["lease"]) for reply in [coordinator.lease("w") for _ in range(3)]])
+        for unit_id in order:
+            coordinator.complete(leases[unit_id], unit_id, partial[unit_id].to_obj())
+        assert coordinator.is_done()
+        summaries.append(coordinator.get_summaries()[0].to_obj())
+    assert summaries[0] == summaries[1] == summaries[2]
+
+def test_a_long_unit_keeps_its_lease(wholeconfig, monkeypatch):
+    def slow_unit(config, seed_start, seed_stop):
+        time.sleep(0.8)
+        summary = ExperimentSummary()
+        summary.systems = seed_stop - seed_start
+        return summary
+    monkeypatch.setattr(soabroker, "run_unit", slow_unit)
+    coordinator = Coordinator(lease_timeout = 0.3).add_config(wholeconfig, 0, 2, 1)
+    server = CoordinatorServer(coordinator)
+    worker = Worker("127.0.0.1", server.get_port())
+    thread = threading.Thread(target = worker.run)
+    thread.start()
+    server.serve_until_done(poll_interval = 0.05)
+    thread.join()
+    assert coordinator.redispatched == 0
+    assert worker.units_done == 2 and worker.renewals >= 4
+
+def test_malformed_requests_get_an_error_reply(wholeconfig):
+    coordinator = Coordinator().add_config(wholeconfig, 0, 2, 1)
+    server = CoordinatorServer(coordinator)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    try:
+        connection = socket.create_connection(("127.0.0.1", server.get_port()), timeout = 5)
+        reader = connection.makefile("r", encoding = "utf-8")
+        for line in ["not json", json.dumps({ "op": "renew" }), json.dumps({ "op": "complete", "lease": "x", "unit": 0, "summary": {} }), json.dumps([1])]:
+            connection.sendall((line + "\n").encode("utf-8"))
+            assert "error" in json.loads(reader.readline())
+        # The connection still serves the next requests
+        connection.sendall((json.dumps({ "op": "status" }) + "\n").encode("utf-8"))
+        assert json.loads(reader.readline())["units"] == 2
+        reader.close()
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_invalid_completions_change_nothing(wholeconfig):
+    coordinator = Coordinator().add_config(wholeconfig, 0, 4, 2)
+    first, second = coordinator.lease("w"), coordinator.lease("w")
+    valid = run_unit(wholeconfig, 0, 2).to_obj()
+    replies = [
+        coordinator.complete(first["lease"], 0, {}),
+        coordinator.complete(first["lease"], 0, [1]),
+        coordinator.complete(first["lease"], 99, valid),
+        coordinator.complete(second["lease"], 0, valid),
+        coordinator.complete(first["lease"], 0, run_unit(wholeconfig, 0, 1).to_obj())
+    ]
+    assert all([not r["ok"] and "error" in r for r in replies])
+    assert coordinator.completed == set() and coordinator.results == {} and len(coordinator.leases) == 2
+    assert coordinator.complete(first["lease"], 0, valid) == { "ok": True }
+    assert coordinator.status()["completed"] == 1 and not coordinator.is_done()
+
+def run_worker(port: int, name: str):
+    Worker("127.0.0.1", port, name).run()
+
+def test_worker_processes_merge_like_a_sequential_run(wholeconfig):
+    coordinator = Coordinator().add_config(wholeconfig, 0, 16, 3)
+    server = CoordinatorServer(coordinator)
+    context = multiprocessing.get_context()
+    processes = [context.Process(target = run_worker, args = (server.get_port(), "process-{}".format(i))) for i in range(3)]
+    for process in processes:
+        process.start()
+    server.serve_until_done(poll_interval = 0.05)
+    for process in processes:
+        process.join(timeout = 30)
+        assert process.exitcode == 0
+    expected = ExperimentSummary()
+    for start in range(0, 16, 3):
+        expected.merge(run_unit(wholeconfig, start, min(start + 3, 16)))
+    assert coordinator.get_summaries()[0].to_obj() == expected.to_obj()
+    assert coordinator.redispatched == 0
@@ -0,0 +1,78 @@
+import json
+import numpy as np
+import pytest
+from fractions import Fraction
+from soadata import RatioRange
+from soacapacity import GrowthConfig, UsageArrays, CapacityProjection
+import soarun
+from soarun import run_experiment
+import gen_soa
+
+def growth_config()->GrowthConfig:
+    return GrowthConfig().set_months(24).set_uniq_growth_range(RatioRange(Fraction(0), Fraction(1, 20))).set_req_growth_range(RatioRange(Fraction(-1, 50), Fraction(1, 10))).set_req_seasonality([1.0, 0.5, 2.0])
+
+def naive_projection(arrays: UsageArrays, growth: GrowthConfig, seed: int, chunk_size: int):
+    """ The same draws as CapacityProjection, summed usage by usage and month by month """
+    rng = np.random.default_rng(seed)
+    uniq_rates = []
+    req_rates = []
+    for start in range(0, len(arrays), chunk_size):
+        count = len(arrays.systems[start:start + chunk_size])
+        uniq_rates.extend(rng.uniform(float(growth.uniq_growth_range.start), float(growth.uniq_growth_range.stop), count))
+        req_rates.extend(rng.uniform(float(growth.req_growth_range.start), float(growth.req_growth_range.stop), count))
+    storage = np.zeros((arrays.system_count, growth.months))
+    transfer = np.zeros((arrays.system_count, growth.months))
+    for i in range(len(arrays)):
+        for month in range(growth.months):
+            system = arrays.systems[i]
+            storage[system, month] += float(arrays.uniq_counts[i])*float(arrays.weights[i])*(1 + uniq_rates[i])**month*growth.uniq_seasonality[month % len(growth.uniq_seasonality)]
+            transfer[system, month] += float(arrays.req_by_days[i])*float(arrays.weights[i])*30*(1 + req_rates[i])**month*growth.req_seasonality[month % len(growth.req_seasonality)]
+    return storage, transfer
+
+def test_projection_matches_a_naive_loop(datasystems):
+    arrays = UsageArrays().add_datasystems(datasystems)
+    growth = growth_config()
+    # A chunk size that splits the usages of some systems across two chunks
+    report = CapacityProjection(growth, seed = 3, chunk_size = 7).project(arrays)
+    storage, transfer = naive_projection(arrays, growth, 3, 7)
+    np.testing.assert_allclose(report.storage, storage, rtol = 1e-9)
+    np.testing.assert_allclose(report.transfer, transfer, rtol = 1e-9)
+    month0 = [sum([u.get_weighted_data_storage() for u in s.get_usage_overview().usages]) for s in datasystems]
+    np.testing.assert_allclose(report.storage[:, 0], [float(v) for v in month0], rtol = 1e-9)
+
+def test_gen_soa_prints_the_capacity_report(wholeconfig, tmp_path, capsys):
+    wholeconfig["experiment"]["datasystem-count"] = 4
+    wholeconfig["calculator"]["capacity"] = { "months": 24, "uniq-growth-range": { "start": "0", "stop": "1/20" }, "req-growth-range": { "start": "0", "stop": "1/10" } }
+    configfile = tmp_path / "config.json"
+    configfile.write_text(json.dumps(wholeconfig))
+    gen_soa.main(["-c", str(configfile), "--seed", "0"])
+    assert "CapacityReport: systems: " in capsys.readouterr().out
+
+def test_gen_soa_resumes_the_capacity_report(wholeconfig, tmp_path, capsys, monkeypatch):
+    wholeconfig["experiment"]["datasystem-count"] = 6
+    wholeconfig["calculator"]["capacity"] = { "months": 12, "uniq-growth-range": { "start": "0", "stop": "1/20" }, "req-growth-range": { "start": "0", "stop": "1/10" } }
+    configfile = tmp_path / "config.json"
+    configfile.write_text(json.dumps(wholeconfig))
+    checkpoint = str(tmp_path / "checkpoint.json")
+    args = ["-c", str(configfile), "--seed", "0", "--checkpoint", checkpoint, "--checkpoint-every", "2"]
+    def report():
+        return [line for line in capsys.readouterr().out.splitlines() if line.startswith("CapacityReport") or line.startswith("month ")]
+    gen_soa.main(["-c", str(configfile), "--seed", "0"])
+    expected = report()
+    calls = []
+    def failing_run(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise KeyboardInterrupt()
+        return run_experiment(*args, **kwargs)
+    monkeypatch.setattr(soarun, "run_experiment", failing_run)
+    with pytest.raises(KeyboardInterrupt):
+        gen_soa.main(args)
+    monkeypatch.setattr(soarun, "run_experiment", run_experiment)
+    capsys.readouterr()
+    gen_soa.main(args + ["--resume"])
+    assert report() == expected
+
+def test_gen_soa_refuses_a_checkpoint_every_zero_systems(wholeconfig):
+    with pytest.raises(SystemExit):
+        gen_soa.parse_args(["-c", "config.json", "--checkpoint", "checkpoint.json", "--checkpoint-every", "0"])
@@ -0,0 +1,83 @@
+from fractions import Fraction
+from random import Random
+from math import sqrt
+from collections import Counter
+from soadata import FailureSampler, DataUsageTable, NamePool, pooled_type, pooled_ref_type
+
+def test_failure_positions_edge_rates():
+    sampler = FailureSampler(Random(1))
+    assert sampler.positions(Fraction(0), 100) == []
+    assert sampler.positions(Fraction(1, 10), 0) == []
+    assert sampler.positions(Fraction(1), 5) == [0, 1, 2, 3, 4]
+
+def test_failure_positions_are_sorted_and_in_range():
+    sampler = FailureSampler(Random(2))
+    for _ in range(200):
+        positions = sampler.positions(Fraction(1, 7), 300)
+        assert positions == sorted(set(positions))
+        assert all([0 <= p < 300 for p in positions])
+
+def test_failure_count_is_binomial():
+    sampler = FailureSampler(Random(3))
+    rate, count, trials = Fraction(1, 1000), 100000, 400
+    counts = [sampler.count(rate, count) for _ in range(trials)]
+    mean = sum(counts) / trials
+    expected = float(rate)*count
+    # The mean of the trials is within 4 standard errors of the binomial mean
+    assert abs(mean - expected) < 4*sqrt(expected*(1 - float(rate)) / trials)
+
+def test_every_position_fails_with_the_error_rate():
+    sampler = FailureSampler(Random(4))
+    rate, count, trials = Fraction(1, 5), 10, 20000
+    failures = [0]*count
+    for _ in range(trials):
+        for p in sampler.positions(rate, count):
+            failures[p] += 1
+    sigma = sqrt(float(rate)*(1 - float(rate))*trials)
+    assert all([abs(f - float(rate)*trials) < 4*sigma for f in failures])
+
+def test_failure_positions_are_reproducible():
+    assert FailureSampler(Random(5)).positions(Fraction(1, 50), 10000) == FailureSampler(Random(5)).positions(Fraction(1, 50), 10000)
+
+def test_usage_table_summarises_like_the_usages(datasystems):
+    for datasystem in datasystems:
+        overview = datasystem.get_usage_overview()
+        usages = overview.usages
+        assert len(usages) == len(overview) > 0
+        assert overview.data_storage == sum([u.get_weighted_data_storage() for u in usages])
+        assert overview.monthly_data_transfer == sum([u.get_monthly_weighted_data_transfer() for u in usages])
+        assert overview.service_cost == sum([u.get_weighted_service_cost() for u in usages], Fraction(0))
+        assert overview.processing_magnitude == max([u.processing_magnitude for u in usages])
+        assert overview.crashes == set().union(*[u.crashes for u in usages])
+        assert overview.feature_categories == Counter([c for u in usages for c in u.feature_categories])
+        assert overview.requirement_categories == Counter([c for u in usages for c in u.requirement_categories])
+
+def test_usage_table_rows_round_trip():
+    table = DataUsageTable()
+    table.append(pooled_type("Int"), 3, 40, 2, 5, Fraction(1, 3), ["timeout"], ["a", "b"], [])
+    table.append(pooled_type("Type1"), 7, 1, 1, 0, Fraction(2), [], [], ["b"])
+    second = table.get_usage(1)
+    copied = DataUsageTable().append_usage(table.get_usage(0)).append_usage(second)
+    assert second.datatype.datatype == "Type1" and second.uniq_count == 7 and second.requirement_categories == ["b"]
+    assert table.get_usage(0).crashes == {"timeout"} and second.crashes == set()
+    assert list(copied.crash_masks) == list(table.crash_masks)
+    assert list(copied.feature_offsets) == [0, 2, 2] and list(copied.requirement_ids) == list(table.requirement_ids)
+    assert table.get_service_cost() == Fraction(40, 3) + 2
+    assert table.get_crash_count() == 1
+
+def test_name_pool_grows_lazily_with_the_formatted_names():
+    pool = NamePool("Name{}")
+    assert pool.get(3) == "Name3" and len(pool) >= 4
+    assert pool.slice(2, 12) == ["Name{}".format(n) for n in range(2, 12)]
+    reserved = NamePool("Name{}").reserve(20)
+    assert len(reserved) == 20 and reserved.slice(0, 12) == pool.slice(0, 12)
+
+def test_systems_share_pooled_names_and_types(datasystems):
+    assert pooled_type("Type1") is pooled_type("Type1")
+    assert pooled_ref_type("Service1", "ClassName2") is pooled_type("Service1:ClassName2")
+    first, second = datasystems[0], datasystems[1]
+    shared = set(first.data_class_name_repo.get_names()) & set(second.data_class_name_repo.get_names())
+    assert len(shared) > 0
+    names = dict([(name, name) for name in first.data_class_name_repo.get_names()])
+    assert all([names[name] is name for name in second.data_class_name_repo.get_names() if name in names])
+    assert all([dt is pooled_type(dt.datatype) for dt in list(first.data_property_type_repo.simple_store) + list(first.data_property_type_repo.ref_store)])
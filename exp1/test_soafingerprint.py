@@ -0,0 +1,88 @@
+import copy
+from random import Random
+import pytest
+from soadata import DataPropertyType, DataProperty, DataClass
+from soafingerprint import system_fingerprint
+from soasearch import DesignMutator, shallow_copy
+
+def renamed(datasystem):
+    """ A copy with other names for every service and class, and the references renamed accordingly """
+    copied = copy.deepcopy(datasystem)
+    services = dict([(s.name, "Renamed{}".format(i)) for i, s in enumerate(copied.get_services())])
+    classes = dict([(c.name, "Other{}".format(i)) for i, c in enumerate(copied.get_dataclasses())])
+    def rename(datatype):
+        if not datatype.is_ref():
+            return datatype
+        return DataPropertyType.from_ref_datatype(services[datatype.get_service_name()], classes[datatype.get_dataname()])
+    for service in copied.get_services():
+        service.name = services[service.name]
+    copied.data_service_repo.dataservices = dict([(s.name, s) for s in copied.data_service_repo.dataservices.values()])
+    for dataclass in copied.get_dataclasses():
+        for prop in dataclass.properties:
+            prop.datatype = rename(prop.datatype)
+        dataclass.set_name(classes[dataclass.name]).set_properties(set(dataclass.properties))
+    copied.data_class_repo.dataclasses = dict([(c.name, c) for c in copied.data_class_repo.dataclasses.values()])
+    copied.class_workloads = dict([(classes[name], workload) for name, workload in copied.class_workloads.items()])
+    copied.data_property_type_repo.ref_store = dict.fromkeys([rename(t) for t in copied.data_property_type_repo.ref_store])
+    table = copied.get_usage_overview().table
+    table.datatypes.values = [rename(t) for t in table.datatypes.values]
+    copied.fingerprint = None
+    return copied
+
+def test_renaming_keeps_the_fingerprint(datasystems):
+    for datasystem in datasystems:
+        other = renamed(datasystem)
+        assert sorted([s.name for s in other.get_services()]) != sorted([s.name for s in datasystem.get_services()])
+        assert system_fingerprint(other) == system_fingerprint(datasystem)
+
+def test_reassigning_a_class_changes_the_fingerprint(datasystems):
+    checked = 0
+    for seed, datasystem in enumerate(datasystems):
+        before = system_fingerprint(datasystem)
+        mutator = DesignMutator(Random(seed))
+        for _ in range(10):
+            mutated = shallow_copy(datasystem)
+            if not mutator.reassign_class(mutated):
+                continue
+            # A ref datatype that no property uses can move without changing the system
+            if all([datasystem.data_class_repo.dataclasses[c.name] is c for c in mutated.get_dataclasses()]):
+                continue
+            assert system_fingerprint(mutated.refresh_data_usages()) != before
+            checked += 1
+    assert checked > 0
+
+def prop(name, datatype, min_items, max_items):
+    return DataProperty().set_name(name).set_datatype(DataPropertyType(datatype)).set_min_items(min_items).set_max_items(max_items)
+
+def test_frozen_classes_are_immutable_and_share_the_fingerprint_by_shape():
+    first = DataClass().set_name("First").set_properties(set([prop("a", "Int", 0, 1), prop("b", "S1:Other", 1, 3)]))
+    second = DataClass().set_name("Second").set_properties(set([prop("c", "Bool", 0, 1), prop("d", "S2:Another", 1, 3)]))
+    frozen = first.freeze()
+    assert frozen is first.freeze()
+    assert frozen.fingerprint == second.freeze().fingerprint
+    assert frozen.refs == ((1, 3, "S1", "Other"),)
+    assert frozen == frozen.thaw().freeze() and hash(frozen) == hash(frozen.thaw().freeze())
+    assert len(set([frozen, second.freeze()])) == 2
+    with pytest.raises(AttributeError):
+        frozen.name = "Changed"
+    with pytest.raises(TypeError):
+        hash(first)
+    first.add(prop("e", "Int", 0, 2))
+    assert first.freeze() is not frozen
+    assert first.freeze().fingerprint != frozen.fingerprint
+
+def test_fingerprints_are_computed_once_until_the_structure_changes(datasystems, monkeypatch):
+    datasystem = datasystems[0]
+    fingerprint = system_fingerprint(datasystem)
+    frozen = [c.freeze() for c in datasystem.get_dataclasses()]
+    def fail(*args):
+        raise AssertionError("computed again")
+    monkeypatch.setattr(DataClass, "freeze", fail)
+    assert system_fingerprint(datasystem) == fingerprint
+    monkeypatch.undo()
+    mutated = DesignMutator(Random(3)).mutate(datasystem)
+    assert system_fingerprint(mutated) is not None
+    # Only the classes changed by the mutation are frozen again
+    shared = [c for c in mutated.get_dataclasses() if datasystem.data_class_repo.dataclasses.get(c.name) is c]
+    assert len(shared) > 0
+    assert all([any([c.frozen is f for f in frozen]) for c in shared])
@@ -0,0 +1,46 @@
+import pytest
+from soagovernor import MemoryGovernor, parse_size
+
+MB = 1 << 20
+
+def test_parse_size():
+    assert parse_size("1048576") == MB
+    assert parse_size("512M") == parse_size("512mb") == 512*MB
+    assert parse_size("2GiB") == parse_size(" 2G ") == 2048*MB
+    assert parse_size("1.5G") == 1536*MB
+    for text in ["", "2X", "G", "-1G"]:
+        with pytest.raises(ValueError):
+            parse_size(text)
+
+def governor(budget_mb: int)->MemoryGovernor:
+    return MemoryGovernor(budget_mb*MB, max_workers = 8).set_log(None)
+
+def observe(governor: MemoryGovernor, workers: int, rss_mb: int, peak_mb: int, seconds_per_system: float = 0.01):
+    for i in range(workers):
+        governor.observe("worker-{}".format(i), 10, 10*seconds_per_system, { "rss": rss_mb*MB, "peak": peak_mb*MB, "record-bytes": 100 })
+
+def test_adjust_cuts_the_workers_over_the_budget():
+    g = governor(1000)
+    observe(g, 6, 200, 10)
+    workers, _ = g.adjust(6, 16, 8, 100*MB)
+    # The measured total of 1300MB is over the budget, and 3 workers of 215MB fit in 85% of it
+    assert workers == 3
+    assert "over the budget" in g.adjustments[-1].reason
+
+def test_adjust_grows_the_workers_at_most_twice():
+    g = governor(4000)
+    observe(g, 1, 100, 5)
+    workers, _ = g.adjust(1, 16, 8, 50*MB)
+    assert workers == 2
+    g.forget_worker("worker-0")
+    observe(g, 2, 100, 5)
+    assert g.adjust(2, 16, 8, 50*MB)[0] == 4
+
+def test_chunk_size_only_moves_off_by_a_factor_of_two():
+    g = governor(4000)
+    observe(g, 2, 100, 5, seconds_per_system = 0.02)
+    # 2s by chunk wants 100 systems
+    assert g.adjust(2, 64, 8, 50*MB)[1] == 64
+    assert g.adjust(2, 128, 8, 50*MB)[1] == 128
+    assert g.adjust(2, 16, 8, 50*MB)[1] == 64
+    assert g.adjust(2, 256, 8, 50*MB)[1] == 64
@@ -0,0 +1,61 @@
+import random
+import numpy as np
+from soalatency import LogGrid, LatencyDistribution, LatencyEvaluator
+from soadata import ServiceAndClass
+
+def relative_error(value: float, expected: float)->float:
+    return abs(value - expected) / expected
+
+def test_fast_percentiles_keep_their_resolution_next_to_slow_ones():
+    grid = LogGrid(1.0, 2.0**30, 4096)
+    spikes = [(8.0, 0.999), (2.0**30, 0.001)]
+    distribution = LatencyDistribution.from_spikes(grid, spikes)
+    assert relative_error(distribution.quantile(0.5), 8.0) <= grid.get_relative_error()
+    assert relative_error(distribution.quantile(0.9995), 2.0**30) <= grid.get_relative_error()
+    assert abs(distribution.mean() - sum([v*p for v, p in spikes])) / distribution.mean() < 1e-9
+
+def test_convolve_and_maximum_against_the_exact_distribution():
+    grid = LogGrid(1.0, 2.0**20, 4096)
+    a = [(3.0, 0.7), (100.0, 0.25), (5000.0, 0.05)]
+    b = [(7.0, 0.9), (2.0**19, 0.1)]
+    total = LatencyDistribution.from_spikes(grid, a).convolve(LatencyDistribution.from_spikes(grid, b))
+    slowest = LatencyDistribution.from_spikes(grid, a).maximum(LatencyDistribution.from_spikes(grid, b))
+    exact_total = sorted([(x + y, p*q) for x, p in a for y, q in b])
+    exact_slowest = sorted([(max(x, y), p*q) for x, p in a for y, q in b])
+    for distribution, exact in [(total, exact_total), (slowest, exact_slowest)]:
+        cumulated = np.cumsum([p for _, p in exact])
+        for q in [0.1, 0.5, 0.8, 0.95, 0.99]:
+            expected = exact[int(np.searchsorted(cumulated, q - 1e-12))][0]
+            # The spikes are split between two points, the quantile may land on either
+            assert relative_error(distribution.quantile(q), expected) <= 2*grid.get_relative_error()
+    assert abs(total.mean() - sum([v*p for v, p in exact_total])) / total.mean() < 1e-9
+
+def sample_latency(evaluator: LatencyEvaluator, proptype, limit: int)->float:
+    sc = ServiceAndClass.from_data_property_type(evaluator.datasystem.data_service_repo, evaluator.datasystem.data_class_repo, proptype)
+    (normal, _), (error, error_rate) = evaluator.service_spikes(sc.service)
+    own = error if random.random() < error_rate else normal
+    children = sc.dataclass.get_ref_datatypes()
+    if len(children) == 0:
+        return own
+    return own + max([sample_latency(evaluator, dt, limit - 1) for dt in children])
+
+def test_usage_mean_matches_a_monte_carlo_sample(datasystems):
+    random.seed(1)
+    checked = 0
+    for datasystem in datasystems:
+        evaluator = LatencyEvaluator(datasystem, size = 1024)
+        for usage in datasystem.get_usage_overview().usages[:3]:
+            distribution = evaluator.usage_distribution(usage.datatype)
+            if distribution.overflow > 0:
+                continue
+            samples = np.array([sample_latency(evaluator, usage.datatype, evaluator.depth_limit) for _ in range(2000)])
+            std = np.sqrt(np.dot(distribution.pmf, (distribution.grid.points - distribution.mean())**2))
+            tolerance = 5*std / np.sqrt(len(samples)) + 1e-6*samples.mean()
+            assert abs(distribution.mean() - samples.mean()) <= tolerance
+            checked += 1
+    assert checked > 0
+
+def test_evaluate_reports_ordered_percentiles(datasystems):
+    for usage in LatencyEvaluator(datasystems[0]).evaluate():
+        assert usage.p50 <= usage.p99 <= usage.p999
+        assert 0.0 <= usage.timeout_probability <= 1.0
@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+import urllib.request
+from soadata import ExperimentSummary
+from soametrics import MetricsRegistry, MetricsServer, JsonLinesReporter, RateTracker
+
+def test_snapshot_has_no_side_effect():
+    registry = MetricsRegistry()
+    registry.add_error(0.1)
+    first = registry.snapshot()
+    second = registry.snapshot()
+    for key in ["systems", "errors", "usages", "crashes", "phase-counts", "phase-sums"]:
+        assert first[key] == second[key]
+    assert "recent-systems-per-second" not in second
+
+def test_each_consumer_keeps_its_own_rate():
+    registry = MetricsRegistry()
+    summary = ExperimentSummary()
+    summary.systems = 10
+    registry.add_summary(summary, 1.0, "worker")
+    scraper = RateTracker(registry.started)
+    reporter = RateTracker(registry.started)
+    assert scraper.update(registry.snapshot()) > 0
+    # The scraper saw the ten systems, the reporter did not yet
+    assert scraper.update(registry.snapshot()) == 0
+    assert reporter.update(registry.snapshot()) > 0
+
+def test_server_and_reporter_do_not_share_the_rate(tmp_path):
+    registry = MetricsRegistry()
+    summary = ExperimentSummary()
+    summary.systems = 5
+    registry.add_summary(summary, 1.0, "worker")
+    server = MetricsServer(registry).start()
+    try:
+        url = "http://127.0.0.1:{}/metrics".format(server.get_port())
+        for _ in range(2):
+            urllib.request.urlopen(url).read()
+    finally:
+        server.stop()
+    filename = str(tmp_path / "metrics.jsonl")
+    reporter = JsonLinesReporter(registry, filename, interval = 60)
+    reporter.start().stop()
+    line = json.loads(open(filename).read().splitlines()[-1])
+    assert line["systems"] == 5
+    assert line["recent-systems-per-second"] > 0
+
+def test_concurrent_updates_are_all_counted():
+    registry = MetricsRegistry()
+    def work():
+        for _ in range(2000):
+            registry.observe_phase("dataclasses", 0.001)
+            registry.add_error(0.0)
+    threads = [threading.Thread(target = work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while any([t.is_alive() for t in threads]):
+        registry.snapshot()
+        time.sleep(0.001)
+    snapshot = registry.snapshot()
+    assert snapshot["errors"] == 8000
+    assert sum(snapshot["phase-counts"]["dataclasses"]) == 8000
+
+class CountingLock:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.acquired = 0
+
+    def __enter__(self):
+        self.acquired += 1
+        return self.lock.__enter__()
+
+    def __exit__(self, *args):
+        return self.lock.__exit__(*args)
+
+def test_phases_are_batched_with_one_lock_by_system(datasystems):
+    registry = MetricsRegistry()
+    registry.get_thread_metrics()
+    registry.lock = CountingLock()
+    overview = datasystems[0].get_usage_overview()
+    for _ in range(5):
+        for phase in ["features", "services", "classes", "data-usages"]:
+            registry.observe_phase(phase, 0.002)
+        assert registry.lock.acquired % 2 == 0
+        before = registry.lock.acquired
+        registry.add_system(overview, 0.01)
+        assert registry.lock.acquired == before + 1
+        # The snapshot takes the lock too
+        registry.snapshot()
+    assert registry.lock.acquired == 10
+    assert sum(registry.snapshot()["phase-counts"]["services"]) == 5
+
+def test_batched_phases_are_visible_with_the_system_or_after_flush():
+    registry = MetricsRegistry()
+    registry.observe_phase("classes", 0.5)
+    assert registry.snapshot()["phase-counts"] == {}
+    registry.flush()
+    assert registry.snapshot()["phase-sums"] == { "classes": 0.5 }
+    registry.observe_phase("classes", 0.25)
+    registry.add_error(0.1)
+    assert registry.snapshot()["phase-sums"] == { "classes": 0.75 }
@@ -0,0 +1,23 @@
+from soapipeline import ExperimentPipeline
+from soarun import run_experiment
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+
+    def open(self):
+        pass
+
+    def write(self, records):
+        self.records.extend(records)
+
+    def close(self):
+        pass
+
+def test_pipeline_summary_equals_a_sequential_run(wholeconfig):
+    expected = run_experiment(wholeconfig, 3, 30).to_obj()
+    for workers, chunk_size in [(1, 30), (2, 2), (3, 1)]:
+        sink = ListSink()
+        summary = ExperimentPipeline(wholeconfig, workers).set_chunk_size(chunk_size).set_queue_depth(2).add_sink(sink).run(3, 30)
+        assert summary.to_obj() == expected
+        assert sorted([r.seed for r in sink.records]) == list(range(3, 33))
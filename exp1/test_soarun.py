@@ -0,0 +1,98 @@
+import os
+import random
+import threading
+import pytest
+import soarun
+from soadata import ExperimentSummary
+from soarun import run_experiment, run_with_checkpoints, Checkpoint, ExperimentDaemon, DaemonServer, DaemonClient
+
+def test_run_experiment_records_the_error_messages(wholeconfig):
+    summary = run_experiment(wholeconfig, 0, 40)
+    assert summary.errors > 0
+    assert sum(summary.error_reasons.values()) == summary.errors
+    assert all([len(reason) > 0 for reason in summary.error_reasons])
+    restored = ExperimentSummary.from_obj(summary.to_obj())
+    assert restored.error_reasons == summary.error_reasons
+    assert ExperimentSummary().merge(summary).merge(restored).error_reasons == summary.error_reasons + summary.error_reasons
+
+@pytest.fixture
+def daemon_client(tmp_path):
+    path = str(tmp_path / "soarun.sock")
+    server = DaemonServer(ExperimentDaemon(), path)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    client = DaemonClient(path, timeout = 30)
+    yield client
+    client.close()
+    server.shutdown()
+    server.server_close()
+    os.remove(path)
+
+def test_daemon_client_sends_the_config_only_when_unknown(wholeconfig, daemon_client):
+    sent = []
+    send = daemon_client.send
+    def recording_send(message):
+        sent.append(message)
+        return send(message)
+    daemon_client.send = recording_send
+    first = daemon_client.run_experiment(wholeconfig, 0, 3)
+    assert ["config" in m for m in sent] == [False, True]
+    second = daemon_client.run_experiment(wholeconfig, 0, 3)
+    assert ["config" in m for m in sent] == [False, True, False]
+    assert first.to_obj() == second.to_obj() == run_experiment(wholeconfig, 0, 3).to_obj()
+
+def test_daemon_client_does_not_resend_the_config_on_other_errors(wholeconfig, daemon_client):
+    daemon_client.run_experiment(wholeconfig, 0, 1)
+    sent = []
+    send = daemon_client.send
+    def recording_send(message):
+        sent.append(message)
+        return send(message)
+    daemon_client.send = recording_send
+    with pytest.raises(ValueError):
+        daemon_client.run_experiment(wholeconfig, 0, "many")
+    assert len(sent) == 1
+
+def interrupted_run(wholeconfig, seed, filename, monkeypatch):
+    """ Stops a run_with_checkpoints of 10 systems in its third block of 3 """
+    calls = []
+    def failing_run(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise KeyboardInterrupt()
+        return run_experiment(*args, **kwargs)
+    monkeypatch.setattr(soarun, "run_experiment", failing_run)
+    with pytest.raises(KeyboardInterrupt):
+        run_with_checkpoints(wholeconfig, seed, 10, filename, every = 3)
+    monkeypatch.setattr(soarun, "run_experiment", run_experiment)
+
+def test_resumed_run_equals_an_uninterrupted_run(wholeconfig, tmp_path, monkeypatch):
+    filename = str(tmp_path / "seeded.json")
+    interrupted_run(wholeconfig, 4, filename, monkeypatch)
+    assert Checkpoint.load(filename).next_index == 6
+    resumed = run_with_checkpoints(wholeconfig, 4, 10, filename, every = 3, resume = True)
+    assert resumed.to_obj() == run_experiment(wholeconfig, 4, 10).to_obj()
+    with pytest.raises(ValueError):
+        run_with_checkpoints(wholeconfig, 5, 10, filename, every = 3, resume = True)
+
+def test_resumed_unseeded_run_continues_the_random_state(wholeconfig, tmp_path, monkeypatch):
+    filename = str(tmp_path / "unseeded.json")
+    random.seed(11)
+    interrupted_run(wholeconfig, None, filename, monkeypatch)
+    random.seed(999)
+    resumed = run_with_checkpoints(wholeconfig, None, 10, filename, every = 3, resume = True)
+    random.seed(11)
+    assert resumed.to_obj() == run_experiment(wholeconfig, None, 10).to_obj()
+
+def test_checkpoints_need_a_positive_interval_and_the_accumulated_reports(wholeconfig, tmp_path, monkeypatch):
+    filename = str(tmp_path / "checkpoint.json")
+    with pytest.raises(ValueError):
+        run_with_checkpoints(wholeconfig, 0, 10, filename, every = 0)
+    interrupted_run(wholeconfig, 0, filename, monkeypatch)
+    class Counter:
+        def to_obj(self):
+            return 0
+        def restore(self, content):
+            return self
+    # Saved without an accumulator, the systems before the checkpoint are missing from it
+    with pytest.raises(ValueError):
+        run_with_checkpoints(wholeconfig, 0, 10, filename, every = 3, resume = True, accumulator = Counter())
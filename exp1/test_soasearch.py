@@ -0,0 +1,70 @@
+import json
+from random import Random
+from soadata import DataSystem
+from soasearch import AnnealingSearch, DesignMutator, shallow_copy
+from soafingerprint import system_fingerprint
+import search_soa
+
+def test_memoised_scores_equal_recomputed_scores(datasystems):
+    checked = 0
+    for seed, datasystem in enumerate(datasystems):
+        search = AnnealingSearch(seed = seed).set_iterations(150)
+        memoised = search.evaluate
+        def evaluate(candidate):
+            nonlocal checked
+            score = memoised(candidate)
+            assert score == search.score.score(candidate.get_usage_overview().summarise(verbose = False))
+            checked += 1
+            return score
+        search.evaluate = evaluate
+        result = search.run(datasystem)
+        assert result.best_score <= search.score.score(datasystem.get_usage_overview())
+        assert result.cache_hits > 0
+    assert checked > 0
+
+def test_mutations_leave_the_original_system_unchanged(datasystems):
+    mutator = DesignMutator(Random(2))
+    for datasystem in datasystems:
+        before = system_fingerprint(datasystem)
+        classes = dict([(c.name, (c, set(c.properties))) for c in datasystem.get_dataclasses()])
+        services = dict([(s.name, (s, list(s.features))) for s in datasystem.get_services()])
+        mutated = [mutator.mutate(datasystem) for _ in range(20)]
+        assert all([m.fingerprint is None for m in mutated])
+        # Computed again rather than read from the system
+        datasystem.fingerprint = None
+        assert system_fingerprint(datasystem) == before
+        assert all([classes[c.name][0] is c and classes[c.name][1] == c.properties for c in datasystem.get_dataclasses()])
+        assert all([services[s.name][0] is s and services[s.name][1] == s.features for s in datasystem.get_services()])
+        # The classes and services that no move changed are shared
+        assert any([any([c is classes[c.name][0] for c in m.get_dataclasses()]) for m in mutated])
+
+def test_search_script_appends_a_result_by_system(wholeconfig, tmp_path):
+    configfile = tmp_path / "config.json"
+    configfile.write_text(json.dumps(wholeconfig))
+    outputfile = tmp_path / "search.jsonl"
+    results = search_soa.main(["-c", str(configfile), "-n", "2", "--iterations", "30", "-o", str(outputfile)])
+    lines = [json.loads(line) for line in outputfile.read_text().splitlines()]
+    assert [line["best-score"] for line in lines] == [r.best_score for r in results]
+    assert all([line["best-score"] <= line["initial-score"] for line in lines])
+
+def test_data_usages_are_only_rebuilt_on_a_cache_miss(datasystems, monkeypatch):
+    refreshes = []
+    refresh = DataSystem.refresh_data_usages
+    def counting_refresh(datasystem):
+        refreshes.append(1)
+        return refresh(datasystem)
+    monkeypatch.setattr(DataSystem, "refresh_data_usages", counting_refresh)
+    search = AnnealingSearch(seed = 1).set_iterations(300)
+    result = search.run(datasystems[0])
+    assert result.cache_hits > 0
+    # The initial design is prepared, every other miss rebuilds its usages once
+    assert len(refreshes) == result.evaluations - 1
+    assert result.best_score == search.score.score(result.best.get_usage_overview().summarise(verbose = False))
+
+def test_usages_do_not_depend_on_the_order_of_the_datatypes(datasystems):
+    for datasystem in datasystems:
+        expected = datasystem.get_usage_overview().summarise(verbose = False).to_string()
+        reordered = shallow_copy(datasystem)
+        types = reordered.data_property_type_repo
+        types.ref_store = dict.fromkeys(reversed(list(types.ref_store)))
+        assert reordered.refresh_data_usages().get_usage_overview().summarise(verbose = False).to_string() == expected
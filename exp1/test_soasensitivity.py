@@ -0,0 +1,21 @@
+import numpy as np
+from soasensitivity import saltelli_indices
+
+def test_saltelli_indices_match_the_analytic_values():
+    # f = x1 + 2 x2 + 4 x1 x3 on uniform inputs: V = 55/36, V1 = 27/36, V2 = V3 = 12/36, V13 = 4/36
+    f = lambda x: x[:, 0] + 2*x[:, 1] + 4*x[:, 0]*x[:, 2]
+    rng = np.random.default_rng(0)
+    n = 200000
+    a, b = rng.random((n, 3)), rng.random((n, 3))
+    f_ab = []
+    for i in range(3):
+        ab = a.copy()
+        ab[:, i] = b[:, i]
+        f_ab.append(f(ab))
+    first_order, total = saltelli_indices(f(a), f(b), np.array(f_ab))
+    assert np.allclose(first_order, [27/55, 12/55, 12/55], atol = 0.02)
+    assert np.allclose(total, [31/55, 12/55, 16/55], atol = 0.02)
+
+def test_saltelli_indices_of_a_constant_are_zero():
+    first_order, total = saltelli_indices(np.ones(10), np.ones(10), np.ones((2, 10)))
+    assert list(first_order) == [0, 0] and list(total) == [0, 0]
@@ -0,0 +1,33 @@
+from math import inf
+import pytest
+from soatraffic import TrafficSimulation, TrafficConfig
+
+def _event_loop_only(monkeypatch):
+    # An overflow at -inf makes the event loop replay the whole day
+    monkeypatch.setattr(TrafficSimulation, "_first_overflow", lambda self, *args: -inf)
+
+@pytest.mark.parametrize("concurrency", [1, 2, 8])
+@pytest.mark.parametrize("jitter", [True, False])
+def test_vectorised_run_equals_event_loop(datasystems, monkeypatch, concurrency, jitter):
+    config = TrafficConfig().set_concurrency(concurrency).set_jitter(jitter)
+    fast = [str(TrafficSimulation(s, config, seed).run()) for seed, s in enumerate(datasystems)]
+    _event_loop_only(monkeypatch)
+    slow = [str(TrafficSimulation(s, config, seed).run()) for seed, s in enumerate(datasystems)]
+    assert fast == slow
+
+def test_report_counts(datasystems):
+    for seed, datasystem in enumerate(datasystems):
+        report = TrafficSimulation(datasystem, TrafficConfig().set_concurrency(1), seed).run()
+        usages = datasystem.get_usage_overview().usages
+        assert sum([u.requests for u in report.usages]) == sum([u.req_by_day for u in usages])
+        # One event for each arrival and one for each hop completed
+        assert report.events == sum([u.requests for u in report.usages]) + sum([s.requests for s in report.services])
+        for service in report.services:
+            assert 0 <= service.timeouts <= service.requests
+            assert service.mean_wait >= 0
+
+def test_no_queue_without_overflow(datasystems):
+    config = TrafficConfig().set_concurrency(10**9)
+    for seed, datasystem in enumerate(datasystems):
+        report = TrafficSimulation(datasystem, config, seed).run()
+        assert all([s.queued == 0 and s.mean_wait == 0 for s in report.services])
@@ -0,0 +1,120 @@
+from typing import List, Tuple, Iterator, Callable
+from random import Random
+import random
+
+class FeaturePartitions:
+    """
+    The ways to split target_feature_count features across services with at least min_features_by_service
+    features each, as integer partitions with parts sorted in increasing order.
+    """
+    def __init__(self, target_feature_count: int, min_features_by_service: int):
+        self.target_feature_count = target_feature_count
+        self.min_features_by_service = max(1, min_features_by_service)
+        self._counts = self._count_table()
+
+    def _count_table(self)->List[List[int]]:
+        """ counts[n][m] is the number of partitions of n with all parts >= m """
+        n_max = self.target_feature_count
+        counts = [[0]*(n_max + 2) for _ in range(n_max + 1)]
+        counts[0] = [1]*(n_max + 2)
+        for n in range(1, n_max + 1):
+            for m in range(n, 0, -1):
+                counts[n][m] = counts[n - m][m] + counts[n][m + 1]
+        return counts
+
+    def _partial_count(self, remaining: int, min_part: int)->int:
+        if remaining == 0:
+            return 1
+        if min_part > remaining:
+            return 0
+        return self._counts[remaining][min_part]
+
+    def count(self)->int:
+        return self._partial_count(self.target_feature_count, self.min_features_by_service)
+
+    def _smallest(self, remaining: int, min_part: int)->List[int]:
+        """ The first partition of remaining with parts >= min_part in lexicographic order """
+        if remaining == 0:
+            return []
+        repeat = remaining // min_part
+        return [min_part]*(repeat - 1) + [remaining - min_part*(repeat - 1)]
+
+    def enumerate(self)->Iterator[List[int]]:
+        """ Every partition once, lazily, in lexicographic order """
+        if self.count() == 0:
+            return
+        parts = self._smallest(self.target_feature_count, self.min_features_by_service)
+        while True:
+            yield list(parts)
+            remaining = parts[-1] if parts else 0
+            position = len(parts) - 2
+            while position >= 0:
+                remaining += parts[position]
+                # The smallest larger part leaving a remainder that can still be split
+                part = parts[position] + 1 if parts[position] + 1 <= remaining // 2 else remaining
+                if part > parts[position]:
+                    parts = parts[:position] + [part] + self._smallest(remaining - part, part)
+                    break
+                position -= 1
+            if position < 0:
+                return
+
+    def unrank(self, rank: int)->List[int]:
+        """ The partition at the given position in the order of enumerate """
+        if rank < 0 or rank >= self.count():
+            raise Exception("No partition at rank {} out of {}".format(rank, self.count()))
+        parts = []
+        remaining = self.target_feature_count
+        part = self.min_features_by_service
+        while remaining > 0:
+            while True:
+                below = self._partial_count(remaining - part, part)
+                if rank < below:
+                    break
+                rank -= below
+                part += 1
+            parts.append(part)
+            remaining -= part
+        return parts
+
+    def sample(self, count: int, rng: Random = None)->List[List[int]]:
+        """ Up to count distinct partitions, uniformly at random """
+        rng = rng or random
+        total = self.count()
+        if total <= count*4:
+            return [self.unrank(rank) for rank in rng.sample(range(total), min(count, total))]
+        ranks = set([])
+        while len(ranks) < count:
+            ranks.add(rng.randrange(total))
+        return [self.unrank(rank) for rank in ranks]
+
+    def minimize(self, part_cost: Callable[[int], float])->Tuple[float, List[int]]:
+        """ The partition with the lowest total cost, when the cost is a sum over the parts (dynamic programming) """
+        n = self.target_feature_count
+        m = self.min_features_by_service
+        best = [None]*(n + 1)
+        best_part = [0]*(n + 1)
+        best[0] = 0.0
+        costs = [0.0]*(n + 1)
+        for k in range(m, n + 1):
+            costs[k] = part_cost(k)
+        for remaining in range(m, n + 1):
+            for part in range(m, remaining + 1):
+                before = best[remaining - part]
+                if before is None:
+                    continue
+                candidate = before + costs[part]
+                if best[remaining] is None or candidate < best[remaining]:
+                    best[remaining] = candidate
+                    best_part[remaining] = part
+        if best[n] is None:
+            raise Exception("No partition of {} with parts of at least {}".format(n, m))
+        parts = []
+        remaining = n
+        while remaining > 0:
+            parts.append(best_part[remaining])
+            remaining -= best_part[remaining]
+        return (best[n], sorted(parts))
+
+    def __str__(self):
+        return "FeaturePartitions: features: {}, min feat./serv. {}, partitions: {}".format(self.target_feature_count, self.min_features_by_service, self.count())
@@ -0,0 +1,37 @@
+from random import Random
+from feature_partitions import FeaturePartitions
+
+def brute_force(target: int, minimum: int):
+    """ Every list of increasing parts >= minimum summing to target, sorted """
+    if target == 0:
+        return [[]]
+    found = []
+    for part in range(minimum, target + 1):
+        found.extend([[part] + rest for rest in brute_force(target - part, part)])
+    return sorted(found)
+
+def test_enumerate_matches_a_brute_force_search():
+    for target in range(1, 16):
+        for minimum in range(1, 5):
+            partitions = FeaturePartitions(target, minimum)
+            enumerated = list(partitions.enumerate())
+            assert enumerated == brute_force(target, minimum)
+            assert partitions.count() == len(enumerated)
+
+def test_unrank_follows_the_order_of_enumerate():
+    partitions = FeaturePartitions(20, 2)
+    assert [partitions.unrank(rank) for rank in range(partitions.count())] == list(partitions.enumerate())
+
+def test_sample_returns_distinct_partitions():
+    partitions = FeaturePartitions(60, 3)
+    sampled = partitions.sample(50, Random(4))
+    assert len(set([tuple(p) for p in sampled])) == 50
+    assert all([sum(p) == 60 and min(p) >= 3 for p in sampled])
+
+def test_minimize_matches_the_enumeration():
+    partitions = FeaturePartitions(14, 2)
+    part_cost = lambda k: (k - 4)**2 + 3
+    best = min([sum([part_cost(k) for k in p]) for p in partitions.enumerate()])
+    cost, parts = partitions.minimize(part_cost)
+    assert cost == best
+    assert sum(parts) == 14 and sum([part_cost(k) for k in parts]) == best
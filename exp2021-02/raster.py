@@ -0,0 +1,54 @@
+from typing import List, Tuple, Callable
+import numpy as np
+
+def pattern_from_indices(shape: Tuple[int, int], select_color: Callable)->np.ndarray:
+    """
+    Palette index of every pixel, computed from the row and column index arrays at once.
+    select_color receives two broadcastable arrays (rows, columns) and must only use array arithmetic.
+    """
+    rows, columns = np.ogrid[0:shape[0], 0:shape[1]]
+    return np.broadcast_to(select_color(rows, columns), shape).astype(np.uint8)
+
+def grid_pattern(shape: Tuple[int, int], period: int = 30, low: int = 10, high: int = 20)->np.ndarray:
+    """ Squares of color 1 in the top left of each period x period cell, and of color 2 in the bottom right """
+    def select_color(rows, columns):
+        row_mod = rows % period
+        column_mod = columns % period
+        pattern = np.where((row_mod < low) & (column_mod < low), 1, 0)
+        return np.where((row_mod > high) & (column_mod > high), 2, pattern)
+    return pattern_from_indices(shape, select_color)
+
+def threshold(pixels: np.ndarray, level: int = 0, above: int = 1, below: int = 0)->np.ndarray:
+    """ above for the palette indexes greater than level, below otherwise """
+    return np.where(pixels > level, above, below).astype(np.uint8)
+
+def to_mono(pixels: np.ndarray)->np.ndarray:
+    """ 1 for every colored pixel, 0 for the background (index 0) """
+    return threshold(pixels, 0)
+
+def remap(pixels: np.ndarray, lookup: List[int])->np.ndarray:
+    """ Replaces each palette index i by lookup[i], the indexes beyond the lookup become 0 """
+    table = np.zeros(256, dtype = np.uint8)
+    table[:len(lookup)] = np.asarray(lookup, dtype = np.uint8)
+    return table[pixels]
+
+def add_modulo(pixels: np.ndarray, other: np.ndarray, modulo: int = 256)->np.ndarray:
+    """ Adds the palette indexes of two images, wrapping around the palette size """
+    return ((pixels.astype(np.uint16) + other.astype(np.uint16)) % modulo).astype(np.uint8)
+
+def color_frequency(pixels: np.ndarray, palette_size: int = 256)->np.ndarray:
+    """ Number of pixels using each palette index """
+    return np.bincount(pixels.ravel(), minlength = palette_size)
+
+def used_color_range(pixels: np.ndarray)->Tuple[int, int]:
+    """ Smallest and largest palette index used by the image """
+    used = np.flatnonzero(color_frequency(pixels))
+    return (int(used[0]), int(used[-1]))
+
+def channel_aligned_palette(colors: List)->List[int]:
+    """ Palette as all the R values, then the G values, then the B values """
+    return np.asarray(colors, dtype = np.uint8).reshape(-1, 3).T.ravel().tolist()
+
+def shuffle_colors(colors: np.ndarray, rng: np.random.Generator = None)->np.ndarray:
+    rng = rng or np.random.default_rng()
+    return rng.permutation(np.asarray(colors))
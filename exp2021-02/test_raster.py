@@ -0,0 +1,25 @@
+import numpy as np
+import raster
+
+def test_grid_pattern_matches_the_pixel_loop():
+    select_color = lambda i, j : 1 if i % 30 <10 and j % 30 < 10 else (2 if i % 30 > 20 and j % 30 > 20 else 0)
+    expected = np.array([[select_color(i, j) for j in range(95)] for i in range(64)])
+    pixels = raster.grid_pattern((64, 95), period = 30, low = 10, high = 20)
+    assert pixels.dtype == np.uint8
+    assert np.array_equal(pixels, expected)
+
+def test_palette_operations_match_their_definitions():
+    rng = np.random.default_rng(2)
+    pixels = rng.integers(0, 256, (40, 50)).astype(np.uint8)
+    other = rng.integers(0, 256, (40, 50)).astype(np.uint8)
+    assert np.array_equal(raster.to_mono(pixels), [[1 if v > 0 else 0 for v in row] for row in pixels.tolist()])
+    lookup = [0, 2, 1, 7]
+    assert np.array_equal(raster.remap(pixels, lookup), [[lookup[v] if v < len(lookup) else 0 for v in row] for row in pixels.tolist()])
+    assert np.array_equal(raster.add_modulo(pixels, other), (pixels.astype(int) + other.astype(int)) % 256)
+    frequency = raster.color_frequency(pixels)
+    assert frequency.sum() == pixels.size and frequency[pixels[0, 0]] == np.count_nonzero(pixels == pixels[0, 0])
+    assert raster.used_color_range(pixels) == (int(pixels.min()), int(pixels.max()))
+
+def test_channel_aligned_palette():
+    colors = [(1, 2, 3), (4, 5, 6)]
+    assert raster.channel_aligned_palette(colors) == [1, 4, 2, 5, 3, 6]
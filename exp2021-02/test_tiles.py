@@ -0,0 +1,71 @@
+import json
+import os
+import numpy as np
+import pytest
+from PIL import Image
+import raster
+from tiles import TileConfig, TiledBatchPipeline, process_image
+
+def tile_config(tmp_path)->TileConfig:
+    return TileConfig().set_tile_size(16).set_workers(1).set_scratch_dir(str(tmp_path / "scratch")).set_output_dir(str(tmp_path / "input" / "output")).add_transform("remap", lookup = [0, 2, 1])
+
+def save_png(path: str, pixels: np.ndarray):
+    img = Image.fromarray(pixels, "P")
+    img.putpalette([0, 0, 0, 255, 255, 255, 128, 128, 128])
+    img.save(path)
+
+def test_tiles_match_the_whole_image_and_skip_the_output_dir(tmp_path):
+    os.makedirs(str(tmp_path / "input" / "output"))
+    pixels = raster.grid_pattern((50, 37), period = 12, low = 4, high = 8)
+    save_png(str(tmp_path / "input" / "grid.png"), pixels)
+    np.save(str(tmp_path / "input" / "output" / "stale.npy"), pixels)
+    results = TiledBatchPipeline(tile_config(tmp_path)).run(str(tmp_path / "input"))
+    assert [r["name"] for r in results] == ["grid"]
+    assert results[0]["tiles"] == 4*3
+    assert results[0]["color-frequency"] == raster.color_frequency(pixels).tolist()
+    output = np.load(str(tmp_path / "input" / "output" / "grid.npy"))
+    assert np.array_equal(output, raster.remap(pixels, [0, 2, 1]))
+    with open(str(tmp_path / "input" / "output" / "manifest.json")) as manifest:
+        assert [r["name"] for r in json.load(manifest)] == ["grid"]
+
+def test_images_with_the_same_name_are_rejected(tmp_path):
+    os.makedirs(str(tmp_path / "input"))
+    pixels = raster.grid_pattern((8, 8))
+    save_png(str(tmp_path / "input" / "foo.png"), pixels)
+    np.save(str(tmp_path / "input" / "foo.npy"), pixels)
+    with pytest.raises(ValueError):
+        TiledBatchPipeline(tile_config(tmp_path)).list_images(str(tmp_path / "input"))
+
+def test_an_output_over_its_input_is_refused(tmp_path):
+    os.makedirs(str(tmp_path / "input"))
+    pixels = raster.grid_pattern((8, 8))
+    np.save(str(tmp_path / "input" / "foo.npy"), pixels)
+    config = tile_config(tmp_path).set_output_dir(str(tmp_path / "input"))
+    with pytest.raises(ValueError):
+        TiledBatchPipeline(config).list_images(str(tmp_path / "input"))
+    with pytest.raises(ValueError):
+        process_image(str(tmp_path / "input" / "foo.npy"), config)
+    assert np.array_equal(np.load(str(tmp_path / "input" / "foo.npy")), pixels)
+    # A .npy input in the scratch directory is read in place and kept
+    config = tile_config(tmp_path).set_scratch_dir(str(tmp_path / "input"))
+    os.makedirs(config.output_dir)
+    process_image(str(tmp_path / "input" / "foo.npy"), config)
+    assert os.path.exists(str(tmp_path / "input" / "foo.npy"))
+
+def test_only_npy_inputs_go_above_the_decoded_pixels_limit(tmp_path):
+    os.makedirs(str(tmp_path / "input"))
+    pixels = raster.grid_pattern((40, 30), period = 8, low = 1, high = 2)
+    save_png(str(tmp_path / "input" / "big.png"), pixels)
+    np.save(str(tmp_path / "input" / "large.npy"), pixels)
+    with open(str(tmp_path / "input" / "large.palette.json"), "w") as palette_file:
+        json.dump([1, 2, 3]*256, palette_file)
+    config = tile_config(tmp_path).set_max_decoded_pixels(40*30 - 1)
+    os.makedirs(config.output_dir)
+    os.makedirs(config.scratch_dir)
+    with pytest.raises(ValueError):
+        process_image(str(tmp_path / "input" / "big.png"), config)
+    result = process_image(str(tmp_path / "input" / "large.npy"), config)
+    assert result["shape"] == [40, 30]
+    with open(os.path.join(config.output_dir, "large.palette.json")) as palette_file:
+        assert json.load(palette_file) == [1, 2, 3]*256
+    assert process_image(str(tmp_path / "input" / "big.png"), config.set_max_decoded_pixels(40*30))["shape"] == [40, 30]
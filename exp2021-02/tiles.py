@@ -0,0 +1,187 @@
+from typing import List, Tuple, Iterator
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import numpy as np
+from PIL import Image
+import raster
+
+class TileConfig:
+    def __init__(self):
+        self.tile_size = 1024
+        self.workers = os.cpu_count() or 1
+        self.scratch_dir = "scratch"
+        self.output_dir = "output"
+        self.transforms = []
+        self.save_png = True
+        self.max_decoded_pixels = 1 << 26
+
+    def set_tile_size(self, tile_size: int):
+        self.tile_size = tile_size
+        return self
+
+    def set_workers(self, workers: int):
+        self.workers = workers
+        return self
+
+    def set_scratch_dir(self, scratch_dir: str):
+        self.scratch_dir = scratch_dir
+        return self
+
+    def set_output_dir(self, output_dir: str):
+        self.output_dir = output_dir
+        return self
+
+    def add_transform(self, name: str, **kwargs):
+        """ A function of the raster module applied to each tile, ex: add_transform('remap', lookup = [0, 2, 1]) """
+        self.transforms.append((name, kwargs))
+        return self
+
+    def set_save_png(self, save_png: bool):
+        self.save_png = save_png
+        return self
+
+    def set_max_decoded_pixels(self, max_decoded_pixels: int):
+        """ The largest image, other than .npy, accepted. Pillow decodes such an image as a whole, so it bounds the memory of a worker."""
+        self.max_decoded_pixels = max_decoded_pixels
+        return self
+
+    def __str__(self):
+        return "TileConfig: tile size: {}, workers: {}, transforms: {}".format(self.tile_size, self.workers, [name for name, _ in self.transforms])
+
+def iter_tiles(shape: Tuple[int, int], tile_size: int)->Iterator[Tuple[slice, slice]]:
+    for top in range(0, shape[0], tile_size):
+        for left in range(0, shape[1], tile_size):
+            yield (slice(top, min(top + tile_size, shape[0])), slice(left, min(left + tile_size, shape[1])))
+
+def decode_to_scratch(path: str, scratch_path: str, tile_size: int, max_decoded_pixels: int = 1 << 26)->Tuple[np.memmap, List[int]]:
+    """
+    Palette pixels of an image in a memory mapped .npy file, with the palette.
+    Only a .npy input is out of core: it is mapped directly. Pillow cannot decode a PNG or a JPEG by parts, so the other images
+    are decoded as a whole and refused above max_decoded_pixels; convert a larger image to .npy, with its .palette.json, beforehand.
+    They are converted to 'P' one strip of rows at a time, without dithering so that strips do not depend on each other.
+    """
+    if path.endswith(".npy"):
+        palette_path = path[:-len(".npy")] + ".palette.json"
+        palette = [v for v in range(256) for _ in range(3)]
+        if os.path.exists(palette_path):
+            with open(palette_path, 'r') as palette_file:
+                palette = json.load(palette_file)
+        return (np.load(path, mmap_mode = "r"), palette)
+    img = Image.open(path)
+    width, height = img.size
+    if width*height > max_decoded_pixels:
+        img.close()
+        raise ValueError("Image {} of {}x{} pixels is decoded as a whole, above the limit of {} pixels: convert it to .npy".format(path, width, height, max_decoded_pixels))
+    pixels = np.lib.format.open_memmap(scratch_path, mode = "w+", dtype = np.uint8, shape = (height, width))
+    palette = None
+    for top in range(0, height, tile_size):
+        strip = img.crop((0, top, width, min(top + tile_size, height)))
+        if strip.mode != "P":
+            strip = strip.convert("RGB").convert("P", dither = Image.Dither.NONE)
+        if palette is None:
+            palette = strip.getpalette()
+        pixels[top:top + strip.size[1]] = np.asarray(strip)
+    img.close()
+    pixels.flush()
+    return (pixels, palette)
+
+class TileStats:
+    """ Palette statistics of an image, accumulated tile by tile """
+    def __init__(self, name: str):
+        self.name = name
+        self.shape = (0, 0)
+        self.tiles = 0
+        self.color_frequency = np.zeros(256, dtype = np.int64)
+
+    def add_tile(self, pixels: np.ndarray):
+        self.tiles += 1
+        self.color_frequency += raster.color_frequency(pixels)
+        return self
+
+    def to_obj(self):
+        used = np.flatnonzero(self.color_frequency)
+        return {
+            "name": self.name,
+            "shape": list(self.shape),
+            "tiles": self.tiles,
+            "min-color-idx": int(used[0]) if len(used) > 0 else None,
+            "max-color-idx": int(used[-1]) if len(used) > 0 else None,
+            "color-frequency": self.color_frequency.tolist()
+        }
+
+    def __str__(self):
+        return "TileStats {}: shape {}, tiles {}, colors used {}".format(self.name, self.shape, self.tiles, int(np.count_nonzero(self.color_frequency)))
+
+def apply_transforms(pixels: np.ndarray, transforms: List[Tuple[str, dict]])->np.ndarray:
+    for name, kwargs in transforms:
+        pixels = getattr(raster, name)(pixels, **kwargs)
+    return pixels
+
+def process_image(path: str, config: TileConfig)->dict:
+    """ Statistics and transforms of one image, with at most one tile in memory besides the memory mapped files, and the decoded image when it is not a .npy """
+    name = os.path.splitext(os.path.basename(path))[0]
+    scratch_path = os.path.join(config.scratch_dir, name + ".npy")
+    output_path = os.path.join(config.output_dir, name + ".npy")
+    # A .npy input is mapped in place, the other images are decoded to the scratch file
+    for written in [output_path] if path.endswith(".npy") else [output_path, scratch_path]:
+        if os.path.exists(written) and os.path.samefile(written, path):
+            raise ValueError("Image {} would be overwritten by its own output {}".format(path, written))
+    pixels, palette = decode_to_scratch(path, scratch_path, config.tile_size, config.max_decoded_pixels)
+    stats = TileStats(name)
+    stats.shape = pixels.shape
+    output = np.lib.format.open_memmap(output_path, mode = "w+", dtype = np.uint8, shape = pixels.shape)
+    for rows, columns in iter_tiles(pixels.shape, config.tile_size):
+        tile = np.asarray(pixels[rows, columns])
+        stats.add_tile(tile)
+        output[rows, columns] = apply_transforms(tile, config.transforms)
+    output.flush()
+    with open(os.path.join(config.output_dir, name + ".palette.json"), "w") as palette_file:
+        json.dump(palette, palette_file)
+    if config.save_png:
+        # frombuffer reads the memory mapped output without copying it
+        png = Image.frombuffer("P", (pixels.shape[1], pixels.shape[0]), output, "raw", "P", 0, 1)
+        png.putpalette(palette)
+        png.save(os.path.join(config.output_dir, name + ".png"))
+    del output
+    del pixels
+    if not path.endswith(".npy") and os.path.exists(scratch_path):
+        os.remove(scratch_path)
+    result = stats.to_obj()
+    with open(os.path.join(config.output_dir, name + ".stats.json"), "w") as stats_file:
+        json.dump(result, stats_file)
+    return result
+
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg", ".tif", ".tiff", ".gif", ".bmp", ".npy"]
+
+class TiledBatchPipeline:
+    """ Processes every image of a directory in a pool of processes and writes a manifest of the results """
+    def __init__(self, config: TileConfig):
+        self.config = config
+
+    def list_images(self, input_dir: str)->List[str]:
+        """ The images of input_dir, which must not be the output or scratch directory, with one name for each image """
+        for directory in [self.config.output_dir, self.config.scratch_dir]:
+            if os.path.isdir(directory) and os.path.samefile(directory, input_dir):
+                raise ValueError("The input directory {} is also the directory {} written by the pipeline".format(input_dir, directory))
+        paths = sorted([os.path.join(input_dir, f) for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f)) and os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS])
+        names = {}
+        for path in paths:
+            names.setdefault(os.path.splitext(os.path.basename(path))[0], []).append(path)
+        collisions = [files for files in names.values() if len(files) > 1]
+        if len(collisions) > 0:
+            raise ValueError("Images with the same name would write the same outputs: {}".format(collisions))
+        return paths
+
+    def run(self, input_dir: str)->List[dict]:
+        paths = self.list_images(input_dir)
+        os.makedirs(self.config.scratch_dir, exist_ok = True)
+        os.makedirs(self.config.output_dir, exist_ok = True)
+        results = []
+        with ProcessPoolExecutor(max_workers = self.config.workers) as executor:
+            for result in executor.map(process_image, paths, [self.config]*len(paths)):
+                print("TileStats {}: shape {}, tiles {}".format(result["name"], result["shape"], result["tiles"]))
+                results.append(result)
+        with open(os.path.join(self.config.output_dir, "manifest.json"), "w") as manifest:
+            json.dump([dict([(k, v) for k, v in r.items() if k != "color-frequency"]) for r in results], manifest, indent = 2)
+        return results
@@ -0,0 +1,121 @@
+from typing import List, Tuple
+from fractions import Fraction
+import numpy as np
+from simulation3 import SimulationParams, IntRange, FractionRange
+
+class DiscreteDistribution:
+    """ Probability mass function of an integer quantity, for the values 0 to len(pmf) - 1"""
+    def __init__(self, pmf: np.ndarray):
+        self.pmf = np.clip(pmf, 0.0, None)
+        self.cdf = np.cumsum(self.pmf)
+
+    def probability(self, value: int)->float:
+        return float(self.pmf[value]) if 0 <= value < len(self.pmf) else 0.0
+
+    def probability_at_most(self, value: int)->float:
+        if value < 0:
+            return 0.0
+        return float(self.cdf[min(value, len(self.cdf) - 1)])
+
+    def probability_at_least(self, value: int)->float:
+        return 1.0 - self.probability_at_most(value - 1)
+
+    def mean(self)->float:
+        return float(np.dot(self.pmf, np.arange(len(self.pmf))))
+
+    def std(self)->float:
+        values = np.arange(len(self.pmf))
+        return float(np.sqrt(np.dot(self.pmf, (values - self.mean())**2)))
+
+    def quantile(self, q: float)->int:
+        """ The smallest value v with P(X <= v) >= q"""
+        return int(min(np.searchsorted(self.cdf, q - 1e-12), len(self.cdf) - 1))
+
+    def get_bounds(self)->Tuple[int, int]:
+        support = np.flatnonzero(self.pmf > 0)
+        return (int(support[0]), int(support[-1]))
+
+    def __str__(self):
+        return "DiscreteDistribution: mean: {:.3f}, std: {:.3f}, p5: {}, p50: {}, p95: {}, bounds: {}".format(
+            self.mean(), self.std(), self.quantile(0.05), self.quantile(0.5), self.quantile(0.95), self.get_bounds())
+
+def int_range_pmf(int_range: IntRange)->np.ndarray:
+    """ Exact distribution of IntRange.random_int """
+    segments = int_range.get_segments()
+    top = max([last for _, last, _ in segments])
+    diff = np.zeros(top + 2)
+    for first, last, probability in segments:
+        diff[first] += float(probability)
+        diff[last + 1] -= float(probability)
+    return np.cumsum(diff)[:top + 1]
+
+def reviewed_assets_distribution(review_time_second: IntRange, available_time_second: IntRange)->DiscreteDistribution:
+    """
+    Distribution of available // review. For a review time r and a uniform segment of available times,
+    every quotient gets r values except the first and the last one, so each pair adds a constant block
+    to a difference array, plus two end corrections.
+    A review time of 0 has no quotient, SimulationPoint.to_obj divides by zero, so a range that can draw it is refused.
+    """
+    review_pmf = int_range_pmf(review_time_second)
+    if review_pmf[0] > 0:
+        raise ValueError("The review time {} can be 0 second, with a probability of {}, for which available // review is undefined".format(review_time_second, review_pmf[0]))
+    reviews = np.flatnonzero(review_pmf > 0)
+    review_probabilities = review_pmf[reviews]
+    segments = available_time_second.get_segments()
+    top = max([last for _, last, _ in segments]) // int(reviews[0])
+    diff = np.zeros(top + 2)
+    corrections = np.zeros(top + 1)
+    for first, last, probability in segments:
+        weights = review_probabilities*float(probability)
+        first_quotients = first // reviews
+        last_quotients = last // reviews
+        np.add.at(diff, first_quotients, weights*reviews)
+        np.add.at(diff, last_quotients + 1, -weights*reviews)
+        first_counts = np.minimum(last, (first_quotients + 1)*reviews - 1) - first + 1
+        last_counts = last - last_quotients*reviews + 1
+        single = first_quotients == last_quotients
+        np.add.at(corrections, first_quotients, weights*(first_counts - reviews))
+        np.add.at(corrections, last_quotients[~single], (weights*(last_counts - reviews))[~single])
+    return DiscreteDistribution(np.cumsum(diff)[:top + 1] + corrections)
+
+def accepted_assets_distribution(reviewed: DiscreteDistribution, success_ratio: FractionRange)->DiscreteDistribution:
+    """
+    Distribution of int(reviewed*success) with success uniform. For reviewed = k, k*success is uniform
+    between k*start and k*stop, so every integer strictly inside gets the same probability.
+    """
+    start, stop = Fraction(success_ratio.start), Fraction(success_ratio.stop)
+    values = np.flatnonzero(reviewed.pmf > 0)
+    probabilities = reviewed.pmf[values]
+    top = int(values[-1]*stop)
+    diff = np.zeros(top + 2)
+    corrections = np.zeros(top + 1)
+    zero = values == 0
+    corrections[0] += probabilities[zero].sum()
+    values, probabilities = values[~zero], probabilities[~zero]
+    if len(values) > 0:
+        if start == stop:
+            np.add.at(corrections, values*start.numerator // start.denominator, probabilities)
+        else:
+            low = values*float(start)
+            high = values*float(stop)
+            first = values*start.numerator // start.denominator
+            last = np.minimum(values*stop.numerator // stop.denominator, top)
+            density = probabilities / (high - low)
+            np.add.at(diff, first, density)
+            np.add.at(diff, last + 1, -density)
+            single = first == last
+            first_length = np.where(single, high - low, first + 1 - low)
+            last_length = high - last
+            np.add.at(corrections, first, density*(first_length - 1))
+            np.add.at(corrections, last[~single], (density*(last_length - 1))[~single])
+    return DiscreteDistribution(np.cumsum(diff)[:top + 1] + corrections)
+
+class SimulationDistribution:
+    """ Exact distributions of the derived metrics of SimulationPoint.to_obj, computed from SimulationParams without sampling"""
+    def __init__(self, params: SimulationParams):
+        self.params = params
+        self.reviewed_assets = reviewed_assets_distribution(params.review_time_second, params.available_time_second)
+        self.accepted_assets = accepted_assets_distribution(self.reviewed_assets, params.success_ratio)
+
+    def __str__(self):
+        return "SimulationDistribution:\nreviewed assets: {}\naccepted assets: {}".format(self.reviewed_assets, self.accepted_assets)
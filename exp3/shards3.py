@@ -0,0 +1,191 @@
+from typing import List, Tuple, Dict, Iterator
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import struct
+from simulation3 import SimulationParams, SimulationPoint, Simulation, HaltonSequence, header_fieldnames
+
+# One binary record by point, in the order of header_fieldnames. The success ratio is the only float.
+BINARY_RECORD = struct.Struct("<qqqdqq")
+SHARD_FORMATS = ["csv", "bin"]
+MANIFEST_NAME = "manifest.json"
+
+def point_row(point: SimulationPoint)->tuple:
+    obj = point.to_obj()
+    return tuple([obj[name] for name in header_fieldnames])
+
+class ShardSpec:
+    """ The points [start, stop) of a run. A random shard is generated after random.seed(seed), a quasi shard continues the Halton sequence at start."""
+    def __init__(self, index: int, start: int, stop: int, seed: int):
+        self.index = index
+        self.start = start
+        self.stop = stop
+        self.seed = seed
+
+    def get_filename(self, fmt: str)->str:
+        return "shard-{:05d}.{}".format(self.index, fmt)
+
+    def __str__(self):
+        return "ShardSpec {}: [{}, {}), seed {}".format(self.index, self.start, self.stop, self.seed)
+
+class _HashingWriter:
+    """ Writes to a file and keeps the checksum of what was written """
+    def __init__(self, filename: str):
+        self.file = open(filename, 'wb')
+        self.checksum = hashlib.sha256()
+
+    def write(self, content: bytes):
+        self.checksum.update(content)
+        self.file.write(content)
+
+    def close(self):
+        self.file.close()
+
+def _csv_bytes(rows: List[tuple], header: bool)->bytes:
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator = "\r\n")
+    if header:
+        writer.writerow(header_fieldnames)
+    writer.writerows(rows)
+    return text.getvalue().encode("utf-8")
+
+def write_shard(directory: str, params: SimulationParams, spec: ShardSpec, fmt: str = "csv", quasi: bool = False, chunk_size: int = 65536)->dict:
+    """ Generates and writes one shard without any coordination with the other ones. Returns its manifest entry."""
+    shard_params = copy.copy(params).set_count(spec.stop - spec.start)
+    simulation = Simulation(shard_params)
+    if quasi:
+        chunks = simulation.stream_quasi(chunk_size, HaltonSequence(3, spec.seed).set_index(spec.start))
+    else:
+        random.seed(spec.seed)
+        chunks = simulation.stream(chunk_size)
+    filename = spec.get_filename(fmt)
+    tmp_path = os.path.join(directory, filename + ".tmp")
+    writer = _HashingWriter(tmp_path)
+    rows = 0
+    try:
+        if fmt == "csv":
+            writer.write(_csv_bytes([], header = True))
+        for points in chunks:
+            chunk_rows = [point_row(p) for p in points]
+            if fmt == "csv":
+                writer.write(_csv_bytes(chunk_rows, header = False))
+            else:
+                writer.write(b"".join([BINARY_RECORD.pack(*row) for row in chunk_rows]))
+            rows += len(chunk_rows)
+    finally:
+        writer.close()
+    os.replace(tmp_path, os.path.join(directory, filename))
+    return { "name": filename, "index": spec.index, "rows": rows, "start": spec.start, "stop": spec.stop, "seed": spec.seed, "sha256": writer.checksum.hexdigest() }
+
+class ShardedWriter:
+    """
+    Writes count points of a simulation as numbered shards, generated in parallel by worker processes, and a manifest.json describing them.
+    The shards only depend on the seed and the shard size, not on the number of workers.
+    """
+    def __init__(self, directory: str, params: SimulationParams):
+        self.directory = directory
+        self.params = params
+        self.workers = os.cpu_count() or 1
+        self.shard_size = 1000000
+        self.fmt = "csv"
+        self.quasi = False
+        self.seed = 0
+
+    def set_workers(self, workers: int):
+        self.workers = workers
+        return self
+
+    def set_shard_size(self, shard_size: int):
+        self.shard_size = shard_size
+        return self
+
+    def set_format(self, fmt: str):
+        if fmt not in SHARD_FORMATS:
+            raise ValueError("Unknown shard format {}, expected one of {}".format(fmt, SHARD_FORMATS))
+        self.fmt = fmt
+        return self
+
+    def set_quasi(self, quasi: bool):
+        self.quasi = quasi
+        return self
+
+    def set_seed(self, seed: int):
+        self.seed = seed
+        return self
+
+    def get_specs(self)->List[ShardSpec]:
+        """ Random shards get a seed each, quasi shards share the scrambling of a single Halton sequence """
+        return [ShardSpec(i, start, min(start + self.shard_size, self.params.count), self.seed if self.quasi else self.seed + i) for i, start in enumerate(range(0, self.params.count, self.shard_size))]
+
+    def write(self)->dict:
+        os.makedirs(self.directory, exist_ok = True)
+        specs = self.get_specs()
+        if self.workers <= 1:
+            shards = [write_shard(self.directory, self.params, spec, self.fmt, self.quasi) for spec in specs]
+        else:
+            with ProcessPoolExecutor(max_workers = self.workers) as executor:
+                shards = list(executor.map(write_shard, [self.directory]*len(specs), [self.params]*len(specs), specs, [self.fmt]*len(specs), [self.quasi]*len(specs)))
+        manifest = {
+            "format": self.fmt,
+            "fieldnames": header_fieldnames,
+            "binary-record": BINARY_RECORD.format if self.fmt == "bin" else None,
+            "mode": "quasi" if self.quasi else "random",
+            "rows": sum([s["rows"] for s in shards]),
+            "shards": shards
+        }
+        tmp_path = os.path.join(self.directory, MANIFEST_NAME + ".tmp")
+        with open(tmp_path, 'w') as manifestfile:
+            json.dump(manifest, manifestfile, indent = 2)
+        os.replace(tmp_path, os.path.join(self.directory, MANIFEST_NAME))
+        return manifest
+
+def load_manifest(directory: str)->dict:
+    with open(os.path.join(directory, MANIFEST_NAME), 'r') as manifestfile:
+        return json.load(manifestfile)
+
+def read_shard(directory: str, shard: dict, fmt: str, chunk_size: int = 65536)->Iterator[List[tuple]]:
+    """ The rows of a shard, in chunks, as tuples in the order of header_fieldnames """
+    path = os.path.join(directory, shard["name"])
+    if fmt == "csv":
+        with open(path, 'r', newline = '') as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader)
+            chunk = []
+            for row in reader:
+                chunk.append((int(row[0]), int(row[1]), int(row[2]), float(row[3]), int(row[4]), int(row[5])))
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if len(chunk) > 0:
+                yield chunk
+    else:
+        with open(path, 'rb') as binfile:
+            while True:
+                content = binfile.read(chunk_size*BINARY_RECORD.size)
+                if not content:
+                    break
+                yield list(BINARY_RECORD.iter_unpack(content))
+
+def iter_rows(directory: str, chunk_size: int = 65536)->Iterator[List[tuple]]:
+    """ The chunks of all the shards, lazily, in shard order """
+    manifest = load_manifest(directory)
+    for shard in manifest["shards"]:
+        yield from read_shard(directory, shard, manifest["format"], chunk_size)
+
+def verify_shards(directory: str)->List[str]:
+    """ The names of the shards whose checksum does not match the manifest """
+    manifest = load_manifest(directory)
+    failed = []
+    for shard in manifest["shards"]:
+        checksum = hashlib.sha256()
+        with open(os.path.join(directory, shard["name"]), 'rb') as shardfile:
+            for block in iter(lambda: shardfile.read(1 << 20), b""):
+                checksum.update(block)
+        if checksum.hexdigest() != shard["sha256"]:
+            failed.append(shard["name"])
+    return failed
@@ -1,8 +1,10 @@
-from typing import List, Tuple, Dict, Set
-from random import sample, choice, randint, uniform
+from typing import List, Tuple, Dict, Set, Iterator
+from random import sample, choice, randint, uniform, Random
 from math import log, floor, ceil
 from fractions import Fraction
 import csv
+import json
+import os
 
 
 class NumberRange:
@@ -31,6 +33,43 @@ class IntRange(NumberRange):
             maxdec = max(10 ** expof10, self.stop)
             return randint(mindec, maxdec)
 
+    def int_from_unit(self, unit: float)->int:
+        """ Same distribution as random_int, for a value uniform in [0, 1)"""
+        diff_range = self.stop - self.start
+        if diff_range <=100:
+            return self.start + min(int(unit*(diff_range + 1)), diff_range)
+        else:
+            divisions = int(ceil(log(diff_range,10)))
+            position = unit*divisions
+            expof10 = min(int(position), divisions - 1) + 1
+            mindec = min(10 ** (expof10-1), self.start)
+            maxdec = max(10 ** expof10, self.stop)
+            width = maxdec - mindec
+            return mindec + min(int((position - expof10 + 1)*(width + 1)), width)
+
+    def get_segments(self)->List[Tuple[int, int, Fraction]]:
+        """ The distribution of random_int as (first, last, probability of each value) uniform segments, which may overlap"""
+        diff_range = self.stop - self.start
+        if diff_range <=100:
+            return [(self.start, self.stop, Fraction(1, diff_range + 1))]
+        else:
+            divisions = int(ceil(log(diff_range,10)))
+            segments = []
+            for expof10 in range(1, divisions + 1):
+                mindec = min(10 ** (expof10-1), self.start)
+                maxdec = max(10 ** expof10, self.stop)
+                segments.append((mindec, maxdec, Fraction(1, divisions*(maxdec - mindec + 1))))
+            return segments
+
+    def get_bounds(self)->Tuple[int, int]:
+        """ Smallest and largest values random_int can return"""
+        diff_range = self.stop - self.start
+        if diff_range <=100:
+            return (self.start, self.stop)
+        else:
+            divisions = int(ceil(log(diff_range,10)))
+            return (min(1, self.start), max(10 ** divisions, self.stop))
+
     def random_float(self):
         return float(self.random_int())
 
@@ -52,9 +91,50 @@ class FractionRange(NumberRange):
     def random_int(self, scale: int)->int:
         return int(self.random_float()*scale)
 
+    def float_from_unit(self, unit: float)->float:
+        """ Same distribution as random_float, for a value uniform in [0, 1)"""
+        return float(self.start) + unit*float(self.stop - self.start)
+
     def __str__(self):
         return "[{}, {}]".format(self.start, self.stop)
 
+HALTON_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29]
+
+class HaltonSequence:
+    """ Scrambled Halton low discrepancy sequence in [0, 1)^dimension.
+
+    Each dimension uses a prime base and a random permutation of the digits at every position.
+    The sequence keeps its index so that successive calls continue it."""
+    def __init__(self, dimension: int, seed: int = None):
+        self.dimension = dimension
+        self.index = 0
+        rng = Random(seed)
+        self.bases = HALTON_PRIMES[:dimension]
+        self.digit_counts = [int(ceil(53 / log(b, 2))) for b in self.bases]
+        self.permutations = [[rng.sample(range(b), b) for _ in range(count)] for b, count in zip(self.bases, self.digit_counts)]
+
+    def set_index(self, index: int):
+        self.index = index
+        return self
+
+    def _radical_inverse(self, dim: int, index: int)->float:
+        base = self.bases[dim]
+        result = 0.0
+        factor = 1.0 / base
+        for permutation in self.permutations[dim]:
+            index, digit = divmod(index, base)
+            result += permutation[digit]*factor
+            factor /= base
+        return min(result, 1.0 - 2**-53)
+
+    def next_point(self)->List[float]:
+        point = [self._radical_inverse(dim, self.index) for dim in range(self.dimension)]
+        self.index += 1
+        return point
+
+    def next_points(self, count: int)->List[List[float]]:
+        return [self.next_point() for _ in range(count)]
+
 
 header_review_time_second="review_time_s"
 header_available_time_second="available_time_s"
@@ -122,6 +202,13 @@ class SimulationParams:
         point.set_success_ratio(self.success_ratio.random_float())
         return point
 
+    def quasi_simulation_point(self, unit_point: List[float])->SimulationPoint:
+        """ A point from (review time, available time, success ratio) values in [0, 1)"""
+        point = SimulationPoint().set_review_time_second(self.review_time_second.int_from_unit(unit_point[0]))
+        point.set_available_time_second(self.available_time_second.int_from_unit(unit_point[1]))
+        point.set_success_ratio(self.success_ratio.float_from_unit(unit_point[2]))
+        return point
+
 class Simulation:
     def __init__(self, config: SimulationParams):
         self.config = config
@@ -130,6 +217,28 @@ class Simulation:
         points = [SimulationPoint().set_available_time_second(self.config.available_time_second.random_int()) for _ in range(self.config.count)]
         return points
 
+    def simulate_quasi(self, sequence: HaltonSequence = None)->List[SimulationPoint]:
+        """ Covers the parameter space evenly with a low discrepancy sequence instead of independent draws"""
+        sequence = sequence or HaltonSequence(3)
+        return [self.config.quasi_simulation_point(u) for u in sequence.next_points(self.config.count)]
+
+    def stream(self, chunk_size: int)->Iterator[List[SimulationPoint]]:
+        """ Chunks of count random points in total"""
+        remaining = self.config.count
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            yield [self.config.random_simulation_point() for _ in range(size)]
+            remaining -= size
+
+    def stream_quasi(self, chunk_size: int, sequence: HaltonSequence = None)->Iterator[List[SimulationPoint]]:
+        """ Chunks of count points in total, each chunk continuing the sequence of the previous one"""
+        sequence = sequence or HaltonSequence(3)
+        remaining = self.config.count
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            yield [self.config.quasi_simulation_point(u) for u in sequence.next_points(size)]
+            remaining -= size
+
 header_fieldnames: List[str] = [header_review_time_second, header_available_time_second, header_available_time_hour, header_success_ratio, header_reviewed_asset, header_accepted_assets]
 
 def save_to_csv(filename, points: List[SimulationPoint]):
@@ -139,3 +248,105 @@ def save_to_csv(filename, points: List[SimulationPoint]):
         writer.writeheader()
         for p in points:
             writer.writerow(p.to_obj())
+
+
+class HeatmapAccumulator:
+    """ Counts of points binned by available hours and reviewed assets, with the sum of accepted assets by cell.
+    Memory depends on the number of bins only."""
+    def __init__(self, x_bounds: Tuple[int, int], y_bounds: Tuple[int, int], bins: int = 100):
+        self.x_bounds = x_bounds
+        self.y_bounds = y_bounds
+        self.bins = bins
+        self.x_step = max(1, int(ceil((x_bounds[1] - x_bounds[0] + 1) / bins)))
+        self.y_step = max(1, int(ceil((y_bounds[1] - y_bounds[0] + 1) / bins)))
+        self.counts = [[0]*bins for _ in range(bins)]
+        self.accepted = [[0]*bins for _ in range(bins)]
+        self.total = 0
+
+    @classmethod
+    def from_params(cls, params: SimulationParams, bins: int = 100):
+        review_min, _ = params.review_time_second.get_bounds()
+        available_min, available_max = params.available_time_second.get_bounds()
+        x_bounds = (available_min // 3600, available_max // 3600)
+        y_bounds = (0, available_max // max(review_min, 1))
+        return cls(x_bounds, y_bounds, bins)
+
+    def _bin(self, value: int, bounds: Tuple[int, int], step: int)->int:
+        return min(max((value - bounds[0]) // step, 0), self.bins - 1)
+
+    def add(self, point: SimulationPoint):
+        obj = point.to_obj()
+        x = self._bin(obj[header_available_time_hour], self.x_bounds, self.x_step)
+        y = self._bin(obj[header_reviewed_asset], self.y_bounds, self.y_step)
+        self.counts[x][y] += 1
+        self.accepted[x][y] += obj[header_accepted_assets]
+        self.total += 1
+        return self
+
+    def add_points(self, points: List[SimulationPoint]):
+        for point in points:
+            self.add(point)
+        return self
+
+    def to_rows(self)->List[dict]:
+        """ One row for each non empty cell"""
+        rows = []
+        for x in range(self.bins):
+            for y in range(self.bins):
+                count = self.counts[x][y]
+                if count == 0:
+                    continue
+                x_start = self.x_bounds[0] + x*self.x_step
+                y_start = self.y_bounds[0] + y*self.y_step
+                rows.append({
+                    f"{header_available_time_hour}": x_start,
+                    f"{header_available_time_hour}_end": x_start + self.x_step,
+                    f"{header_reviewed_asset}": y_start,
+                    f"{header_reviewed_asset}_end": y_start + self.y_step,
+                    "count": count,
+                    f"mean_{header_accepted_assets}": self.accepted[x][y] / count
+                })
+        return rows
+
+heatmap_fieldnames: List[str] = [header_available_time_hour, header_available_time_hour + "_end", header_reviewed_asset, header_reviewed_asset + "_end", "count", "mean_" + header_accepted_assets]
+
+def heatmap_spec(data_url: str, color_field: str = "mean_" + header_accepted_assets):
+    """ Vega-Lite spec drawing the pre-binned cells, equivalent to sim3.vg.json"""
+    color_title = "Accepted assets" if color_field != "count" else "Points"
+    return {
+        "$schema": "https://vega.github.io/schema/vega-lite/v4.json",
+        "data": { "url": data_url, "format": { "type": "csv" } },
+        "title": "Accepted assets from reviewed assets",
+        "mark": "rect",
+        "width": 300,
+        "height": 200,
+        "encoding": {
+            "x": { "title": "Available hours", "field": header_available_time_hour, "type": "quantitative" },
+            "x2": { "field": header_available_time_hour + "_end" },
+            "y": { "title": "Reviewed assets", "field": header_reviewed_asset, "type": "quantitative" },
+            "y2": { "field": header_reviewed_asset + "_end" },
+            "color": { "title": color_title, "field": color_field, "type": "quantitative" }
+        },
+        "config": { "view": { "stroke": "transparent" } }
+    }
+
+def save_heatmap(basename: str, accumulator: HeatmapAccumulator, color_field: str = "mean_" + header_accepted_assets):
+    """ Writes basename.csv with the cells and basename.vg.json with the matching spec"""
+    with open(f"{basename}.csv", 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=heatmap_fieldnames)
+        writer.writeheader()
+        for row in accumulator.to_rows():
+            writer.writerow(row)
+    data_url = os.path.basename(basename) + ".csv"
+    with open(f"{basename}.vg.json", 'w') as specfile:
+        json.dump(heatmap_spec(data_url, color_field), specfile, indent=4)
+
+def simulate_heatmap(basename: str, params: SimulationParams, bins: int = 100, chunk_size: int = 65536, quasi: bool = False, sequence: HaltonSequence = None)->HeatmapAccumulator:
+    """ Generates the points chunk by chunk into the heatmap bins, without keeping them, then saves the heatmap like save_heatmap"""
+    simulation = Simulation(params)
+    chunks = simulation.stream_quasi(chunk_size, sequence) if quasi else simulation.stream(chunk_size)
+    accumulator = HeatmapAccumulator.from_params(params, bins)
+    for points in chunks:
+        accumulator.add_points(points)
+    save_heatmap(basename, accumulator)
+    return accumulator
@@ -0,0 +1,308 @@
+from typing import List, Tuple, Dict, Iterator, Iterable
+from random import Random
+from math import sqrt, inf
+import argparse
+import csv
+import json
+import os
+
+class RunningStats:
+    """ Count, mean, variance, min and max in one pass (Welford). Two instances can be merged (Chan et al)."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = inf
+        self.max = -inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta*(value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        return self
+
+    def add_all(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta*delta*self.count*other.count / count
+        self.mean += delta*other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def get_variance(self, ddof: int = 1)->float:
+        """ The sample variance by default, like pandas """
+        return self.m2 / (self.count - ddof) if self.count > ddof else 0.0
+
+    def get_std(self, ddof: int = 1)->float:
+        return sqrt(self.get_variance(ddof))
+
+    def __str__(self):
+        return "RunningStats: count {}, mean {:.6g}, std {:.6g}, min {}, max {}".format(self.count, self.mean, self.get_std(), self.min, self.max)
+
+class WeightedMean:
+    def __init__(self):
+        self.total = 0.0
+        self.weight = 0.0
+
+    def add(self, value: float, weight: float):
+        self.total += value*weight
+        self.weight += weight
+        return self
+
+    def merge(self, other):
+        self.total += other.total
+        self.weight += other.weight
+        return self
+
+    def get_mean(self)->float:
+        return self.total / self.weight if self.weight != 0 else 0.0
+
+class QuantileSketch:
+    """
+    A mergeable quantile sketch in the style of KLL. Level h holds values that stand for 2^h values each.
+    A full level is sorted and every other value, from a random offset, moves up a level.
+    The memory is O(k log(n/k)) and the rank error is around 1/k of the count.
+    """
+    def __init__(self, k: int = 256, seed: int = None):
+        self.k = k
+        self.rng = Random(seed)
+        self.levels = [[]]
+        self.count = 0
+
+    def _capacity(self, level: int)->int:
+        # Lower levels get smaller, down to 8 values, as in KLL
+        return max(8, int(self.k*(2.0/3.0)**(len(self.levels) - 1 - level)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items = sorted(self.levels[level])
+                # An odd value out stays at its level
+                kept = [items.pop()] if len(items) % 2 == 1 else []
+                self.levels[level + 1].extend(items[self.rng.randint(0, 1)::2])
+                self.levels[level] = kept
+            level += 1
+
+    def add(self, value: float):
+        self.levels[0].append(value)
+        self.count += 1
+        if len(self.levels[0]) > self._capacity(0):
+            self._compress()
+        return self
+
+    def add_all(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self._compress()
+        return self
+
+    def get_weighted_values(self)->List[Tuple[float, int]]:
+        return sorted([(value, 1 << level) for level, items in enumerate(self.levels) for value in items])
+
+    def get_quantile(self, q: float)->float:
+        return self.get_quantiles([q])[0]
+
+    def get_quantiles(self, qs: List[float])->List[float]:
+        weighted = self.get_weighted_values()
+        if len(weighted) == 0:
+            return [float("nan")]*len(qs)
+        total = sum([w for _, w in weighted])
+        results = []
+        for q in qs:
+            target = q*total
+            cumulative = 0
+            found = weighted[-1][0]
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative > target:
+                    found = value
+                    break
+            results.append(found)
+        return results
+
+    def get_trimmed_mean(self, proportion: float)->float:
+        """ The mean without the lowest and highest proportion of the values, like scipy.stats.trim_mean, within the rank error of the sketch """
+        weighted = self.get_weighted_values()
+        total = sum([w for _, w in weighted])
+        low, high = proportion*total, (1.0 - proportion)*total
+        kept_sum = 0.0
+        kept_weight = 0.0
+        cumulative = 0.0
+        for value, weight in weighted:
+            inside = min(cumulative + weight, high) - max(cumulative, low)
+            if inside > 0:
+                kept_sum += value*inside
+                kept_weight += inside
+            cumulative += weight
+        return kept_sum / kept_weight if kept_weight > 0 else float("nan")
+
+    def __len__(self):
+        return sum([len(items) for items in self.levels])
+
+    def __str__(self):
+        return "QuantileSketch: count {}, retained {}, levels {}".format(self.count, len(self), len(self.levels))
+
+class FixedHistogram:
+    """ Counts in bins of equal width over [low, high), with the values outside counted apart """
+    def __init__(self, low: float, high: float, bins: int = 10):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.width = (high - low) / bins
+        self.counts = [0]*bins
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, value: float):
+        if value < self.low:
+            self.underflow += 1
+        elif value >= self.high:
+            self.overflow += 1
+        else:
+            self.counts[min(int((value - self.low) / self.width), self.bins - 1)] += 1
+        return self
+
+    def add_all(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        if (self.low, self.high, self.bins) != (other.low, other.high, other.bins):
+            raise ValueError("Histograms with different bins cannot be merged")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    def to_rows(self)->List[dict]:
+        return [{ "low": self.low + i*self.width, "high": self.low + (i + 1)*self.width, "count": count } for i, count in enumerate(self.counts)]
+
+class ColumnStats:
+    """ The statistics of the exp2021-01 notebook for one column, in one pass and constant memory """
+    def __init__(self, name: str, k: int = 256, histogram: FixedHistogram = None, seed: int = None):
+        self.name = name
+        self.running = RunningStats()
+        self.sketch = QuantileSketch(k, seed)
+        self.histogram = histogram
+        self.weighted = WeightedMean()
+        self.missing = 0
+
+    def add_all(self, values: List[float], weights: List[float] = None):
+        for i, value in enumerate(values):
+            if value is None:
+                self.missing += 1
+                continue
+            self.running.add(value)
+            self.sketch.add(value)
+            if self.histogram is not None:
+                self.histogram.add(value)
+            if weights is not None and weights[i] is not None:
+                self.weighted.add(value, weights[i])
+        return self
+
+    def merge(self, other):
+        self.running.merge(other.running)
+        self.sketch.merge(other.sketch)
+        if self.histogram is not None and other.histogram is not None:
+            self.histogram.merge(other.histogram)
+        self.weighted.merge(other.weighted)
+        self.missing += other.missing
+        return self
+
+    def to_obj(self, trim: float = 0.1):
+        q05, q25, q50, q75, q95 = self.sketch.get_quantiles([0.05, 0.25, 0.5, 0.75, 0.95])
+        obj = {
+            "column": self.name,
+            "count": self.running.count,
+            "missing": self.missing,
+            "mean": self.running.mean,
+            "std": self.running.get_std(),
+            "min": self.running.min,
+            "max": self.running.max,
+            "quantiles": { "0.05": q05, "0.25": q25, "0.5": q50, "0.75": q75, "0.95": q95 },
+            "median": q50,
+            "iqr": q75 - q25,
+            "trimmed-mean": self.sketch.get_trimmed_mean(trim),
+            "weighted-mean": self.weighted.get_mean() if self.weighted.weight != 0 else None
+        }
+        if self.histogram is not None:
+            obj["histogram"] = self.histogram.to_rows()
+        return obj
+
+def _to_float(text: str):
+    return float(text) if text != "" else None
+
+def iter_csv_columns(filename: str, columns: List[str], chunk_size: int = 65536)->Iterator[Dict[str, List[float]]]:
+    """ Chunks of the columns of a CSV file as floats. Empty cells are None."""
+    with open(filename, 'r', newline = '') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        indices = [header.index(c) for c in columns]
+        chunk = [[] for _ in columns]
+        for row in reader:
+            for values, index in zip(chunk, indices):
+                values.append(_to_float(row[index]))
+            if len(chunk[0]) == chunk_size:
+                yield dict(zip(columns, chunk))
+                chunk = [[] for _ in columns]
+        if len(chunk[0]) > 0:
+            yield dict(zip(columns, chunk))
+
+def iter_shard_columns(directory: str, columns: List[str], chunk_size: int = 65536)->Iterator[Dict[str, List[float]]]:
+    """ Same as iter_csv_columns over the CSV or binary shards written by shards3.ShardedWriter """
+    from shards3 import load_manifest, iter_rows
+    fieldnames = load_manifest(directory)["fieldnames"]
+    indices = [fieldnames.index(c) for c in columns]
+    for rows in iter_rows(directory, chunk_size):
+        yield dict([(c, [float(row[i]) for row in rows]) for c, i in zip(columns, indices)])
+
+def describe(chunks: Iterator[Dict[str, List[float]]], columns: List[str], weight_column: str = None, k: int = 256, histograms: Dict[str, FixedHistogram] = None, seed: int = None)->Dict[str, ColumnStats]:
+    histograms = histograms or {}
+    stats = dict([(c, ColumnStats(c, k, histograms.get(c), seed)) for c in columns])
+    for chunk in chunks:
+        weights = chunk.get(weight_column) if weight_column is not None else None
+        for c in columns:
+            stats[c].add_all(chunk[c], weights)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Streaming statistics of the columns of a CSV file or of a directory of shards')
+    parser.add_argument("source", help="a CSV file or a directory with a manifest.json")
+    parser.add_argument("-c", "--column", help="a column to describe, can be repeated", action = "append", required = True)
+    parser.add_argument("-w", "--weight", help="the column of the weights of the weighted mean")
+    parser.add_argument("--trim", help="the proportion cut at each end for the trimmed mean", type = float, default = 0.1)
+    parser.add_argument("-k", help="the size of the quantile sketch, larger is more accurate", type = int, default = 256)
+    args = parser.parse_args()
+    read_columns = args.column + ([args.weight] if args.weight is not None and args.weight not in args.column else [])
+    if os.path.isdir(args.source):
+        chunks = iter_shard_columns(args.source, read_columns)
+    else:
+        chunks = iter_csv_columns(args.source, read_columns)
+    for column_stats in describe(chunks, args.column, args.weight, args.k).values():
+        print(json.dumps(column_stats.to_obj(args.trim), indent = 2))
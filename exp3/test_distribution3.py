@@ -0,0 +1,59 @@
+from collections import defaultdict
+from fractions import Fraction
+import pytest
+from simulation3 import IntRange, FractionRange, SimulationParams, SimulationPoint
+from distribution3 import int_range_pmf, reviewed_assets_distribution, SimulationDistribution
+
+def exact_int_range(int_range: IntRange)->dict:
+    probabilities = defaultdict(Fraction)
+    for first, last, probability in int_range.get_segments():
+        for value in range(first, last + 1):
+            probabilities[value] += probability
+    return probabilities
+
+def exact_reviewed(review: IntRange, available: IntRange)->dict:
+    probabilities = defaultdict(Fraction)
+    for r, p in exact_int_range(review).items():
+        for a, q in exact_int_range(available).items():
+            probabilities[a // r] += p*q
+    return probabilities
+
+def exact_accepted(reviewed: dict, success: FractionRange)->dict:
+    """ P(int(k*s) = j) is the length of [j/k, (j+1)/k) within [start, stop], over stop - start """
+    probabilities = defaultdict(Fraction)
+    for k, p in reviewed.items():
+        if k == 0:
+            probabilities[0] += p
+            continue
+        for j in range(int(k*success.start), int(k*success.stop) + 1):
+            length = min(Fraction(j + 1, k), success.stop) - max(Fraction(j, k), success.start)
+            if length > 0:
+                probabilities[j] += p*length / (success.stop - success.start)
+    return probabilities
+
+def assert_same(pmf, probabilities: dict):
+    assert abs(sum(pmf) - 1.0) < 1e-9
+    for value in range(max(len(pmf), max(probabilities) + 1)):
+        computed = pmf[value] if value < len(pmf) else 0.0
+        assert abs(computed - float(probabilities.get(value, 0))) < 1e-9
+
+def test_int_range_pmf_is_the_distribution_of_random_int():
+    for int_range in [IntRange(2, 9), IntRange(10, 300)]:
+        assert_same(int_range_pmf(int_range), exact_int_range(int_range))
+
+def test_derived_metrics_match_an_exact_enumeration():
+    review = IntRange(2, 9)
+    available = IntRange(10, 300)
+    success = FractionRange(Fraction(1, 10), Fraction(3, 4))
+    distribution = SimulationDistribution(SimulationParams().set_review_time_second(review).set_available_time_second(available).set_success_ratio(success))
+    reviewed = exact_reviewed(review, available)
+    assert_same(distribution.reviewed_assets.pmf, reviewed)
+    assert_same(distribution.accepted_assets.pmf, exact_accepted(reviewed, success))
+    assert distribution.reviewed_assets.get_bounds() == (min(reviewed), max(reviewed))
+
+def test_a_review_time_of_zero_is_refused_like_the_sampler():
+    with pytest.raises(ZeroDivisionError):
+        SimulationPoint().set_review_time_second(0).to_obj()
+    with pytest.raises(ValueError):
+        reviewed_assets_distribution(IntRange(0, 5), IntRange(60, 600))
+    assert abs(sum(reviewed_assets_distribution(IntRange(1, 5), IntRange(60, 600)).pmf) - 1.0) < 1e-9
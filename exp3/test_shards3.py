@@ -0,0 +1,38 @@
+import os
+from fractions import Fraction
+from simulation3 import IntRange, FractionRange, SimulationParams
+from shards3 import ShardedWriter, load_manifest, iter_rows, verify_shards
+
+def params(count: int)->SimulationParams:
+    return SimulationParams().set_count(count).set_review_time_second(IntRange(5, 500)).set_available_time_second(IntRange(60, 20000)).set_success_ratio(FractionRange(Fraction(1, 100), Fraction(1, 2)))
+
+def all_rows(directory: str, chunk_size: int = 65536):
+    return [row for chunk in iter_rows(directory, chunk_size) for row in chunk]
+
+def test_shards_round_trip_through_the_manifest(tmp_path):
+    csv_dir, bin_dir = str(tmp_path / "csv"), str(tmp_path / "bin")
+    written = ShardedWriter(csv_dir, params(250)).set_workers(1).set_shard_size(100).set_seed(3).write()
+    ShardedWriter(bin_dir, params(250)).set_workers(1).set_shard_size(100).set_seed(3).set_format("bin").write()
+    manifest = load_manifest(csv_dir)
+    assert manifest == written
+    assert [s["rows"] for s in manifest["shards"]] == [100, 100, 50] and manifest["rows"] == 250
+    rows = all_rows(csv_dir, chunk_size = 7)
+    assert len(rows) == 250
+    assert all_rows(bin_dir) == rows
+    assert verify_shards(csv_dir) == [] and verify_shards(bin_dir) == []
+
+def test_shards_do_not_depend_on_the_workers(tmp_path):
+    for quasi in [False, True]:
+        one, two = str(tmp_path / "one{}".format(quasi)), str(tmp_path / "two{}".format(quasi))
+        ShardedWriter(one, params(120)).set_workers(1).set_shard_size(50).set_quasi(quasi).write()
+        ShardedWriter(two, params(120)).set_workers(2).set_shard_size(50).set_quasi(quasi).write()
+        assert load_manifest(one)["shards"] == load_manifest(two)["shards"]
+        assert all_rows(one) == all_rows(two)
+
+def test_verify_shards_finds_a_changed_shard(tmp_path):
+    directory = str(tmp_path)
+    manifest = ShardedWriter(directory, params(60)).set_workers(1).set_shard_size(20).write()
+    name = manifest["shards"][1]["name"]
+    with open(os.path.join(directory, name), 'ab') as shardfile:
+        shardfile.write(b"1,2,3,0.5,4,5\r\n")
+    assert verify_shards(directory) == [name]
@@ -0,0 +1,86 @@
+from collections import Counter
+from fractions import Fraction
+import csv
+import json
+import random
+from simulation3 import HaltonSequence, IntRange, FractionRange, SimulationParams, Simulation, HeatmapAccumulator, save_heatmap, simulate_heatmap
+
+def params(count: int)->SimulationParams:
+    return SimulationParams().set_count(count).set_review_time_second(IntRange(5, 500)).set_available_time_second(IntRange(60, 20000)).set_success_ratio(FractionRange(Fraction(1, 100), Fraction(1, 2)))
+
+def test_halton_points_are_stratified_in_every_dimension():
+    sequence = HaltonSequence(3, seed = 7)
+    for dim, base in enumerate(sequence.bases):
+        count = base**3
+        points = HaltonSequence(3, seed = 7).next_points(count)
+        cells = Counter([int(p[dim]*count) for p in points])
+        # The first base^k points fall one in each interval of width base^-k, scrambled or not
+        assert all([0.0 <= p[dim] < 1.0 for p in points])
+        assert sorted(cells.keys()) == list(range(count))
+
+def test_halton_sequence_is_reproducible_and_continues_across_calls():
+    whole = HaltonSequence(3, seed = 1).next_points(20)
+    sequence = HaltonSequence(3, seed = 1)
+    assert sequence.next_points(8) + sequence.next_points(12) == whole
+    assert HaltonSequence(3, seed = 1).set_index(8).next_points(12) == whole[8:]
+    assert HaltonSequence(3, seed = 2).next_points(20) != whole
+
+def test_int_from_unit_has_the_distribution_of_random_int():
+    for int_range in [IntRange(3, 50), IntRange(60, 20000)]:
+        count = 200000
+        values = Counter([int_range.int_from_unit((i + 0.5) / count) for i in range(count)])
+        expected = Counter()
+        for first, last, probability in int_range.get_segments():
+            for value in range(first, last + 1):
+                expected[value] += float(probability)
+        low, high = int_range.get_bounds()
+        assert low <= min(values) and max(values) <= high
+        # Even units give every value its probability up to the rounding of one unit step by segment
+        tolerance = (len(int_range.get_segments()) + 1) / count
+        for value in set(values) | set(expected):
+            assert abs(values[value] / count - expected[value]) <= tolerance
+
+def test_stream_quasi_matches_simulate_quasi():
+    simulation = Simulation(params(1000))
+    whole = [p.to_obj() for p in simulation.simulate_quasi(HaltonSequence(3, seed = 3))]
+    chunks = [[p.to_obj() for p in chunk] for chunk in simulation.stream_quasi(300, HaltonSequence(3, seed = 3))]
+    assert [len(c) for c in chunks] == [300, 300, 300, 100]
+    assert sum(chunks, []) == whole
+
+def test_heatmap_bins_equal_a_count_of_the_saved_points():
+    random.seed(5)
+    simulation_params = params(3000)
+    points = [p for chunk in Simulation(simulation_params).stream(700) for p in chunk]
+    accumulator = HeatmapAccumulator.from_params(simulation_params, bins = 20)
+    for start in range(0, len(points), 700):
+        accumulator.add_points(points[start:start + 700])
+    rows = accumulator.to_rows()
+    assert sum([r["count"] for r in rows]) == accumulator.total == len(points)
+    for row in rows:
+        inside = [p.to_obj() for p in points
+            if row["available_time_h"] <= p.to_obj()["available_time_h"] < row["available_time_h_end"]
+            and row["reviewed_assets"] <= p.to_obj()["reviewed_assets"] < row["reviewed_assets_end"]]
+        assert len(inside) == row["count"]
+        assert abs(sum([p["accepted_assets"] for p in inside]) / len(inside) - row["mean_accepted_assets"]) < 1e-9
+
+def test_save_heatmap_writes_the_cells_and_a_spec_reading_them(tmp_path):
+    random.seed(6)
+    simulation_params = params(500)
+    accumulator = HeatmapAccumulator.from_params(simulation_params, bins = 10).add_points(next(Simulation(simulation_params).stream(500)))
+    save_heatmap(str(tmp_path / "sim3"), accumulator)
+    with open(str(tmp_path / "sim3.csv"), newline = '') as csvfile:
+        assert sum([int(r["count"]) for r in csv.DictReader(csvfile)]) == 500
+    with open(str(tmp_path / "sim3.vg.json")) as specfile:
+        assert json.load(specfile)["data"]["url"] == "sim3.csv"
+
+def test_simulate_heatmap_streams_the_points_into_the_bins(tmp_path):
+    simulation_params = params(1000)
+    random.seed(7)
+    expected = HeatmapAccumulator.from_params(simulation_params, bins = 15).add_points([simulation_params.random_simulation_point() for _ in range(1000)])
+    random.seed(7)
+    accumulator = simulate_heatmap(str(tmp_path / "sim3"), simulation_params, bins = 15, chunk_size = 64)
+    assert accumulator.to_rows() == expected.to_rows()
+    with open(str(tmp_path / "sim3.csv"), newline = '') as csvfile:
+        assert sum([int(r["count"]) for r in csv.DictReader(csvfile)]) == 1000
+    quasi = simulate_heatmap(str(tmp_path / "quasi"), simulation_params, bins = 15, chunk_size = 64, quasi = True, sequence = HaltonSequence(3, seed = 1))
+    assert quasi.to_rows() == HeatmapAccumulator.from_params(simulation_params, bins = 15).add_points(Simulation(simulation_params).simulate_quasi(HaltonSequence(3, seed = 1))).to_rows()
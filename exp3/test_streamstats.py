@@ -0,0 +1,42 @@
+import bisect
+from random import Random
+import numpy as np
+from streamstats import RunningStats, QuantileSketch
+
+def rank_errors(sketch: QuantileSketch, values: list)->list:
+    ordered = sorted(values)
+    qs = [i / 100 for i in range(1, 100)]
+    return [abs(bisect.bisect_left(ordered, found) / len(ordered) - q) for q, found in zip(qs, sketch.get_quantiles(qs))]
+
+def test_sketch_rank_error_is_within_the_bound():
+    rng = Random(1)
+    values = [rng.lognormvariate(0, 2) for _ in range(100000)]
+    sketch = QuantileSketch(k = 256, seed = 2).add_all(values)
+    assert sum([w for _, w in sketch.get_weighted_values()]) == sketch.count == len(values)
+    # About 1/k of the count, with some margin for the random offsets
+    assert max(rank_errors(sketch, values)) < 4 / 256
+    assert len(sketch) < 3*256
+
+def test_merged_sketches_keep_the_bound():
+    rng = Random(3)
+    parts = [[rng.gauss(i, 1) for _ in range(20000)] for i in range(5)]
+    merged = QuantileSketch(k = 256, seed = 4)
+    for i, part in enumerate(parts):
+        merged.merge(QuantileSketch(k = 256, seed = 10 + i).add_all(part))
+    values = [v for part in parts for v in part]
+    assert merged.count == len(values)
+    assert max(rank_errors(merged, values)) < 4 / 256
+
+def test_merged_running_stats_equal_a_single_pass():
+    rng = Random(5)
+    values = [rng.uniform(-3, 1e6) for _ in range(30001)]
+    whole = RunningStats().add_all(values)
+    merged = RunningStats()
+    for start in range(0, len(values), 7000):
+        merged.merge(RunningStats().add_all(values[start:start + 7000]))
+    assert merged.count == whole.count == len(values)
+    assert (merged.min, merged.max) == (whole.min, whole.max) == (min(values), max(values))
+    assert abs(merged.mean - whole.mean) <= 1e-9*abs(whole.mean)
+    assert abs(merged.get_variance() - whole.get_variance()) <= 1e-9*whole.get_variance()
+    assert abs(whole.get_variance() - np.var(values, ddof = 1)) <= 1e-9*whole.get_variance()
+    assert RunningStats().merge(RunningStats()).count == 0